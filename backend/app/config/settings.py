@@ -1,20 +1,92 @@
+from typing import Dict, Optional, Tuple
 from pydantic_settings import BaseSettings
 
 
 class Settings(BaseSettings):
     # Azure Functions
     AZURE_FUNCTION_URL: str
+    HTTP_POOL_SIZE: int = 10
+    HTTP_CONNECT_TIMEOUT: float = 3.05
+    HTTP_READ_TIMEOUT: float = 30
+
+    # Catalog Cache
+    CATALOG_CACHE_TTL_SECONDS: float = 60
+    CATALOG_CACHE_STALE_SECONDS: float = 600
 
     # OpenAI
     OPENAI_API_KEY: str
+    LLM_MODEL: str = "gpt-4-turbo-preview"
+    LLM_VALIDATION_TIMEOUT_SECONDS: float = 20
+    LLM_ANSWER_TIMEOUT_SECONDS: float = 60
+    # プロンプトに含めるシステム説明の上限トークン数
+    LLM_CONTEXT_DESCRIPTION_TOKENS: int = 512
+    # そのまま送る直近の会話履歴の上限トークン数（あふれた発言は要約に畳み込む）
+    LLM_HISTORY_TOKEN_BUDGET: int = 1500
+    LLM_SUMMARY_MAX_TOKENS: int = 400
+
+    # OpenAI Rate Limits
+    # モデルごとの (RPM, TPM)（未指定のモデルは OPENAI_DEFAULT_RPM / OPENAI_DEFAULT_TPM）
+    OPENAI_RATE_LIMITS: Dict[str, Tuple[int, int]] = {
+        "gpt-4-turbo-preview": (500, 30000),
+        "text-embedding-3-small": (3000, 1000000),
+    }
+    OPENAI_DEFAULT_RPM: int = 500
+    OPENAI_DEFAULT_TPM: int = 150000
+    OPENAI_MAX_CONCURRENCY: int = 16
+    OPENAI_MAX_RETRIES: int = 4
+
+    # Question Classifier
+    QUESTION_CLASSIFIER_ENABLED: bool = True
+    QUESTION_CLASSIFIER_PATH: Optional[str] = None
+
+    # Answer Cache
+    ANSWER_CACHE_SIMILARITY_THRESHOLD: float = 0.92
+    ANSWER_CACHE_TTL_SECONDS: float = 24 * 60 * 60
+    ANSWER_CACHE_MAX_ENTRIES: int = 1000
+
+    # Bulk Import
+    BULK_IMPORT_BATCH_SIZE: int = 100
+    BULK_IMPORT_CONCURRENCY: int = 8
+
+    # Metrics
+    METRICS_ENABLED: bool = False
+    # Prometheus のテキスト形式で定期的に書き出すファイル（node_exporter の textfile collector など）
+    METRICS_FILE: Optional[str] = None
+    METRICS_EXPORT_INTERVAL_SECONDS: float = 15
+    # 指定した場合は GET /metrics を返すサーバーを起動
+    METRICS_PORT: Optional[int] = None
+    # 所要時間がこれを超えた処理は段階ごとの内訳をログに出力
+    METRICS_SLOW_SPAN_SECONDS: Optional[float] = 2.0
+    # 1000トークンあたりの料金（USD）: モデル → (入力, 出力)（既定の料金表を上書き）
+    LLM_PRICING_PER_1K_TOKENS: Dict[str, Tuple[float, float]] = {}
 
     # Logging
     LOG_LEVEL: str = "INFO"
-    LOG_DIR: str = "logs"
+    # None の場合はファイルに出力しない（標準エラーのみ）
+    LOG_DIR: Optional[str] = "logs"
+    # True の場合は1行1レコードの JSON で出力
+    LOG_JSON: bool = True
+    # DEBUG のレコードを残す割合（出力箇所ごと、INFO 以上は間引かない）
+    LOG_DEBUG_SAMPLE_RATE: float = 0.1
+    # 書き出し待ちのレコードの上限（超えた分は破棄してリクエストを待たせない）
+    LOG_QUEUE_SIZE: int = 10000
 
     # Embedding Cache
     EMBEDDING_CACHE_DIR: str = "embeddings_cache"
     USE_EMBEDDING_CACHE: bool = True
+    EMBEDDING_MEMORY_CACHE_BYTES: int = 64 * 1024 * 1024
+    EMBEDDING_CACHE_MAX_BYTES: int = 1024 * 1024 * 1024
+    EMBEDDING_CACHE_TTL_SECONDS: Optional[int] = 30 * 24 * 60 * 60
+
+    # Embedding Model
+    EMBEDDING_MODEL: str = "text-embedding-3-small"
+    EMBEDDING_DIMENSIONS: int = 1536
+
+    # Approximate Nearest Neighbour Index
+    ANN_MIN_CATALOG_SIZE: int = 20000
+    ANN_NLIST: Optional[int] = None
+    ANN_NPROBE: int = 8
+    ANN_INDEX_PATH: Optional[str] = None
 
     class Config:
         env_file = ".env"
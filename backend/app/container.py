@@ -0,0 +1,306 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional, TypeVar
+
+from .config.settings import Settings
+from .domain.services.answer_cache import SemanticAnswerCache
+from .domain.services.async_llm_service import AsyncLLMService
+from .domain.services.bulk_import_service import BulkImportService
+from .domain.services.conversation import ConversationMemory
+from .domain.services.embedding_service import EmbeddingService
+from .domain.services.facet_index import FacetIndex
+from .domain.services.keyword_index import KeywordIndex
+from .domain.services.llm_service import LLMService
+from .domain.services.prompt_context import SystemContextBuilder
+from .domain.services.question_classifier import QuestionRelevanceClassifier
+from .domain.services.question_services import QuestionService
+from .domain.services.register_service import RegisterService
+from .domain.services.search_service import SearchService
+from .infrastructure.repositories.catalog_cache import CatalogCache
+from .infrastructure.repositories.catalog_sync import CatalogSync
+from .infrastructure.repositories.system_repository import SystemRepository
+from .infrastructure.tools.http_client import HttpClient
+from .infrastructure.tools.llm_client import LLMClient
+from .infrastructure.tools.openai_scheduler import RequestScheduler
+from .utils.logger import Logger
+from .utils.metrics import MetricsRegistry, metrics
+
+T = TypeVar("T")
+
+
+class ServiceContainer:
+    """
+    プロセス全体で共有するサービスコンテナ
+    Settings の値から各サービスを初回アクセス時に1回だけ生成し、Streamlitの再実行やセッションをまたいで使い回す
+    OpenAI と Azure Functions のクライアントは1つずつ生成し、各サービスでコネクションプールを共有する
+    """
+    _instance: Optional["ServiceContainer"] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, settings: Optional[Settings] = None):
+        self._settings = settings
+        self._services: Dict[str, object] = {}
+        self._lock = threading.RLock()
+        self._warm_up_started = False
+
+    @classmethod
+    def instance(cls) -> "ServiceContainer":
+        """プロセス全体で共有するコンテナを取得"""
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    @classmethod
+    def set_instance(cls, container: Optional["ServiceContainer"]):
+        """共有コンテナを差し替え（None で破棄）"""
+        with cls._instance_lock:
+            cls._instance = container
+
+    def _get(self, name: str, factory: Callable[[], T]) -> T:
+        """生成済みのサービスを返す（未生成なら生成）"""
+        service = self._services.get(name)
+        if service is None:
+            with self._lock:
+                service = self._services.get(name)
+                if service is None:
+                    service = factory()
+                    self._services[name] = service
+        return service
+
+    @property
+    def settings(self) -> Settings:
+        if self._settings is None:
+            with self._lock:
+                if self._settings is None:
+                    self._settings = Settings()
+        return self._settings
+
+    # ログ・メトリクス
+    def configure_logging(self):
+        """Settings の値でルートロガーを設定（書き込みはバックグラウンドのスレッドで行う）"""
+        Logger.from_settings(self.settings)
+
+    @property
+    def metrics(self) -> MetricsRegistry:
+        """Settings の値でプロセス共有のメトリクスを設定し、有効ならファイル出力と /metrics を開始"""
+        def create() -> MetricsRegistry:
+            settings = self.settings
+            metrics.configure(
+                settings.METRICS_ENABLED,
+                slow_span_seconds=settings.METRICS_SLOW_SPAN_SECONDS,
+                pricing=settings.LLM_PRICING_PER_1K_TOKENS
+            )
+            if not settings.METRICS_ENABLED:
+                return metrics
+            metrics.describe("app_openai_queue_depth", "gauge", "OpenAI requests waiting for a rate-limit slot")
+            metrics.describe("app_openai_in_flight", "gauge", "OpenAI requests currently in flight")
+            metrics.describe("app_openai_retries_total", "counter", "OpenAI requests retried by the scheduler")
+            metrics.describe("app_openai_rate_limited_total", "counter", "OpenAI responses with status 429")
+            metrics.describe("app_openai_failed_total", "counter", "OpenAI requests that failed after retries")
+            metrics.register_collector(self._scheduler_metrics)
+            if settings.METRICS_FILE:
+                metrics.start_file_exporter(settings.METRICS_FILE, settings.METRICS_EXPORT_INTERVAL_SECONDS)
+            if settings.METRICS_PORT:
+                metrics.start_http_server(settings.METRICS_PORT)
+            return metrics
+        return self._get("metrics", create)
+
+    def _scheduler_metrics(self):
+        """OpenAI スケジューラの状態をゲージとして返す（まだ生成されていなければ何も返さない）"""
+        scheduler = self._services.get("openai_scheduler")
+        if scheduler is None:
+            return
+        stats = scheduler.metrics()
+        for priority, depth in stats["queue_depth"].items():
+            yield "app_openai_queue_depth", {"priority": priority}, depth
+        yield "app_openai_in_flight", {}, stats["in_flight"]
+        yield "app_openai_retries_total", {}, stats["retries"]
+        yield "app_openai_rate_limited_total", {}, stats["rate_limited"]
+        yield "app_openai_failed_total", {}, stats["failed"]
+
+    # クライアント
+    @property
+    def llm_client(self) -> LLMClient:
+        return self._get("llm_client", lambda: LLMClient(self.settings.OPENAI_API_KEY))
+
+    @property
+    def openai_scheduler(self) -> RequestScheduler:
+        def create() -> RequestScheduler:
+            scheduler = RequestScheduler.from_settings(self.settings)
+            RequestScheduler.set_shared(scheduler)
+            return scheduler
+        return self._get("openai_scheduler", create)
+
+    @property
+    def http_client(self) -> HttpClient:
+        def create() -> HttpClient:
+            http_client = HttpClient.from_settings(self.settings)
+            HttpClient.set_shared(http_client)
+            return http_client
+        return self._get("http_client", create)
+
+    # カタログ
+    @property
+    def system_repository(self) -> SystemRepository:
+        return self._get(
+            "system_repository",
+            lambda: SystemRepository(self.settings.AZURE_FUNCTION_URL, http_client=self.http_client)
+        )
+
+    @property
+    def catalog_sync(self) -> CatalogSync:
+        return self._get("catalog_sync", lambda: CatalogSync(self.system_repository))
+
+    @property
+    def catalog_cache(self) -> CatalogCache:
+        return self._get("catalog_cache", lambda: CatalogCache(
+            self.catalog_sync,
+            ttl_seconds=self.settings.CATALOG_CACHE_TTL_SECONDS,
+            stale_seconds=self.settings.CATALOG_CACHE_STALE_SECONDS
+        ))
+
+    # 検索
+    @property
+    def embedding_service(self) -> EmbeddingService:
+        def create() -> EmbeddingService:
+            embedding_service = EmbeddingService.from_settings(
+                self.settings,
+                client=self.llm_client.client,
+                scheduler=self.openai_scheduler
+            )
+            self.catalog_sync.subscribe(embedding_service.apply_catalog_changes)
+            return embedding_service
+        return self._get("embedding_service", create)
+
+    @property
+    def keyword_index(self) -> KeywordIndex:
+        def create() -> KeywordIndex:
+            keyword_index = KeywordIndex()
+            self.catalog_sync.subscribe(keyword_index.apply_catalog_changes)
+            return keyword_index
+        return self._get("keyword_index", create)
+
+    @property
+    def facet_index(self) -> FacetIndex:
+        return self._get("facet_index", FacetIndex)
+
+    @property
+    def search_service(self) -> SearchService:
+        return self._get("search_service", lambda: SearchService(
+            self.system_repository,
+            self.embedding_service,
+            catalog_cache=self.catalog_cache,
+            keyword_index=self.keyword_index
+        ))
+
+    @property
+    def register_service(self) -> RegisterService:
+        return self._get("register_service", lambda: RegisterService(
+            self.settings.AZURE_FUNCTION_URL,
+            catalog_cache=self.catalog_cache,
+            http_client=self.http_client
+        ))
+
+    @property
+    def bulk_import_service(self) -> BulkImportService:
+        # 1件ずつレプリカに反映しないよう、catalog_cache を持たない RegisterService を使う
+        return self._get("bulk_import_service", lambda: BulkImportService.from_settings(
+            self.settings,
+            RegisterService(self.settings.AZURE_FUNCTION_URL, http_client=self.http_client),
+            self.embedding_service,
+            catalog_cache=self.catalog_cache
+        ))
+
+    # 質問応答
+    @property
+    def question_classifier(self) -> Optional[QuestionRelevanceClassifier]:
+        if not self.settings.QUESTION_CLASSIFIER_ENABLED:
+            return None
+        return self._get("question_classifier", lambda: QuestionRelevanceClassifier.load(
+            self.embedding_service,
+            self.settings.QUESTION_CLASSIFIER_PATH
+        ))
+
+    @property
+    def answer_cache(self) -> SemanticAnswerCache:
+        def create() -> SemanticAnswerCache:
+            answer_cache = SemanticAnswerCache.from_settings(self.embedding_service, self.settings)
+            self.catalog_sync.subscribe(answer_cache.apply_catalog_changes)
+            return answer_cache
+        return self._get("answer_cache", create)
+
+    @property
+    def conversation_memory(self) -> ConversationMemory:
+        return self._get("conversation_memory", lambda: ConversationMemory(
+            SystemContextBuilder(self.settings.LLM_MODEL, self.settings.LLM_CONTEXT_DESCRIPTION_TOKENS),
+            history_token_budget=self.settings.LLM_HISTORY_TOKEN_BUDGET
+        ))
+
+    @property
+    def llm_service(self) -> LLMService:
+        return self._get("llm_service", lambda: LLMService.from_settings(
+            self.settings,
+            classifier=self.question_classifier,
+            conversation_memory=self.conversation_memory,
+            client=self.llm_client.client,
+            scheduler=self.openai_scheduler
+        ))
+
+    @property
+    def async_llm_service(self) -> AsyncLLMService:
+        return self._get("async_llm_service", lambda: AsyncLLMService.from_settings(
+            self.settings,
+            classifier=self.question_classifier,
+            conversation_memory=self.conversation_memory,
+            client=self.llm_client.async_client,
+            scheduler=self.openai_scheduler
+        ))
+
+    @property
+    def question_service(self) -> QuestionService:
+        return self._get("question_service", lambda: QuestionService(
+            self.async_llm_service,
+            answer_cache=self.answer_cache
+        ))
+
+    def warm_up(self, background: bool = False) -> Optional[Dict[str, float]]:
+        """
+        起動時の準備（プロセスごとに1回）
+        カタログを同期して検索インデックスを読み込み、Azure Functions と OpenAI へのコネクションを開いておく
+        background=True の場合は別スレッドで実行し、最初の画面描画を待たせない
+        Returns: 段階ごとの所要秒数（background=True または実行済みの場合は None）
+        """
+        with self._lock:
+            if self._warm_up_started:
+                return None
+            self._warm_up_started = True
+        # 各段階のログと計測を記録できるよう、最初にログとメトリクスを設定する
+        self.configure_logging()
+        self.metrics
+
+        if background:
+            threading.Thread(target=self._warm_up, name="service-warm-up", daemon=True).start()
+            return None
+        return self._warm_up()
+
+    def _warm_up(self) -> Dict[str, float]:
+        stages = {
+            # インデックスを購読させてからカタログを同期すると、同期結果がそのままインデックスに反映される
+            "indexes": lambda: (self.embedding_service, self.keyword_index),
+            "catalog": lambda: self.catalog_cache.refresh(),
+            "facets": lambda: self.facet_index.ensure(self.catalog_cache),
+            "question_classifier": lambda: self.question_classifier,
+            "openai": lambda: self.llm_client.client.models.retrieve(self.settings.LLM_MODEL),
+        }
+        timings = {}
+        for name, stage in stages.items():
+            start = time.perf_counter()
+            try:
+                stage()
+            except Exception as e:
+                logging.warning(f"Warm-up stage '{name}' failed: {str(e)}")
+            timings[name] = time.perf_counter() - start
+        logging.info("Warm-up finished: " + ", ".join(f"{name}={seconds:.2f}s" for name, seconds in timings.items()))
+        return timings
@@ -0,0 +1,196 @@
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+from .vector_index import VectorIndex
+
+
+class IVFIndex:
+    """
+    k-meansの粗いセントロイドでベクトルをリストに分割するIVF-flat近似最近傍インデックス
+    検索時はクエリに近い nprobe 個のリストのみを走査する
+    """
+    # 割り当て計算時の1回あたりの行数（メモリ使用量の上限）
+    ASSIGN_BATCH = 8192
+
+    def __init__(
+        self,
+        dimensions: int,
+        nlist: Optional[int] = None,
+        nprobe: int = 8,
+        kmeans_iterations: int = 10,
+        training_sample: int = 100000,
+        seed: int = 0
+    ):
+        self.dimensions = dimensions
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.kmeans_iterations = kmeans_iterations
+        self.training_sample = training_sample
+        self.seed = seed
+        self.signature: Optional[str] = None
+        self._centroids = np.empty((0, dimensions), dtype=np.float32)
+        self._matrix = np.empty((0, dimensions), dtype=np.float32)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._ids: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @staticmethod
+    def default_nlist(n: int) -> int:
+        """カタログ件数に応じたリスト数（おおよそ 4√n）"""
+        return max(1, min(n, int(4 * np.sqrt(n))))
+
+    def _assign(self, vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        """各ベクトルを最も近いセントロイドに割り当て"""
+        assign = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), self.ASSIGN_BATCH):
+            batch = vectors[start:start + self.ASSIGN_BATCH]
+            assign[start:start + len(batch)] = np.argmax(batch @ centroids.T, axis=1)
+        return assign
+
+    def _train(self, vectors: np.ndarray, nlist: int) -> np.ndarray:
+        """球面k-meansでセントロイドを学習"""
+        rng = np.random.default_rng(self.seed)
+        if len(vectors) > self.training_sample:
+            vectors = vectors[rng.choice(len(vectors), self.training_sample, replace=False)]
+
+        centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+        for _ in range(self.kmeans_iterations):
+            assign = self._assign(vectors, centroids)
+            counts = np.bincount(assign, minlength=nlist)
+            order = np.argsort(assign, kind='stable')
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            nonempty = counts > 0
+
+            sums = np.zeros_like(centroids)
+            sums[nonempty] = np.add.reduceat(vectors[order], starts[nonempty], axis=0)
+            # 空のクラスタはランダムな点で初期化し直す
+            empty = np.flatnonzero(~nonempty)
+            sums[empty] = vectors[rng.choice(len(vectors), len(empty))]
+            centroids = VectorIndex._normalize(sums)
+        return centroids
+
+    def build(self, ids: Sequence[str], vectors: Sequence[np.ndarray], signature: Optional[str] = None):
+        """セントロイドを学習し、ベクトルをリストごとに連続した行列に並べ替えて保持"""
+        matrix = np.empty((len(ids), self.dimensions), dtype=np.float32)
+        for row, vector in enumerate(vectors):
+            matrix[row] = vector
+        matrix = VectorIndex._normalize(matrix)
+
+        self.signature = signature
+        if len(ids) == 0:
+            self._centroids = np.empty((0, self.dimensions), dtype=np.float32)
+            self._matrix = matrix
+            self._offsets = np.zeros(1, dtype=np.int64)
+            self._ids = []
+            return
+
+        nlist = min(self.nlist or self.default_nlist(len(ids)), len(ids))
+        centroids = self._train(matrix, nlist)
+        assign = self._assign(matrix, centroids)
+        order = np.argsort(assign, kind='stable')
+
+        self._centroids = centroids
+        self._matrix = np.ascontiguousarray(matrix[order])
+        self._offsets = np.concatenate(([0], np.cumsum(np.bincount(assign, minlength=nlist))))
+        self._ids = [ids[row] for row in order]
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: Optional[int] = None,
+        nprobe: Optional[int] = None
+    ) -> List[Tuple[str, float]]:
+        """クエリに近い nprobe 個のリストを走査し、コサイン類似度の高い順に (id, score) を返す"""
+        if len(self._ids) == 0 or (k is not None and k <= 0):
+            return []
+
+        query = VectorIndex._normalize(query)
+        nlist = len(self._centroids)
+        nprobe = min(nprobe or self.nprobe, nlist)
+        centroid_scores = self._centroids @ query
+        probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe] if nprobe < nlist else range(nlist)
+
+        # リストごとに連続した行をそのまま行列積で評価する
+        bounds = [(self._offsets[c], self._offsets[c + 1]) for c in probe]
+        rows = np.concatenate([np.arange(start, end) for start, end in bounds])
+        if len(rows) == 0:
+            return []
+        scores = np.concatenate([self._matrix[start:end] @ query for start, end in bounds])
+
+        if k is None or k >= len(rows):
+            order = np.argsort(-scores)
+        else:
+            top = np.argpartition(-scores, k - 1)[:k]
+            order = top[np.argsort(-scores[top])]
+
+        return [(self._ids[rows[i]], float(scores[i])) for i in order]
+
+    def save(self, path: str):
+        """インデックスをディスクに保存"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                centroids=self._centroids,
+                matrix=self._matrix,
+                offsets=self._offsets,
+                ids=np.array(self._ids, dtype=str),
+                nprobe=self.nprobe,
+                signature=np.array(self.signature or "")
+            )
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        """ディスクに保存したインデックスを読み込み"""
+        with np.load(path) as data:
+            index = cls(data['matrix'].shape[1], nprobe=int(data['nprobe']))
+            index._centroids = data['centroids']
+            index._matrix = data['matrix']
+            index._offsets = data['offsets']
+            index._ids = data['ids'].tolist()
+            index.nlist = len(index._centroids)
+            index.signature = str(data['signature']) or None
+        return index
+
+    def evaluate_recall(
+        self,
+        exact: VectorIndex,
+        queries: Sequence[np.ndarray],
+        k: int = 10,
+        nprobe_values: Sequence[int] = (1, 2, 4, 8, 16, 32)
+    ) -> List[Dict[str, float]]:
+        """
+        厳密検索に対する recall@k と検索レイテンシを nprobe ごとに計測
+        recall とレイテンシのバランスから nprobe を選ぶために使う
+        """
+        exact_latencies = []
+        truth = []
+        for query in queries:
+            start = time.perf_counter()
+            truth.append({doc_id for doc_id, _ in exact.search(query, k)})
+            exact_latencies.append(time.perf_counter() - start)
+
+        report = []
+        for nprobe in nprobe_values:
+            latencies = []
+            hits = 0
+            for query, expected in zip(queries, truth):
+                start = time.perf_counter()
+                found = self.search(query, k, nprobe=nprobe)
+                latencies.append(time.perf_counter() - start)
+                hits += len(expected.intersection(doc_id for doc_id, _ in found))
+            report.append({
+                "nprobe": nprobe,
+                "recall": hits / max(1, sum(len(expected) for expected in truth)),
+                "mean_ms": float(np.mean(latencies) * 1000),
+                "p99_ms": float(np.percentile(latencies, 99) * 1000),
+                "exact_mean_ms": float(np.mean(exact_latencies) * 1000),
+            })
+        return report
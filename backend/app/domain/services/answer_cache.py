@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from itertools import count
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .embedding_service import EmbeddingService
+from .vector_index import VectorIndex
+from ...config.settings import Settings
+
+
+@dataclass
+class CachedAnswer:
+    system_id: str
+    system_version: Optional[str]
+    question: str
+    vector: np.ndarray
+    answer: str
+    created_at: float
+
+
+class SemanticAnswerCache:
+    """
+    システムIDと質問embeddingをキーにした回答キャッシュ
+    同じシステムへの言い回しが近い質問（コサイン類似度が閾値以上）には保存済みの回答を返す
+    システムの updated_at が変わった場合はそのシステムの回答をすべて破棄する
+    CatalogSync の変更通知を購読し、登録・更新・削除されたシステムの回答も破棄する
+    """
+
+    def __init__(
+        self,
+        embedding_service: EmbeddingService,
+        similarity_threshold: float = 0.92,
+        ttl_seconds: float = 24 * 60 * 60,
+        max_entries: int = 1000
+    ):
+        self.embedding_service = embedding_service
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._by_system: Dict[str, List[int]] = {}
+        self._ids = count()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, embedding_service: EmbeddingService, settings: Settings) -> "SemanticAnswerCache":
+        """Settingsの値からインスタンスを生成"""
+        return cls(
+            embedding_service,
+            similarity_threshold=settings.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+            ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+            max_entries=settings.ANSWER_CACHE_MAX_ENTRIES
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def system_version(system_context: Dict) -> Optional[str]:
+        return system_context.get('updated_at') or system_context.get('created_at')
+
+    def _question_vector(self, question: str) -> np.ndarray:
+        return VectorIndex._normalize(self.embedding_service.get_embedding(question))
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        ids = self._by_system.get(entry.system_id, [])
+        if entry_id in ids:
+            ids.remove(entry_id)
+        if not ids:
+            self._by_system.pop(entry.system_id, None)
+
+    def _live_ids(self, system_id: str, system_version: Optional[str]) -> List[int]:
+        """期限切れ・更新前のシステムの回答を破棄し、有効なエントリのIDを返す"""
+        expires_before = time.time() - self.ttl_seconds
+        for entry_id in list(self._by_system.get(system_id, [])):
+            entry = self._entries[entry_id]
+            if entry.system_version != system_version or entry.created_at < expires_before:
+                self._remove(entry_id)
+        return list(self._by_system.get(system_id, []))
+
+    def get(self, system_context: Dict, question: str) -> Optional[str]:
+        """近い質問への回答が保存されていれば返す"""
+        system_id = system_context['id']
+        with self._lock:
+            has_candidates = bool(self._live_ids(system_id, self.system_version(system_context)))
+            if not has_candidates:
+                self.misses += 1
+                return None
+
+        query = self._question_vector(question)
+        with self._lock:
+            ids = self._live_ids(system_id, self.system_version(system_context))
+            if ids:
+                scores = np.stack([self._entries[entry_id].vector for entry_id in ids]) @ query
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity_threshold:
+                    self._entries.move_to_end(ids[best])
+                    self.hits += 1
+                    return self._entries[ids[best]].answer
+            self.misses += 1
+        return None
+
+    def put(self, system_context: Dict, question: str, answer: str):
+        """回答を保存（上限を超えた場合は最も使われていない回答から削除）"""
+        vector = self._question_vector(question)
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = CachedAnswer(
+                system_id=system_context['id'],
+                system_version=self.system_version(system_context),
+                question=question,
+                vector=vector,
+                answer=answer,
+                created_at=time.time()
+            )
+            self._by_system.setdefault(system_context['id'], []).append(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_system(self, system_id: str):
+        """システムの回答をすべて破棄"""
+        with self._lock:
+            for entry_id in list(self._by_system.get(system_id, [])):
+                self._remove(entry_id)
+
+    def apply_catalog_changes(self, upserts: List[Dict], deleted_ids: List[str]):
+        """CatalogSync の変更通知で、変更・削除されたシステムの回答を破棄"""
+        for system_id in [doc['id'] for doc in upserts] + list(deleted_ids):
+            self.invalidate_system(system_id)
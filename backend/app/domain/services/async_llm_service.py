@@ -0,0 +1,310 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import AsyncIterator, Awaitable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from openai import AsyncOpenAI
+
+from .conversation import ConversationMemory
+from .llm_service import LLMService, DEFAULT_COMPLETION_TOKENS
+from .prompt_context import SystemContextBuilder
+from .question_classifier import QuestionRelevanceClassifier
+from ...config.settings import Settings
+from ...infrastructure.tools.openai_scheduler import Priority, RequestScheduler
+from ...utils.metrics import metrics
+
+T = TypeVar("T")
+
+
+class AsyncLLMService:
+    """
+    AsyncOpenAI を使う LLMService の非同期版
+    質問の検証と回答生成を同時に開始し、検証で却下された場合は回答をキャンセルする
+    """
+    _loop: Optional[asyncio.AbstractEventLoop] = None
+    _loop_lock = threading.Lock()
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "gpt-4-turbo-preview",
+        validation_timeout: float = 20,
+        answer_timeout: float = 60,
+        classifier: Optional[QuestionRelevanceClassifier] = None,
+        description_token_budget: int = 512,
+        conversation_memory: Optional[ConversationMemory] = None,
+        summary_max_tokens: int = 400,
+        client: Optional[AsyncOpenAI] = None,
+        scheduler: Optional[RequestScheduler] = None
+    ):
+        self.client = client or AsyncOpenAI(api_key=api_key)
+        self.scheduler = scheduler or RequestScheduler.shared()
+        self.model = model
+        self.classifier = classifier
+        self.context_builder = SystemContextBuilder(model, description_token_budget)
+        self.conversation_memory = conversation_memory or ConversationMemory(self.context_builder)
+        self.summary_max_tokens = summary_max_tokens
+        self.validation_timeout = validation_timeout
+        self.answer_timeout = answer_timeout
+
+    @classmethod
+    def from_settings(
+        cls,
+        settings: Settings,
+        classifier: Optional[QuestionRelevanceClassifier] = None,
+        conversation_memory: Optional[ConversationMemory] = None,
+        client: Optional[AsyncOpenAI] = None,
+        scheduler: Optional[RequestScheduler] = None
+    ) -> "AsyncLLMService":
+        """Settingsの値からインスタンスを生成"""
+        return cls(
+            settings.OPENAI_API_KEY,
+            model=settings.LLM_MODEL,
+            validation_timeout=settings.LLM_VALIDATION_TIMEOUT_SECONDS,
+            answer_timeout=settings.LLM_ANSWER_TIMEOUT_SECONDS,
+            classifier=classifier,
+            description_token_budget=settings.LLM_CONTEXT_DESCRIPTION_TOKENS,
+            conversation_memory=conversation_memory,
+            summary_max_tokens=settings.LLM_SUMMARY_MAX_TOKENS,
+            client=client,
+            scheduler=scheduler
+        )
+
+    @classmethod
+    def _get_loop(cls) -> asyncio.AbstractEventLoop:
+        """
+        バックグラウンドスレッドで動かす共有イベントループ
+        呼び出しごとにループを作らないため、AsyncOpenAI のコネクションを再利用できる
+        """
+        with cls._loop_lock:
+            if cls._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-event-loop", daemon=True).start()
+                cls._loop = loop
+            return cls._loop
+
+    def run(self, coro: Awaitable[T]) -> T:
+        """同期コード（Streamlitのスクリプトなど）からコルーチンを実行して結果を待つ"""
+        return asyncio.run_coroutine_threadsafe(coro, self._get_loop()).result()
+
+    def iterate(self, stream: AsyncIterator[T]) -> Iterator[T]:
+        """非同期イテレータを同期コードから順に読み出す（st.write_stream 用）"""
+        loop = self._get_loop()
+        try:
+            while True:
+                try:
+                    yield asyncio.run_coroutine_threadsafe(stream.__anext__(), loop).result()
+                except StopAsyncIteration:
+                    return
+        finally:
+            if hasattr(stream, "aclose"):
+                asyncio.run_coroutine_threadsafe(stream.aclose(), loop).result()
+
+    async def create_completion(
+        self,
+        messages: List[Dict],
+        timeout: float,
+        stage: str = "completion",
+        priority: Priority = Priority.INTERACTIVE,
+        **kwargs
+    ):
+        """
+        スケジューラを通して chat.completions.create を呼び出し
+        timeout はレート制限による待ち時間と再試行を含めた上限
+        所要時間は llm / stage のレイテンシとして記録する
+        """
+        estimated_tokens = (
+            self.context_builder.count_message_tokens(messages)
+            + (kwargs.get("max_tokens") or DEFAULT_COMPLETION_TOKENS)
+        )
+        with metrics.span("llm", stage):
+            return await asyncio.wait_for(
+                self.scheduler.acall(
+                    self.model,
+                    estimated_tokens,
+                    self.client.chat.completions.create,
+                    model=self.model,
+                    messages=messages,
+                    priority=priority,
+                    **kwargs
+                ),
+                timeout=timeout
+            )
+
+    async def summarize_conversation(self, summary: str, messages: List[Dict]) -> str:
+        """これまでの要約に新しい会話を畳み込んだ要約を生成"""
+        response = await self.create_completion(
+            LLMService.build_summary_messages(summary, messages),
+            self.answer_timeout,
+            stage="summary",
+            temperature=0,
+            max_tokens=self.summary_max_tokens
+        )
+        return response.choices[0].message.content.strip()
+
+    async def conversation_context(self, chat_history: Optional[List[Dict]]) -> Tuple[str, List[Dict]]:
+        """
+        会話履歴を (要約, 直近のメッセージ) に変換
+        上限からあふれた発言のみを追加で要約し、要約に失敗した場合は古い発言を落として続行する
+        """
+        plan = self.conversation_memory.plan(chat_history)
+        if not plan.fold:
+            return plan.summary, plan.recent
+        try:
+            summary = await self.summarize_conversation(plan.summary, plan.fold)
+        except Exception as e:
+            logging.warning(f"Conversation summary failed: {str(e)}")
+            return plan.summary, plan.recent
+        self.conversation_memory.remember(plan, summary)
+        return summary, plan.recent
+
+    async def validate_architecture_question(
+        self,
+        question: str,
+        system_context: Dict,
+        chat_history: Optional[List[Dict]] = None
+    ) -> Tuple[bool, str]:
+        """システムアーキテクチャに関する質問かどうかを検証（明確な場合はLLMを呼ばない）"""
+        if self.classifier is not None:
+            local_result = await asyncio.to_thread(
+                LLMService.classify_locally, self.classifier, question, chat_history
+            )
+            if local_result is not None:
+                return local_result
+
+        messages = LLMService.validation_messages(self.context_builder, question, system_context, chat_history)
+
+        try:
+            response = await self.create_completion(messages, self.validation_timeout, stage="validation", temperature=0)
+            return LLMService.parse_validation_result(response.choices[0].message.content)
+
+        except asyncio.TimeoutError:
+            return False, "検証がタイムアウトしました。時間をおいて再度お試しください。"
+        except Exception as e:
+            return False, f"検証中にエラーが発生しました: {str(e)}"
+
+    async def get_architecture_answer(
+        self,
+        question: str,
+        system_context: Dict,
+        chat_history: Optional[List[Dict]] = None
+    ) -> str:
+        """システムアーキテクチャに関する質問に回答（会話履歴がある場合は文脈を踏まえて回答）"""
+        try:
+            summary, recent_messages = await self.conversation_context(chat_history)
+            messages = LLMService.answer_messages(self.context_builder, question, system_context, summary, recent_messages)
+
+            response = await self.create_completion(messages, self.answer_timeout, stage="answer", temperature=0.7)
+            return response.choices[0].message.content
+        except asyncio.TimeoutError:
+            return "回答の生成がタイムアウトしました。時間をおいて再度お試しください。"
+        except Exception as e:
+            return f"回答の生成中にエラーが発生しました: {str(e)}"
+
+    async def validate_and_answer(
+        self,
+        question: str,
+        system_context: Dict,
+        chat_history: Optional[List[Dict]] = None
+    ) -> Tuple[bool, str]:
+        """
+        検証と回答生成を投機的に並行実行
+        Returns: (is_valid: bool, message: str) 却下時の message は却下理由
+        """
+        answer_task = asyncio.create_task(self.get_architecture_answer(question, system_context, chat_history))
+        try:
+            is_valid, reason = await self.validate_architecture_question(question, system_context, chat_history)
+        except BaseException:
+            answer_task.cancel()
+            raise
+
+        if not is_valid:
+            answer_task.cancel()
+            try:
+                await answer_task
+            except asyncio.CancelledError:
+                pass
+            return False, reason
+
+        return True, await answer_task
+
+    async def stream_architecture_answer(
+        self,
+        question: str,
+        system_context: Dict,
+        chat_history: Optional[List[Dict]] = None
+    ) -> AsyncIterator[str]:
+        """
+        システムアーキテクチャに関する質問への回答を生成された順にストリーミング
+        チャンク間の待ち時間が answer_timeout を超えた場合は打ち切る
+        """
+        try:
+            summary, recent_messages = await self.conversation_context(chat_history)
+            messages = LLMService.answer_messages(self.context_builder, question, system_context, summary, recent_messages)
+
+            start = time.perf_counter()
+            stream = await self.create_completion(
+                messages,
+                self.answer_timeout,
+                stage="answer_stream_open",
+                temperature=0.7,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            chunks = stream.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=self.answer_timeout)
+                except StopAsyncIteration:
+                    break
+                # 最後のチャンクにだけ usage が入る（choices は空）
+                if getattr(chunk, "usage", None):
+                    metrics.record_llm_usage(self.model, chunk.usage)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+            # 非同期ジェネレータは yield をまたいでスパンを保てないため、全体の時間は直接記録する
+            metrics.observe_stage("llm", "answer_stream", time.perf_counter() - start)
+        except asyncio.TimeoutError:
+            yield "回答の生成がタイムアウトしました。時間をおいて再度お試しください。"
+        except Exception as e:
+            yield f"回答の生成中にエラーが発生しました: {str(e)}"
+
+    async def validate_and_stream(
+        self,
+        question: str,
+        system_context: Dict,
+        chat_history: Optional[List[Dict]] = None
+    ) -> Tuple[bool, str, Optional[AsyncIterator[str]]]:
+        """
+        検証と回答ストリームの最初のチャンクの取得を並行実行
+        Returns: (is_valid: bool, reason: str, stream: Optional[AsyncIterator[str]])
+        """
+        stream = self.stream_architecture_answer(question, system_context, chat_history)
+        first_chunk = asyncio.ensure_future(stream.__anext__())
+        try:
+            is_valid, reason = await self.validate_architecture_question(question, system_context, chat_history)
+        except BaseException:
+            first_chunk.cancel()
+            raise
+
+        if not is_valid:
+            first_chunk.cancel()
+            try:
+                await first_chunk
+            except (asyncio.CancelledError, StopAsyncIteration):
+                pass
+            await stream.aclose()
+            return False, reason, None
+
+        return True, "", self._prepend(first_chunk, stream)
+
+    @staticmethod
+    async def _prepend(first_chunk: "asyncio.Future[str]", stream: AsyncIterator[str]) -> AsyncIterator[str]:
+        """先読みした最初のチャンクに続けて残りのストリームを返す"""
+        try:
+            yield await first_chunk
+        except StopAsyncIteration:
+            return
+        async for delta in stream:
+            yield delta
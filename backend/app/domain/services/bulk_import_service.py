@@ -0,0 +1,307 @@
+import csv
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from .embedding_service import EmbeddingService
+from .register_service import RegisterService
+from ...config.settings import Settings
+from ...infrastructure.repositories.catalog_cache import CatalogCache
+
+
+@dataclass
+class BulkImportReport:
+    total: int = 0
+    imported: int = 0
+    rejected: int = 0
+    skipped: int = 0
+    elapsed_seconds: float = 0.0
+
+    @property
+    def records_per_second(self) -> float:
+        processed = self.imported + self.rejected
+        return processed / self.elapsed_seconds if self.elapsed_seconds > 0 else 0.0
+
+    def to_dict(self) -> Dict:
+        return {**asdict(self), "records_per_second": round(self.records_per_second, 2)}
+
+
+class ImportCheckpoint:
+    """
+    取り込みの進捗を記録するファイル
+    completed 未満の行と done に含まれる行は取り込み済み（並行して登録するため完了順は前後する）
+    """
+
+    def __init__(self, path: Optional[str], source: str):
+        self.path = Path(path) if path else None
+        self.source = os.path.abspath(source)
+        self.completed = 0
+        self.done: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def load(self) -> "ImportCheckpoint":
+        if self.path is None or not self.path.exists():
+            return self
+        with open(self.path, encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get("source") != self.source:
+            raise ValueError(f"Checkpoint {self.path} belongs to a different source: {data.get('source')}")
+        self.completed = data.get("completed", 0)
+        self.done = set(data.get("done", []))
+        return self
+
+    def is_done(self, line: int) -> bool:
+        return line < self.completed or line in self.done
+
+    def mark(self, line: int):
+        """行の完了を記録し、連続して完了した範囲を completed にまとめる"""
+        with self._lock:
+            self.done.add(line)
+            while self.completed in self.done:
+                self.done.remove(self.completed)
+                self.completed += 1
+
+    def save(self):
+        if self.path is None:
+            return
+        with self._lock:
+            data = {"source": self.source, "completed": self.completed, "done": sorted(self.done)}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        tmp_path.replace(self.path)
+
+
+class BulkImportService:
+    """
+    JSONL / CSV のシステム一覧を一括登録
+    - ファイルを1行ずつ読み、validate_system_data で検証
+    - 説明の embedding をバッチ単位で生成（登録済みのベクトルがあれば再利用）
+    - 登録APIを並行数の上限付きで呼び出し、実行中の登録が上限に達したら読み込みを待つ
+    - 進捗をチェックポイントに記録し、中断した取り込みを途中から再開
+      チェックポイントは checkpoint_interval ごとに保存するため、異常終了後の再開では直前の区間のレコードを
+      再送する（at-least-once）。重複登録を防ぐため、ファイルと行番号から決まる Idempotency-Key を付けて登録する
+      （登録APIがキーに対応していない場合は重複しうる）
+    - 不正なレコードや登録に失敗したレコードは理由付きでリジェクトファイルに出力（そのまま再取り込み可能）
+    - 1件ずつカタログのレプリカに反映すると検索インデックスの更新で登録が直列になるため、
+      register_service には catalog_cache を持たないものを渡し、終了時に catalog_cache を1回だけ無効化する
+    """
+
+    def __init__(
+        self,
+        register_service: RegisterService,
+        embedding_service: EmbeddingService,
+        batch_size: int = 100,
+        max_concurrency: int = 8,
+        max_retries: int = 2,
+        checkpoint_interval: float = 1.0,
+        catalog_cache: Optional[CatalogCache] = None
+    ):
+        self.register_service = register_service
+        self.embedding_service = embedding_service
+        self.catalog_cache = catalog_cache
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.checkpoint_interval = checkpoint_interval
+
+    @classmethod
+    def from_settings(
+        cls,
+        settings: Settings,
+        register_service: RegisterService,
+        embedding_service: EmbeddingService,
+        catalog_cache: Optional[CatalogCache] = None
+    ) -> "BulkImportService":
+        """Settingsの値からインスタンスを生成"""
+        return cls(
+            register_service,
+            embedding_service,
+            batch_size=settings.BULK_IMPORT_BATCH_SIZE,
+            max_concurrency=settings.BULK_IMPORT_CONCURRENCY,
+            catalog_cache=catalog_cache
+        )
+
+    @staticmethod
+    def _from_csv_row(row: Dict[str, str]) -> Dict:
+        """CSVの行を登録データに変換（cloud_services はカンマ区切り、team / repository は文字列またはJSON）"""
+        def nested(value: Optional[str], key: str) -> Dict:
+            value = (value or "").strip()
+            if value.startswith("{"):
+                return json.loads(value)
+            return {key: value}
+
+        record = {key: value for key, value in row.items() if key and value is not None}
+        record["cloud_services"] = [
+            service.strip() for service in record.get("cloud_services", "").split(",") if service.strip()
+        ]
+        record["team"] = nested(record.get("team", record.pop("team_primary", None)), "primary")
+        record["repository"] = nested(
+            record.get("repository", record.pop("repository_application", None)),
+            "application"
+        )
+        return record
+
+    @staticmethod
+    def _from_json_line(text: str) -> Optional[Dict]:
+        """JSONLの行を登録データに変換（空行は None）"""
+        return json.loads(text) if text.strip() else None
+
+    def read_records(self, path: str) -> Iterator[Tuple[int, Dict, Optional[str]]]:
+        """
+        ファイルから (行番号, レコード, エラー) を順に読み込む（"_" で始まる項目はリジェクト時の注記として除く）
+        解釈できない行は中断せず、元の内容を "_raw" に入れてエラーとともに返す
+        """
+        is_csv = Path(path).suffix.lower() == ".csv"
+        with open(path, encoding='utf-8', newline='') as f:
+            if is_csv:
+                rows = ((row, self._from_csv_row) for row in csv.DictReader(f))
+            else:
+                rows = ((text, self._from_json_line) for text in f)
+            for line, (raw, parse) in enumerate(rows):
+                if not is_csv:
+                    raw = raw.rstrip("\r\n")
+                try:
+                    record = parse(raw)
+                except (ValueError, TypeError, AttributeError) as e:
+                    yield line, {"_raw": raw}, f"parse error: {str(e)}"
+                    continue
+                if record is None:
+                    continue
+                if not isinstance(record, dict):
+                    yield line, {"_raw": raw}, "レコードはJSONオブジェクトである必要があります"
+                    continue
+                yield line, {key: value for key, value in record.items() if not key.startswith("_")}, None
+
+    def _batches(
+        self,
+        records: Iterator[Tuple[int, Dict, Optional[str]]]
+    ) -> Iterator[List[Tuple[int, Dict, Optional[str]]]]:
+        batch = []
+        for item in records:
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _embed(self, records: List[Dict]) -> List[Dict]:
+        """説明の embedding をまとめて生成して登録データに付与"""
+        missing = [record for record in records if self.embedding_service.get_stored_vector(record) is None]
+        if missing:
+            vectors = self.embedding_service.get_embeddings([record["description"] for record in missing])
+            for record, vector in zip(missing, vectors):
+                record["description_vector"] = vector.tolist()
+                record["embedding_model"] = self.embedding_service.model
+        return records
+
+    @staticmethod
+    def idempotency_key(source: str, line: int) -> str:
+        """取り込み元のファイルと行番号から決まる登録のキー（再開や再試行で同じ値になる）"""
+        return hashlib.sha256(f"{os.path.abspath(source)}:{line}".encode('utf-8')).hexdigest()
+
+    def _register(self, record: Dict, idempotency_key: str):
+        """登録APIを呼び出し（検証エラー以外は待ち時間を延ばしながら再試行）"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.register_service.register_system(record, idempotency_key=idempotency_key)
+            except ValueError:
+                raise
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(0.5 * 2 ** attempt)
+
+    def run(
+        self,
+        path: str,
+        checkpoint_path: Optional[str] = None,
+        reject_path: Optional[str] = None,
+        progress: Optional[Callable[[BulkImportReport], None]] = None
+    ) -> BulkImportReport:
+        """ファイルのシステムを一括登録して結果を返す"""
+        checkpoint = ImportCheckpoint(checkpoint_path, path).load()
+        report = BulkImportReport()
+        report_lock = threading.Lock()
+        reject_file = open(reject_path, 'a', encoding='utf-8') if reject_path else None
+        # 実行中の登録数の上限（上限に達したら読み込みと embedding を待たせる）
+        in_flight = threading.BoundedSemaphore(self.max_concurrency * 2)
+        started_at = time.perf_counter()
+        last_saved = started_at
+
+        def reject(line: int, record: Dict, error: str):
+            with report_lock:
+                report.rejected += 1
+                if reject_file is not None:
+                    reject_file.write(json.dumps({**record, "_line": line, "_error": error}, ensure_ascii=False) + "\n")
+            checkpoint.mark(line)
+
+        def register(line: int, record: Dict):
+            try:
+                self._register(record, self.idempotency_key(path, line))
+                with report_lock:
+                    report.imported += 1
+                checkpoint.mark(line)
+            except Exception as e:
+                record = {key: value for key, value in record.items() if key != "description_vector"}
+                reject(line, record, str(e))
+            finally:
+                in_flight.release()
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                for batch in self._batches(self.read_records(path)):
+                    pending = []
+                    for line, record, read_error in batch:
+                        report.total += 1
+                        if checkpoint.is_done(line):
+                            report.skipped += 1
+                            continue
+                        if read_error is not None:
+                            reject(line, record, read_error)
+                            continue
+                        is_valid, error_message = self.register_service.validate_system_data(record)
+                        if is_valid:
+                            pending.append((line, record))
+                        else:
+                            reject(line, record, error_message)
+
+                    try:
+                        self._embed([record for _, record in pending])
+                    except Exception as e:
+                        logging.warning(f"Embedding batch failed: {str(e)}")
+                        for line, record in pending:
+                            reject(line, record, f"embedding failed: {str(e)}")
+                        pending = []
+
+                    for line, record in pending:
+                        in_flight.acquire()
+                        executor.submit(register, line, record)
+
+                    now = time.perf_counter()
+                    report.elapsed_seconds = now - started_at
+                    if now - last_saved >= self.checkpoint_interval:
+                        checkpoint.save()
+                        last_saved = now
+                    if progress is not None:
+                        progress(report)
+        finally:
+            checkpoint.save()
+            if reject_file is not None:
+                reject_file.close()
+            # 登録したシステムは次回の取得時の差分同期でまとめてレプリカに反映する
+            if self.catalog_cache is not None and report.imported:
+                self.catalog_cache.invalidate()
+
+        report.elapsed_seconds = time.perf_counter() - started_at
+        logging.info(f"Bulk import finished: {report.to_dict()}")
+        return report
@@ -0,0 +1,104 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Union
+
+from .prompt_context import SystemContextBuilder
+from ..schemas import ChatMessage
+
+
+@dataclass
+class ConversationPlan:
+    summary: str
+    fold: List[Dict] = field(default_factory=list)
+    recent: List[Dict] = field(default_factory=list)
+    key: Optional[str] = None
+
+
+class ConversationMemory:
+    """
+    マルチターンの会話履歴をトークン数の上限内に収める
+    直近の発言はそのまま残し、上限からあふれた古い発言は要約に畳み込む
+    要約は「そこまでの発言列のハッシュ」をキーに保持するため、次の質問では新しくあふれた発言だけを追加で要約すればよい
+    """
+
+    def __init__(
+        self,
+        context_builder: SystemContextBuilder,
+        history_token_budget: int = 1500,
+        max_summaries: int = 1000
+    ):
+        self.context_builder = context_builder
+        self.history_token_budget = history_token_budget
+        self.max_summaries = max_summaries
+        self._summaries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(chat_history: Sequence[Union[Dict, ChatMessage]]) -> List[Dict]:
+        """セッションの履歴（dict または ChatMessage）を role/content のみのメッセージに変換"""
+        messages = []
+        for message in chat_history or []:
+            if isinstance(message, ChatMessage):
+                messages.append({"role": message.role, "content": message.content})
+            else:
+                messages.append({"role": message["role"], "content": message["content"]})
+        return messages
+
+    @staticmethod
+    def _prefix_keys(messages: List[Dict]) -> List[str]:
+        """keys[i] は messages[:i + 1] を表すハッシュ"""
+        keys = []
+        digest = b""
+        for message in messages:
+            hasher = hashlib.blake2b(digest, digest_size=16)
+            hasher.update(f"{message['role']}\0{message['content']}".encode('utf-8'))
+            digest = hasher.digest()
+            keys.append(digest.hex())
+        return keys
+
+    def plan(self, chat_history: Sequence[Union[Dict, ChatMessage]]) -> ConversationPlan:
+        """
+        保存済みの要約、新たに要約へ畳み込む発言、そのまま送る直近の発言に分ける
+        上限を超えた場合は直近の発言が上限の半分になるまでまとめて畳み込み、要約の更新を数ターンに1回にする
+        """
+        messages = self.normalize(chat_history)
+        keys = self._prefix_keys(messages)
+
+        boundary = 0
+        summary = ""
+        with self._lock:
+            for end in range(len(messages), 0, -1):
+                if keys[end - 1] in self._summaries:
+                    boundary = end
+                    summary = self._summaries[keys[end - 1]]
+                    self._summaries.move_to_end(keys[end - 1])
+                    break
+
+        recent = messages[boundary:]
+        tokens = [self.context_builder.count_tokens(message["content"]) for message in recent]
+        total = sum(tokens)
+        if total <= self.history_token_budget:
+            return ConversationPlan(summary=summary, recent=recent)
+
+        cut = 0
+        while cut < len(recent) and total > self.history_token_budget // 2:
+            total -= tokens[cut]
+            cut += 1
+        return ConversationPlan(
+            summary=summary,
+            fold=recent[:cut],
+            recent=recent[cut:],
+            key=keys[boundary + cut - 1]
+        )
+
+    def remember(self, plan: ConversationPlan, summary: str):
+        """畳み込み後の要約を保存（上限を超えた場合は最も使われていない要約から削除）"""
+        if plan.key is None:
+            return
+        with self._lock:
+            self._summaries[plan.key] = summary
+            self._summaries.move_to_end(plan.key)
+            while len(self._summaries) > self.max_summaries:
+                self._summaries.popitem(last=False)
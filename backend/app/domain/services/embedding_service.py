@@ -1,56 +1,398 @@
-from typing import List, Dict
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+import hashlib
+import logging
+import threading
+from pathlib import Path
 import numpy as np
 from openai import OpenAI
-import pickle
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from .vector_index import VectorIndex
+from .ann_index import IVFIndex
+from ...config.settings import Settings
+from ...infrastructure.tools.embedding_cache import EmbeddingCacheStore, TieredEmbeddingCache
+from ...infrastructure.tools.openai_scheduler import Priority, RequestScheduler
+from ...utils.metrics import metrics
 
 
 class EmbeddingService:
-    def __init__(self, api_key: str, cache_dir: str = "embeddings_cache"):
-        self.client = OpenAI(api_key=api_key)
-        self.cache_dir = Path(cache_dir)
-        self.cache_dir.mkdir(exist_ok=True)
+    # embeddings.create の1リクエストあたりの上限
+    MAX_BATCH_INPUTS = 2048
+    MAX_BATCH_TOKENS = 300000
+    # 近似最近傍インデックス構築後の変更がこの割合を超えたら再構築する
+    ANN_REBUILD_RATIO = 0.1
 
-    def _get_cache_path(self, text: str) -> Path:
-        """キャッシュファイルのパスを生成"""
-        import hashlib
-        text_hash = hashlib.md5(text.encode()).hexdigest()
-        return self.cache_dir / f"{text_hash}.pkl"
+    def __init__(
+        self,
+        api_key: str,
+        cache_dir: str = "embeddings_cache",
+        max_concurrency: int = 4,
+        model: str = "text-embedding-3-small",
+        dimensions: int = 1536,
+        memory_cache_bytes: int = 64 * 1024 * 1024,
+        max_cache_bytes: int = 1024 * 1024 * 1024,
+        cache_ttl_seconds: Optional[int] = None,
+        ann_min_size: int = 20000,
+        ann_nlist: Optional[int] = None,
+        ann_nprobe: int = 8,
+        ann_index_path: Optional[str] = None,
+        client: Optional[OpenAI] = None,
+        scheduler: Optional[RequestScheduler] = None
+    ):
+        self.client = client or OpenAI(api_key=api_key)
+        self.scheduler = scheduler or RequestScheduler.shared()
+        self.cache = TieredEmbeddingCache(
+            cache_dir,
+            memory_bytes=memory_cache_bytes,
+            max_disk_bytes=max_cache_bytes,
+            ttl_seconds=cache_ttl_seconds
+        )
+        self.max_concurrency = max_concurrency
+        self.model = model
+        self.dimensions = dimensions
+        self.index = VectorIndex(self.dimensions)
+        self.ann_index: Optional[IVFIndex] = None
+        self.ann_min_size = ann_min_size
+        self.ann_nlist = ann_nlist
+        self.ann_nprobe = ann_nprobe
+        self.ann_index_path = ann_index_path
+        self._indexed_documents: Dict[str, Dict] = {}
+        self._index_signature: Optional[str] = None
+        # 近似最近傍インデックス構築後に追加・更新・削除されたid
+        self._ann_stale: Set[str] = set()
+        # バックグラウンドで再構築中のスレッドと、再構築用のスナップショット以降に変更されたid
+        self._ann_rebuild: Optional[threading.Thread] = None
+        self._ann_changed_during_rebuild: Set[str] = set()
+        # build_index で作り直した場合に、それより前に始まった再構築の結果を捨てるための世代
+        self._ann_generation = 0
+        self._index_lock = threading.RLock()
 
-    def get_embedding(self, text: str, use_cache: bool = True) -> np.ndarray:
-        """テキストのembeddingを取得（キャッシュ対応）"""
-        cache_path = self._get_cache_path(text)
+    @classmethod
+    def from_settings(
+        cls,
+        settings: Settings,
+        client: Optional[OpenAI] = None,
+        scheduler: Optional[RequestScheduler] = None
+    ) -> "EmbeddingService":
+        """Settingsの値からインスタンスを生成（client を渡した場合は共有のOpenAIクライアントを使う）"""
+        return cls(
+            settings.OPENAI_API_KEY,
+            cache_dir=settings.EMBEDDING_CACHE_DIR,
+            model=settings.EMBEDDING_MODEL,
+            dimensions=settings.EMBEDDING_DIMENSIONS,
+            memory_cache_bytes=settings.EMBEDDING_MEMORY_CACHE_BYTES,
+            max_cache_bytes=settings.EMBEDDING_CACHE_MAX_BYTES,
+            cache_ttl_seconds=settings.EMBEDDING_CACHE_TTL_SECONDS,
+            ann_min_size=settings.ANN_MIN_CATALOG_SIZE,
+            ann_nlist=settings.ANN_NLIST,
+            ann_nprobe=settings.ANN_NPROBE,
+            ann_index_path=settings.ANN_INDEX_PATH,
+            client=client,
+            scheduler=scheduler
+        )
+
+    def _cache_key(self, text: str) -> bytes:
+        """モデル名・次元数を含むキャッシュキーを生成"""
+        return EmbeddingCacheStore.make_key(text, self.model, self.dimensions)
+
+    def _load_cache(self, text: str) -> Optional[np.ndarray]:
+        """キャッシュ済みのembeddingを読み込み（未キャッシュならNone）"""
+        return self.cache.get(self._cache_key(text))
+
+    def _load_cache_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """複数テキストのキャッシュ済みembeddingをまとめて読み込み（未キャッシュはNone）"""
+        return self.cache.get_many([self._cache_key(text) for text in texts])
+
+    def _save_cache(self, texts: List[str], embeddings: List[np.ndarray]):
+        """embeddingをキャッシュに保存"""
+        self.cache.put_many(
+            (self._cache_key(text), embedding) for text, embedding in zip(texts, embeddings)
+        )
+
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        """トークン数の上限見積もり（1トークンは必ず1バイト以上）"""
+        return max(len(text.encode()), 1)
 
-        if use_cache and cache_path.exists():
-            with open(cache_path, 'rb') as f:
-                return pickle.load(f)
+    def _chunk_texts(self, texts: List[str]) -> List[List[str]]:
+        """入力件数とトークン数の上限に収まるようにテキストを分割"""
+        chunks: List[List[str]] = []
+        current: List[str] = []
+        current_tokens = 0
+        for text in texts:
+            tokens = self._estimate_tokens(text)
+            if current and (
+                len(current) >= self.MAX_BATCH_INPUTS
+                or current_tokens + tokens > self.MAX_BATCH_TOKENS
+            ):
+                chunks.append(current)
+                current, current_tokens = [], 0
+            current.append(text)
+            current_tokens += tokens
+        if current:
+            chunks.append(current)
+        return chunks
 
-        response = self.client.embeddings.create(
-            model="text-embedding-3-small",
-            input=text,
-            dimensions=1536
+    def _embed_batch(self, texts: List[str], priority: Priority = Priority.BACKGROUND) -> List[np.ndarray]:
+        """1リクエストで複数テキストのembeddingを取得（レート制限はスケジューラで調整）"""
+        response = self.scheduler.call(
+            self.model,
+            sum(self._estimate_tokens(text) for text in texts),
+            self.client.embeddings.create,
+            model=self.model,
+            input=texts,
+            dimensions=self.dimensions,
+            priority=priority
         )
+        data = sorted(response.data, key=lambda d: d.index)
+        return [np.array(d.embedding, dtype=np.float32) for d in data]
+
+    def get_embedding(self, text: str, use_cache: bool = True) -> np.ndarray:
+        """テキストのembeddingを取得（キャッシュ対応）"""
+        if use_cache:
+            cached = self._load_cache(text)
+            metrics.record_cache("embedding", cached is not None)
+            if cached is not None:
+                return cached
 
-        embedding = np.array(response.data[0].embedding)
+        with metrics.span("embedding", "query_embedding"):
+            embedding = self._embed_batch([text], priority=Priority.INTERACTIVE)[0]
 
         if use_cache:
-            with open(cache_path, 'wb') as f:
-                pickle.dump(embedding, f)
+            self._save_cache([text], [embedding])
 
         return embedding
 
-    def calculate_similarity(self, query: str, documents: List[Dict])-> List[Dict]:
-        """クエリと各ドキュメントの類似度を計算"""
-        query_embedding = self.get_embedding(query)
+    def get_embeddings(
+        self,
+        texts: List[str],
+        use_cache: bool = True,
+        priority: Priority = Priority.BACKGROUND
+    ) -> List[np.ndarray]:
+        """
+        複数テキストのembeddingをまとめて取得（キャッシュ対応）
+        未キャッシュのテキストのみをチャンクに分けて並列にAPIへ送信する
+        既定ではバックグラウンドの優先度で送信し、対話的なリクエストを待たせない
+        """
+        embeddings: Dict[str, np.ndarray] = {}
+        misses: List[str] = []
+        unique_texts = list(dict.fromkeys(texts))
+        cached_vectors = self._load_cache_many(unique_texts) if use_cache else [None] * len(unique_texts)
+        for text, cached in zip(unique_texts, cached_vectors):
+            if cached is not None:
+                embeddings[text] = cached
+            else:
+                misses.append(text)
+        if use_cache:
+            metrics.record_cache("embedding", True, len(embeddings))
+            metrics.record_cache("embedding", False, len(misses))
+
+        if misses:
+            chunks = self._chunk_texts(misses)
+            max_workers = max(1, min(self.max_concurrency, len(chunks)))
+            with metrics.span("embedding", "batch_embeddings"), ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for chunk, vectors in zip(chunks, executor.map(lambda chunk: self._embed_batch(chunk, priority), chunks)):
+                    embeddings.update(zip(chunk, vectors))
+                    if use_cache:
+                        self._save_cache(chunk, vectors)
+
+        return [embeddings[text] for text in texts]
+
+    def get_stored_vector(self, doc: Dict) -> Optional[np.ndarray]:
+        """
+        カタログに保存済みのdescription_vectorを取得
+        ベクトルがない、またはモデル名・次元数が一致しない場合はNone
+        """
+        vector = doc.get('description_vector')
+        if not vector:
+            return None
+        model = doc.get('embedding_model')
+        if model is not None and model != self.model:
+            return None
+        if len(vector) != self.dimensions:
+            return None
+        return np.asarray(vector, dtype=np.float32)
 
-        results = []
+    def _document_embeddings(self, documents: List[Dict]) -> List[np.ndarray]:
+        """保存済みのdescription_vectorを優先し、使えないドキュメントのみembeddingを取得"""
+        embeddings = [self.get_stored_vector(doc) for doc in documents]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            fetched = self.get_embeddings([documents[i]['description'] for i in missing])
+            for i, embedding in zip(missing, fetched):
+                embeddings[i] = embedding
+        return embeddings
+
+    def build_index(self, documents: List[Dict]):
+        """
+        カタログのembeddingからインデックスを構築（カタログが変わっていなければ再利用）
+        保存済みのdescription_vectorを優先し、使えないドキュメントのみembeddingを取得する
+        """
+        with self._index_lock:
+            self._indexed_documents = {doc['id']: doc for doc in documents}
+            signature = self._catalog_signature(documents)
+            if signature == self._index_signature:
+                return
+
+            with metrics.span("embedding", "index_build"):
+                embeddings = self._document_embeddings(documents)
+                ids = [doc['id'] for doc in documents]
+                self.index.build(ids, embeddings)
+                self.ann_index = self._build_ann_index(ids, embeddings, signature)
+                self._ann_stale = set()
+                self._ann_generation += 1
+                self._index_signature = signature
+
+    def apply_catalog_changes(self, upserts: List[Dict], deleted_ids: List[str]):
+        """
+        カタログの差分をインデックスに反映（CatalogSync の購読用）
+        変更されたドキュメントのみembeddingを取得し、インデックス全体は作り直さない
+        近似最近傍インデックスの再構築はバックグラウンドで行い、その間の検索は待たせない
+        """
+        with metrics.span("embedding", "index_update"):
+            embeddings = self._document_embeddings(upserts) if upserts else []
+            with self._index_lock:
+                if upserts:
+                    self.index.upsert([doc['id'] for doc in upserts], embeddings)
+                    self._indexed_documents.update((doc['id'], doc) for doc in upserts)
+                moved = []
+                if deleted_ids:
+                    moved = self.index.remove(deleted_ids)
+                    for doc_id in deleted_ids:
+                        self._indexed_documents.pop(doc_id, None)
+                self._index_signature = None
+
+                changed = [doc['id'] for doc in upserts] + list(deleted_ids)
+                if self.ann_index is not None:
+                    self._ann_stale.update(changed)
+                if self._ann_rebuild is not None:
+                    # 構築中のスナップショットは行列を共有しているため、行が書き換わったidも構築後に厳密インデックスで採点する
+                    self._ann_changed_during_rebuild.update(changed)
+                    self._ann_changed_during_rebuild.update(moved)
+                if self._needs_ann_rebuild():
+                    self._schedule_ann_rebuild()
+
+    def _needs_ann_rebuild(self) -> bool:
+        if self.ann_index is None:
+            return len(self.index) >= self.ann_min_size
+        return len(self._ann_stale) > self.ANN_REBUILD_RATIO * len(self.ann_index)
+
+    def _schedule_ann_rebuild(self):
+        """
+        近似最近傍インデックスを現在の厳密インデックスのスナップショットから別スレッドで再構築（_index_lock を保持して呼ぶ）
+        構築中の検索はこれまでのインデックスと、変更分を採点する厳密インデックスで答える
+        行列は複製せずに参照する（構築中に書き換わった行のidは _ann_changed_during_rebuild に入り、構築後も厳密インデックスで採点する）
+        """
+        if self._ann_rebuild is not None:
+            # 構築中の場合は完了時に、それまでの変更で改めて判定する
+            return
+        if len(self.index) < self.ann_min_size:
+            self.ann_index = None
+            self._ann_stale = set()
+            return
+
+        self._ann_changed_during_rebuild = set()
+        self._ann_rebuild = threading.Thread(
+            target=self._rebuild_ann_index,
+            args=(
+                self._ann_generation,
+                self.index.ids,
+                self.index.vectors,
+                self._catalog_signature(self._indexed_documents.values())
+            ),
+            name="ann-index-rebuild",
+            daemon=True
+        )
+        self._ann_rebuild.start()
+
+    def _rebuild_ann_index(self, generation: int, ids: List[str], vectors: np.ndarray, signature: str):
+        try:
+            with metrics.span("embedding", "ann_rebuild"):
+                ann_index = self._build_ann_index(ids, vectors, signature)
+        except Exception as e:
+            logging.error(f"Failed to rebuild ANN index: {str(e)}")
+            with self._index_lock:
+                self._ann_rebuild = None
+            return
+
+        with self._index_lock:
+            self._ann_rebuild = None
+            if generation != self._ann_generation:
+                return
+            self.ann_index = ann_index
+            self._ann_stale = self._ann_changed_during_rebuild if ann_index is not None else set()
+            self._ann_changed_during_rebuild = set()
+            if self._needs_ann_rebuild():
+                self._schedule_ann_rebuild()
+
+    @staticmethod
+    def _catalog_signature(documents: Iterable[Dict]) -> str:
+        """カタログの内容を表すプロセス間で安定したハッシュ"""
+        digest = hashlib.blake2b(digest_size=16)
         for doc in documents:
-            doc_embedding = self.get_embedding(doc['description'])
-            similarity = np.dot(query_embedding, doc_embedding) / (
-                np.linalg.norm(query_embedding) * np.linalg.norm(doc_embedding)
-            )
-            doc_copy = doc.copy()
-            doc_copy['similarity'] = float(similarity * 100)
-            results.append(doc_copy)
-
-        return sorted(results, key=lambda x: x['similarity'], reverse=True)
+            digest.update(f"{doc['id']}\0{doc['description']}\0{doc.get('updated_at')}\n".encode())
+        return digest.hexdigest()
+
+    def _build_ann_index(self, ids: List[str], embeddings: Sequence[np.ndarray], signature: str) -> Optional[IVFIndex]:
+        """
+        カタログが十分に大きい場合のみ近似最近傍インデックスを構築
+        保存済みのインデックスがカタログと一致すれば再利用する
+        """
+        if len(ids) < self.ann_min_size:
+            return None
+
+        if self.ann_index_path and Path(self.ann_index_path).exists():
+            ann_index = IVFIndex.load(self.ann_index_path)
+            if ann_index.signature == signature:
+                ann_index.nprobe = self.ann_nprobe
+                return ann_index
+
+        ann_index = IVFIndex(self.dimensions, nlist=self.ann_nlist, nprobe=self.ann_nprobe)
+        ann_index.build(ids, embeddings, signature=signature)
+        if self.ann_index_path:
+            ann_index.save(self.ann_index_path)
+        return ann_index
+
+    def _search_index(self, query_embedding: np.ndarray, top_k: Optional[int]) -> List[Tuple[str, float]]:
+        """
+        上位k件の検索は大規模カタログなら近似最近傍インデックスを使う
+        構築後に変更されたドキュメントは厳密インデックスで採点して結果に統合する
+        """
+        if top_k is None or self.ann_index is None:
+            return self.index.search(query_embedding, top_k)
+
+        stale = self._ann_stale
+        hits = [
+            (doc_id, score)
+            for doc_id, score in self.ann_index.search(query_embedding, top_k + len(stale))
+            if doc_id not in stale
+        ]
+        hits.extend(self.index.score_ids(query_embedding, stale))
+        return sorted(hits, key=lambda hit: hit[1], reverse=True)[:top_k]
+
+    def calculate_similarity(
+        self,
+        query: str,
+        documents: Optional[List[Dict]] = None,
+        top_k: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        クエリと各ドキュメントの類似度を計算
+        documents を省略した場合は apply_catalog_changes で同期済みのインデックスを使う
+        top_k を指定した場合は類似度の高い上位k件のみを返す
+        """
+        if documents is not None:
+            self.build_index(documents)
+        query_embedding = self.get_embedding(query)
+
+        with metrics.span("embedding", "similarity"), self._index_lock:
+            return [
+                {**self._indexed_documents[doc_id], 'similarity': score * 100}
+                for doc_id, score in self._search_index(query_embedding, top_k)
+            ]
+
+    def similarity_scores(self, query: str, ids: Iterable[str]) -> Dict[str, float]:
+        """指定したドキュメントのみのクエリとの類似度（キーワード検索の結果との統合に使う）"""
+        query_embedding = self.get_embedding(query)
+        with metrics.span("embedding", "similarity_scores"), self._index_lock:
+            return {doc_id: score * 100 for doc_id, score in self.index.score_ids(query_embedding, ids)}
@@ -0,0 +1,127 @@
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ...infrastructure.repositories.catalog_cache import CatalogCache
+
+
+class FacetIndex:
+    """
+    プロバイダー・チーム・利用サービスごとのシステムの集合を整数のビットマップで保持するファセットインデックス
+    カタログのバージョンごとに1回だけ構築し、フィルタはビット演算（集合の積）で評価する
+    """
+    FACETS = ("cloud_provider", "team", "cloud_services")
+    # チーム名が空のシステムもチームのフィルターで選べるようにまとめる値
+    UNASSIGNED_TEAM = "(未設定)"
+
+    def __init__(self):
+        self.version: Optional[int] = None
+        self._documents: List[Dict] = []
+        self._positions: Dict[str, int] = {}
+        self._postings: Dict[str, Dict[str, int]] = {facet: {} for facet in self.FACETS}
+        self._all = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    @staticmethod
+    def facet_values(doc: Dict, facet: str) -> List[str]:
+        """ドキュメントのファセットの値"""
+        if facet == "team":
+            team = (doc.get("team") or {}).get("primary")
+            return [team or FacetIndex.UNASSIGNED_TEAM]
+        value = doc.get(facet)
+        if isinstance(value, list):
+            return [item for item in value if item]
+        return [value] if value else []
+
+    def build(self, documents: List[Dict], version: Optional[int] = None):
+        """ファセットごとのビットマップを構築"""
+        postings: Dict[str, Dict[str, int]] = {facet: {} for facet in self.FACETS}
+        for position, doc in enumerate(documents):
+            bit = 1 << position
+            for facet in self.FACETS:
+                facet_postings = postings[facet]
+                for value in self.facet_values(doc, facet):
+                    facet_postings[value] = facet_postings.get(value, 0) | bit
+
+        with self._lock:
+            self._documents = list(documents)
+            self._positions = {doc['id']: position for position, doc in enumerate(self._documents)}
+            self._postings = postings
+            self._all = (1 << len(self._documents)) - 1
+            self.version = version
+
+    def ensure(self, catalog_cache: CatalogCache) -> "FacetIndex":
+        """カタログのバージョンが変わっている場合のみ作り直す"""
+        version, documents = catalog_cache.snapshot()
+        if version != self.version:
+            self.build(documents, version)
+        return self
+
+    def values(self, facet: str) -> List[str]:
+        """ファセットの値の一覧"""
+        return sorted(self._postings[facet])
+
+    def mask(
+        self,
+        any_of: Optional[Dict[str, Iterable[str]]] = None,
+        all_of: Optional[Dict[str, Iterable[str]]] = None
+    ) -> int:
+        """
+        条件に一致するシステムのビットマップ
+        any_of: ファセットごとにいずれかの値を持つ（選択が空の場合は一致なし）
+        all_of: ファセットごとにすべての値を持つ（選択が空の場合は条件なし）
+        """
+        result = self._all
+        for facet, selected in (any_of or {}).items():
+            postings = self._postings[facet]
+            union = 0
+            for value in selected:
+                union |= postings.get(value, 0)
+            result &= union
+        for facet, selected in (all_of or {}).items():
+            postings = self._postings[facet]
+            for value in selected:
+                result &= postings.get(value, 0)
+        return result
+
+    def mask_of_ids(self, ids: Iterable[str]) -> int:
+        """指定したidのシステムのビットマップ（キーワード検索の結果との積に使う）"""
+        result = 0
+        for doc_id in ids:
+            position = self._positions.get(doc_id)
+            if position is not None:
+                result |= 1 << position
+        return result
+
+    def contains(self, mask: int, doc_id: str) -> bool:
+        position = self._positions.get(doc_id)
+        return position is not None and bool(mask >> position & 1)
+
+    def counts(self, facet: str, mask: int) -> Dict[str, int]:
+        """ビットマップに含まれるシステムのファセット値ごとの件数"""
+        return {
+            value: (posting & mask).bit_count()
+            for value, posting in self._postings[facet].items()
+        }
+
+    def _iter_positions(self, mask: int) -> Iterator[int]:
+        while mask:
+            low = mask & -mask
+            yield low.bit_length() - 1
+            mask ^= low
+
+    def page(self, mask: int, offset: int, limit: int) -> Tuple[int, List[Dict]]:
+        """
+        ビットマップに含まれるシステムの件数と、offset から limit 件のシステム（カタログ順）
+        表示するページの分だけドキュメントを取り出す
+        """
+        total = mask.bit_count()
+        documents = []
+        for index, position in enumerate(self._iter_positions(mask)):
+            if index >= offset + limit:
+                break
+            if index >= offset:
+                documents.append(self._documents[position])
+        return total, documents
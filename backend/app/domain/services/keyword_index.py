@@ -0,0 +1,180 @@
+import bisect
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 英数字は単語単位、それ以外（日本語など）は連続した文字列を n-gram に分割する
+ASCII_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+NON_ASCII_RUN_PATTERN = re.compile(r"[^\x00-\x7f\W]+")
+
+
+def tokenize(text: str, query: bool = False) -> List[str]:
+    """
+    日本語向けのトークン分割
+    NFKC正規化・小文字化した上で、英数字は単語、日本語は文字バイグラム（索引時はユニグラムも）にする
+    クエリ側は1文字の語のみユニグラムを使い、2文字以上はバイグラムで照合する
+    """
+    text = unicodedata.normalize('NFKC', text or "").lower()
+    tokens = ASCII_WORD_PATTERN.findall(text)
+    for run in NON_ASCII_RUN_PATTERN.findall(text):
+        if len(run) == 1 or not query:
+            tokens.extend(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """複数の検索結果の順位を Reciprocal Rank Fusion で統合し、スコアの高い順に (id, score) を返す"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class KeywordIndex:
+    """
+    system_name、description、cloud_services を対象にした BM25 の転置インデックス
+    検索はクエリに含まれる語のポスティングのみを走査するため、カタログ件数に比例しない
+    """
+    # フィールドごとの語の重み（システム名とサービス名の一致を優先）
+    FIELD_WEIGHTS = {"system_name": 3.0, "cloud_services": 2.0, "description": 1.0}
+    # 英数字の語の前方一致（"dynamo" → "dynamodb"）の重み（完全一致を優先する）
+    PREFIX_MATCH_WEIGHT = 0.5
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._doc_terms: Dict[str, Dict[str, float]] = {}
+        self._doc_lengths: Dict[str, float] = {}
+        self._total_length = 0.0
+        # 前方一致の検索用に英数字の語を昇順に保持
+        self._ascii_terms: List[str] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._doc_lengths
+
+    def _document_terms(self, doc: Dict) -> Dict[str, float]:
+        """フィールドの重みを掛けた語の出現回数"""
+        terms: Counter = Counter()
+        for field, weight in self.FIELD_WEIGHTS.items():
+            value = doc.get(field) or ""
+            if isinstance(value, list):
+                value = " ".join(value)
+            for term in tokenize(value):
+                terms[term] += weight
+        return dict(terms)
+
+    def _remove_locked(self, doc_id: str):
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            posting = self._postings[term]
+            posting.pop(doc_id, None)
+            if not posting:
+                del self._postings[term]
+                if ASCII_WORD_PATTERN.fullmatch(term):
+                    del self._ascii_terms[bisect.bisect_left(self._ascii_terms, term)]
+        self._total_length -= self._doc_lengths.pop(doc_id)
+
+    def build(self, documents: Iterable[Dict]):
+        """インデックスを作り直す"""
+        with self._lock:
+            self._postings = {}
+            self._doc_terms = {}
+            self._doc_lengths = {}
+            self._total_length = 0.0
+            self._ascii_terms = []
+        self.upsert(documents)
+
+    def upsert(self, documents: Iterable[Dict]):
+        """ドキュメントを追加（既存のidは置き換え）"""
+        prepared = [(doc['id'], self._document_terms(doc)) for doc in documents]
+        with self._lock:
+            for doc_id, terms in prepared:
+                self._remove_locked(doc_id)
+                for term, frequency in terms.items():
+                    posting = self._postings.get(term)
+                    if posting is None:
+                        posting = self._postings[term] = {}
+                        if ASCII_WORD_PATTERN.fullmatch(term):
+                            bisect.insort(self._ascii_terms, term)
+                    posting[doc_id] = frequency
+                self._doc_terms[doc_id] = terms
+                self._doc_lengths[doc_id] = sum(terms.values())
+                self._total_length += self._doc_lengths[doc_id]
+
+    def remove(self, ids: Iterable[str]):
+        with self._lock:
+            for doc_id in ids:
+                self._remove_locked(doc_id)
+
+    def apply_catalog_changes(self, upserts: List[Dict], deleted_ids: List[str]):
+        """CatalogSync の変更通知をインデックスに反映"""
+        self.remove(deleted_ids)
+        self.upsert(upserts)
+
+    def _query_posting(self, term: str) -> Dict[str, float]:
+        """
+        クエリの語のポスティング（_lock を保持して呼ぶ）
+        英数字の語は前方一致する語も含め、ドキュメントごとに最も高い出現回数を使う
+        （旧来の部分一致の絞り込みと同様に "lamb" で "lambda" を含むシステムが見つかるように）
+        """
+        posting = self._postings.get(term, {})
+        if not ASCII_WORD_PATTERN.fullmatch(term):
+            return posting
+
+        merged = None
+        index = bisect.bisect_right(self._ascii_terms, term)
+        while index < len(self._ascii_terms) and self._ascii_terms[index].startswith(term):
+            if merged is None:
+                merged = dict(posting)
+            for doc_id, frequency in self._postings[self._ascii_terms[index]].items():
+                frequency *= self.PREFIX_MATCH_WEIGHT
+                if frequency > merged.get(doc_id, 0.0):
+                    merged[doc_id] = frequency
+            index += 1
+        return posting if merged is None else merged
+
+    def search(self, query: str, k: Optional[int] = None, match_all: bool = False) -> List[Tuple[str, float]]:
+        """
+        BM25 スコアの高い順に (id, score) を返す
+        match_all=True の場合はクエリのすべての語を含むドキュメントのみを返す
+        """
+        terms = list(dict.fromkeys(tokenize(query, query=True)))
+        if not terms or (k is not None and k <= 0):
+            return []
+
+        with self._lock:
+            n = len(self._doc_lengths)
+            if n == 0:
+                return []
+            average_length = self._total_length / n
+            postings = [self._query_posting(term) for term in terms]
+            if match_all and not all(postings):
+                return []
+
+            scores: Dict[str, float] = {}
+            matched: Counter = Counter()
+            for posting in postings:
+                idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+                for doc_id, frequency in posting.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / average_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+                    matched[doc_id] += 1
+
+        if match_all:
+            scores = {doc_id: score for doc_id, score in scores.items() if matched[doc_id] == len(terms)}
+        if k is None:
+            return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
@@ -1,15 +1,83 @@
-from typing import Tuple, Dict
+import logging
+import time
+from typing import Tuple, Dict, List, Iterator, Optional
 from openai import OpenAI
-import json
+
+from .conversation import ConversationMemory, ConversationPlan
+from .prompt_context import SystemContextBuilder
+from .question_classifier import QuestionRelevanceClassifier
+from ...config.settings import Settings
+from ...infrastructure.tools.openai_scheduler import Priority, RequestScheduler
+from ...utils.metrics import metrics
+
+OFF_TOPIC_REASON = "システムアーキテクチャに関連しない質問です。"
+ANSWER_ERROR_PREFIXES = ("回答の生成中にエラーが発生しました", "回答の生成がタイムアウトしました")
+ROLE_LABELS = {"user": "ユーザー", "assistant": "アシスタント"}
+# max_tokens を指定しないリクエストの出力トークン数の見積もり（レート制限の計算に使う）
+DEFAULT_COMPLETION_TOKENS = 1024
+
+
+def is_error_answer(answer: str) -> bool:
+    """回答にエラーメッセージが含まれるかどうか（ストリーミング途中のエラーも含む）"""
+    return any(prefix in answer for prefix in ANSWER_ERROR_PREFIXES)
 
 
 class LLMService:
-    def __init__(self, api_key: str):
-        self.client = OpenAI(api_key=api_key)
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "gpt-4-turbo-preview",
+        classifier: Optional[QuestionRelevanceClassifier] = None,
+        description_token_budget: int = 512,
+        conversation_memory: Optional[ConversationMemory] = None,
+        summary_max_tokens: int = 400,
+        client: Optional[OpenAI] = None,
+        scheduler: Optional[RequestScheduler] = None
+    ):
+        self.client = client or OpenAI(api_key=api_key)
+        self.scheduler = scheduler or RequestScheduler.shared()
+        self.model = model
+        self.classifier = classifier
+        self.context_builder = SystemContextBuilder(model, description_token_budget)
+        self.conversation_memory = conversation_memory or ConversationMemory(self.context_builder)
+        self.summary_max_tokens = summary_max_tokens
+
+    @classmethod
+    def from_settings(
+        cls,
+        settings: Settings,
+        classifier: Optional[QuestionRelevanceClassifier] = None,
+        conversation_memory: Optional[ConversationMemory] = None,
+        client: Optional[OpenAI] = None,
+        scheduler: Optional[RequestScheduler] = None
+    ) -> "LLMService":
+        """Settingsの値からインスタンスを生成"""
+        return cls(
+            settings.OPENAI_API_KEY,
+            model=settings.LLM_MODEL,
+            classifier=classifier,
+            description_token_budget=settings.LLM_CONTEXT_DESCRIPTION_TOKENS,
+            conversation_memory=conversation_memory,
+            summary_max_tokens=settings.LLM_SUMMARY_MAX_TOKENS,
+            client=client,
+            scheduler=scheduler
+        )
 
-    def validate_architecture_question(self, question: str, system_context: Dict) -> Tuple[bool, str]:
-        """システムアーキテクチャに関する質問かどうかを検証"""
-        messages = [
+    @staticmethod
+    def build_validation_messages(
+        question: str,
+        context_text: str,
+        previous_question: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        質問検証用のメッセージを生成（context_text は SystemContextBuilder で生成したシステム情報）
+        追加の質問（「それはなぜ？」など）を判断できるよう、直前の質問があれば含める
+        """
+        previous = f"""
+                直前の質問:
+                {previous_question}
+""" if previous_question else ""
+        return [
             {
                 "role": "system",
                 "content": """
@@ -23,8 +91,8 @@ class LLMService:
                 以下のシステムに対する質問が、システムアーキテクチャに関連する質問かどうかを判断してください。
 
                 システム情報:
-                {json.dumps(system_context, ensure_ascii=False)}
-
+{context_text}
+{previous}
                 質問:
                 {question}
 
@@ -35,26 +103,30 @@ class LLMService:
             }
         ]
 
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4-turbo-preview",
-                messages=messages,
-                temperature=0
-            )
+    @staticmethod
+    def parse_validation_result(result: str) -> Tuple[bool, str]:
+        """検証結果のテキストを (is_valid, reason) に変換"""
+        if "valid: true" in result.lower():
+            return True, ""
+        reason = result.split("reason:")[1].strip() if "reason:" in result else OFF_TOPIC_REASON
+        return False, reason
 
-            result = response.choices[0].message.content
-            if "valid: true" in result.lower():
-                return True, ""
-            else:
-                reason = result.split("reason:")[1].strip() if "reason:" in result else "システムアーキテクチャに関連しない質問です。"
-                return False, reason
-
-        except Exception as e:
-            return False, f"検証中にエラーが発生しました: {str(e)}"
+    @staticmethod
+    def build_answer_messages(
+        question: str,
+        context_text: str,
+        summary: str = "",
+        recent_messages: Optional[List[Dict]] = None
+    ) -> List[Dict]:
+        """
+        回答生成用のメッセージを生成（context_text は SystemContextBuilder で生成したシステム情報）
+        古い会話の要約はシステムメッセージに、直近の会話はそのままのメッセージとして含める
+        """
+        summary_text = f"""
 
-    def get_architecture_answer(self, question: str, system_context: Dict) -> str:
-        """システムアーキテクチャに関する質問に回答"""
-        messages = [
+                これまでの会話の要約:
+                {summary}""" if summary else ""
+        return [
             {
                 "role": "system",
                 "content": f"""
@@ -63,23 +135,210 @@ class LLMService:
                 セキュリティ、デプロイメント、運用の観点から質問に答えてください。
 
                 システム情報:
-                    - システム名: {system_context['system_name']}
-                    - 説明: {system_context['description']}
-                    - クラウドプロバイダー: {system_context['cloud_provider']}
-                    - 利用サービス: {', '.join(system_context['cloud_services'])}"""
+{context_text}{summary_text}"""
             },
+            *(recent_messages or []),
             {
                 "role": "user",
                 "content": question
                 }
         ]
 
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4-turbo-preview",
+    @staticmethod
+    def build_summary_messages(summary: str, messages: List[Dict]) -> List[Dict]:
+        """これまでの要約に新しい会話を畳み込むためのメッセージを生成"""
+        transcript = "\n".join(
+            f"{ROLE_LABELS.get(message['role'], message['role'])}: {message['content']}" for message in messages
+        )
+        return [
+            {
+                "role": "system",
+                "content": """
+                あなたはシステムアーキテクチャに関する会話を要約するアシスタントです。
+                これまでの要約と新しい会話をまとめ、以降の質問に答えるために必要な論点、前提、結論を
+                簡潔な箇条書きで日本語で出力してください。"""
+            },
+            {
+                "role": "user",
+                "content": f"""
+                これまでの要約:
+                {summary or "（なし）"}
+
+                新しい会話:
+{transcript}"""
+            }
+        ]
+
+    @staticmethod
+    def previous_question(chat_history: Optional[List[Dict]]) -> Optional[str]:
+        """履歴の中の直前のユーザーの質問"""
+        for message in reversed(ConversationMemory.normalize(chat_history)):
+            if message["role"] == "user":
+                return message["content"]
+        return None
+
+    @staticmethod
+    def classify_locally(
+        classifier: Optional[QuestionRelevanceClassifier],
+        question: str,
+        chat_history: Optional[List[Dict]] = None
+    ) -> Optional[Tuple[bool, str]]:
+        """
+        ローカル分類器で判定（判定できない場合はNoneを返し、LLMで検証する）
+        分類器は質問だけを見るため、会話の途中では「それはなぜですか」のような追加の質問を無関係と誤判定しうる
+        会話履歴がある場合は無関係という判定を採用せず、直前の質問を踏まえた LLM の検証に回す
+        """
+        verdict = classifier.classify(question) if classifier is not None else None
+        if verdict is None or (not verdict and chat_history):
+            return None
+        return (True, "") if verdict else (False, OFF_TOPIC_REASON)
+
+    @staticmethod
+    def validation_messages(
+        context_builder: SystemContextBuilder,
+        question: str,
+        system_context: Dict,
+        chat_history: Optional[List[Dict]] = None
+    ) -> List[Dict]:
+        """システム情報を圧縮して質問検証用のメッセージを生成し、プロンプトのサイズを記録（AsyncLLMService と共用）"""
+        context = context_builder.build(system_context)
+        messages = LLMService.build_validation_messages(
+            question,
+            context.text,
+            LLMService.previous_question(chat_history)
+        )
+        context_builder.log_prompt_size("Validation", messages, context)
+        return messages
+
+    @staticmethod
+    def answer_messages(
+        context_builder: SystemContextBuilder,
+        question: str,
+        system_context: Dict,
+        summary: str = "",
+        recent_messages: Optional[List[Dict]] = None
+    ) -> List[Dict]:
+        """システム情報を圧縮して回答生成用のメッセージを生成し、プロンプトのサイズを記録（AsyncLLMService と共用）"""
+        context = context_builder.build(system_context)
+        messages = LLMService.build_answer_messages(question, context.text, summary, recent_messages)
+        context_builder.log_prompt_size("Answer", messages, context)
+        return messages
+
+    def create_completion(
+        self,
+        messages: List[Dict],
+        stage: str = "completion",
+        priority: Priority = Priority.INTERACTIVE,
+        **kwargs
+    ):
+        """
+        スケジューラを通して chat.completions.create を呼び出し（レート制限と再試行はスケジューラが担う）
+        所要時間は llm / stage のレイテンシとして記録する
+        """
+        estimated_tokens = (
+            self.context_builder.count_message_tokens(messages)
+            + (kwargs.get("max_tokens") or DEFAULT_COMPLETION_TOKENS)
+        )
+        with metrics.span("llm", stage):
+            return self.scheduler.call(
+                self.model,
+                estimated_tokens,
+                self.client.chat.completions.create,
+                model=self.model,
                 messages=messages,
-                temperature=0.7
+                priority=priority,
+                **kwargs
             )
+
+    def summarize_conversation(self, summary: str, messages: List[Dict]) -> str:
+        """これまでの要約に新しい会話を畳み込んだ要約を生成"""
+        response = self.create_completion(
+            self.build_summary_messages(summary, messages),
+            stage="summary",
+            temperature=0,
+            max_tokens=self.summary_max_tokens
+        )
+        return response.choices[0].message.content.strip()
+
+    def conversation_context(self, chat_history: Optional[List[Dict]]) -> Tuple[str, List[Dict]]:
+        """
+        会話履歴を (要約, 直近のメッセージ) に変換
+        上限からあふれた発言のみを追加で要約し、要約に失敗した場合は古い発言を落として続行する
+        """
+        plan: ConversationPlan = self.conversation_memory.plan(chat_history)
+        if not plan.fold:
+            return plan.summary, plan.recent
+        try:
+            summary = self.summarize_conversation(plan.summary, plan.fold)
+        except Exception as e:
+            logging.warning(f"Conversation summary failed: {str(e)}")
+            return plan.summary, plan.recent
+        self.conversation_memory.remember(plan, summary)
+        return summary, plan.recent
+
+    def validate_architecture_question(
+        self,
+        question: str,
+        system_context: Dict,
+        chat_history: Optional[List[Dict]] = None
+    ) -> Tuple[bool, str]:
+        """システムアーキテクチャに関する質問かどうかを検証（明確な場合はLLMを呼ばない）"""
+        local_result = self.classify_locally(self.classifier, question, chat_history)
+        if local_result is not None:
+            return local_result
+
+        messages = self.validation_messages(self.context_builder, question, system_context, chat_history)
+
+        try:
+            response = self.create_completion(messages, stage="validation", temperature=0)
+
+            return self.parse_validation_result(response.choices[0].message.content)
+
+        except Exception as e:
+            return False, f"検証中にエラーが発生しました: {str(e)}"
+
+    def get_architecture_answer(
+        self,
+        question: str,
+        system_context: Dict,
+        chat_history: Optional[List[Dict]] = None
+    ) -> str:
+        """システムアーキテクチャに関する質問に回答（会話履歴がある場合は文脈を踏まえて回答）"""
+        try:
+            summary, recent_messages = self.conversation_context(chat_history)
+            messages = self.answer_messages(self.context_builder, question, system_context, summary, recent_messages)
+
+            response = self.create_completion(messages, stage="answer", temperature=0.7)
             return response.choices[0].message.content
         except Exception as e:
             return f"回答の生成中にエラーが発生しました: {str(e)}"
+
+    def stream_architecture_answer(
+        self,
+        question: str,
+        system_context: Dict,
+        chat_history: Optional[List[Dict]] = None
+    ) -> Iterator[str]:
+        """システムアーキテクチャに関する質問への回答を生成された順にストリーミング"""
+        try:
+            summary, recent_messages = self.conversation_context(chat_history)
+            messages = self.answer_messages(self.context_builder, question, system_context, summary, recent_messages)
+
+            start = time.perf_counter()
+            stream = self.create_completion(
+                messages,
+                stage="answer_stream_open",
+                temperature=0.7,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            for chunk in stream:
+                # 最後のチャンクにだけ usage が入る（choices は空）
+                if getattr(chunk, "usage", None):
+                    metrics.record_llm_usage(self.model, chunk.usage)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+            # ジェネレータは yield をまたいでスパンを保てないため、全体の時間は直接記録する
+            metrics.observe_stage("llm", "answer_stream", time.perf_counter() - start)
+        except Exception as e:
+            yield f"回答の生成中にエラーが発生しました: {str(e)}"
@@ -0,0 +1,125 @@
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken が無い環境では概算でトークン数を数える
+    tiktoken = None
+
+# 近いモデルが見つからない場合に使うエンコーディング
+DEFAULT_ENCODING = "cl100k_base"
+# チャット形式のメッセージ1件あたりのオーバーヘッド（role などの区切りトークン）
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+TRUNCATION_MARK = "…"
+
+
+@dataclass
+class PromptContext:
+    text: str
+    tokens: int
+    truncated: bool
+
+
+class SystemContextBuilder:
+    """
+    LLMのプロンプトに埋め込むシステム情報を生成
+    カタログのドキュメントから質問に関係する項目だけを残し（description_vector、ID、タイムスタンプ、
+    リポジトリURLなどは含めない）、長い説明はトークン数の上限で切り詰める
+    """
+    _encodings: Dict[str, object] = {}
+    _encodings_lock = threading.Lock()
+
+    def __init__(self, model: str = "gpt-4-turbo-preview", description_token_budget: int = 512):
+        self.model = model
+        self.description_token_budget = description_token_budget
+
+    @classmethod
+    def _get_encoding(cls, model: str):
+        """モデルに対応する tiktoken のエンコーディング（取得できない場合は None）"""
+        with cls._encodings_lock:
+            if model not in cls._encodings:
+                encoding = None
+                if tiktoken is not None:
+                    try:
+                        try:
+                            encoding = tiktoken.encoding_for_model(model)
+                        except KeyError:
+                            encoding = tiktoken.get_encoding(DEFAULT_ENCODING)
+                    except Exception as e:
+                        # オフライン環境などでエンコーディングを取得できない場合
+                        logging.warning(f"Tokenizer unavailable for {model}, using estimate: {str(e)}")
+                cls._encodings[model] = encoding
+            return cls._encodings[model]
+
+    @property
+    def encoding(self):
+        return self._get_encoding(self.model)
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """トークナイザーが無い場合の概算（ASCIIは約4文字、それ以外は1文字で1トークン）"""
+        ascii_chars = sum(1 for char in text if ord(char) < 128)
+        return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+    def count_tokens(self, text: str) -> int:
+        encoding = self.encoding
+        if encoding is None:
+            return self.estimate_tokens(text)
+        return len(encoding.encode(text, disallowed_special=()))
+
+    def count_message_tokens(self, messages: List[Dict]) -> int:
+        """チャット形式のメッセージ全体のトークン数"""
+        return TOKENS_PER_REPLY + sum(
+            TOKENS_PER_MESSAGE + self.count_tokens(message["content"]) for message in messages
+        )
+
+    def truncate(self, text: str, budget: int) -> str:
+        """テキストをトークン数の上限までに切り詰める"""
+        encoding = self.encoding
+        if encoding is not None:
+            tokens = encoding.encode(text, disallowed_special=())
+            if len(tokens) <= budget:
+                return text
+            return encoding.decode(tokens[:budget]).rstrip() + TRUNCATION_MARK
+
+        if self.estimate_tokens(text) <= budget:
+            return text
+        # 概算のトークン数が上限に収まる最長の先頭部分を二分探索
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.estimate_tokens(text[:middle]) <= budget:
+                low = middle
+            else:
+                high = middle - 1
+        return text[:low].rstrip() + TRUNCATION_MARK
+
+    def build(self, system_context: Dict) -> PromptContext:
+        """プロンプトに埋め込むシステム情報のテキストを生成"""
+        description = system_context.get('description') or ""
+        compact_description = self.truncate(description, self.description_token_budget)
+        services = system_context.get('cloud_services') or []
+
+        text = "\n".join([
+            f"- システム名: {system_context.get('system_name', '')}",
+            f"- 説明: {compact_description}",
+            f"- クラウドプロバイダー: {system_context.get('cloud_provider', '')}",
+            f"- 利用サービス: {', '.join(services)}",
+        ])
+        return PromptContext(
+            text=text,
+            tokens=self.count_tokens(text),
+            truncated=compact_description != description
+        )
+
+    def log_prompt_size(self, kind: str, messages: List[Dict], context: Optional[PromptContext] = None) -> int:
+        """生成したプロンプトのトークン数を記録"""
+        tokens = self.count_message_tokens(messages)
+        if context is not None and context.truncated:
+            logging.info(f"{kind} prompt: {tokens} tokens (system context {context.tokens}, description truncated)")
+        else:
+            logging.info(f"{kind} prompt: {tokens} tokens")
+        return tokens
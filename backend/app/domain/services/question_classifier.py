@@ -0,0 +1,88 @@
+import json
+import logging
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+from .embedding_service import EmbeddingService
+from .vector_index import VectorIndex
+
+DEFAULT_PROTOTYPES_PATH = Path(__file__).resolve().parents[2] / "config" / "question_prototypes.json"
+
+
+class QuestionRelevanceClassifier:
+    """
+    ラベル付きのプロトタイプ質問とのembedding類似度で、質問がアーキテクチャに関するものかを判定
+    判定が曖昧な範囲（reject_threshold < margin < accept_threshold）のみ None を返し、LLMでの検証に回す
+    """
+
+    def __init__(
+        self,
+        embedding_service: EmbeddingService,
+        architecture_prototypes: List[str],
+        off_topic_prototypes: List[str],
+        accept_threshold: float = 0.05,
+        reject_threshold: float = -0.05,
+        top_n: int = 3
+    ):
+        self.embedding_service = embedding_service
+        self.architecture_prototypes = architecture_prototypes
+        self.off_topic_prototypes = off_topic_prototypes
+        self.accept_threshold = accept_threshold
+        self.reject_threshold = reject_threshold
+        self.top_n = top_n
+        self._architecture_matrix: Optional[np.ndarray] = None
+        self._off_topic_matrix: Optional[np.ndarray] = None
+
+    @classmethod
+    def load(cls, embedding_service: EmbeddingService, path: Optional[str] = None) -> "QuestionRelevanceClassifier":
+        """プロトタイプと閾値をJSONファイルから読み込み"""
+        with open(path or DEFAULT_PROTOTYPES_PATH, encoding="utf-8") as f:
+            config = json.load(f)
+        return cls(
+            embedding_service,
+            architecture_prototypes=config["architecture"],
+            off_topic_prototypes=config["off_topic"],
+            accept_threshold=config.get("accept_threshold", 0.05),
+            reject_threshold=config.get("reject_threshold", -0.05),
+            top_n=config.get("top_n", 3)
+        )
+
+    def _prototype_matrix(self, prototypes: List[str]) -> np.ndarray:
+        embeddings = self.embedding_service.get_embeddings(prototypes)
+        return VectorIndex._normalize(np.stack(embeddings))
+
+    def _ensure_prototypes(self):
+        """プロトタイプのembeddingを初回のみ取得（以降はキャッシュから）"""
+        if self._architecture_matrix is None:
+            self._architecture_matrix = self._prototype_matrix(self.architecture_prototypes)
+            self._off_topic_matrix = self._prototype_matrix(self.off_topic_prototypes)
+
+    def _top_mean(self, matrix: np.ndarray, query: np.ndarray) -> float:
+        scores = matrix @ query
+        n = min(self.top_n, len(scores))
+        return float(np.mean(np.partition(scores, len(scores) - n)[-n:]))
+
+    def score(self, question_embedding: np.ndarray) -> float:
+        """アーキテクチャ質問との類似度と無関係な質問との類似度の差（正ならアーキテクチャ寄り）"""
+        self._ensure_prototypes()
+        query = VectorIndex._normalize(question_embedding)
+        return self._top_mean(self._architecture_matrix, query) - self._top_mean(self._off_topic_matrix, query)
+
+    def classify(self, question: str) -> Optional[bool]:
+        """
+        質問の関連性を判定
+        Returns: True（関連あり）/ False（関連なし）/ None（曖昧なためLLMでの検証が必要）
+        """
+        try:
+            margin = self.score(self.embedding_service.get_embedding(question))
+        except Exception as e:
+            logging.warning(f"Question classification failed: {str(e)}")
+            return None
+
+        if margin >= self.accept_threshold:
+            return True
+        if margin <= self.reject_threshold:
+            return False
+        return None
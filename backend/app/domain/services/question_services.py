@@ -1,12 +1,32 @@
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, Iterator, List, Tuple, Optional, Union
 
-from .llm_service import LLMService
+from .llm_service import LLMService, is_error_answer
+from .async_llm_service import AsyncLLMService
+from .answer_cache import SemanticAnswerCache
 from ..schemas import ChatMessage
+from ...utils.metrics import metrics
 
 
 class QuestionService:
-    def __init__(self, llm_service: LLMService):
+    def __init__(
+        self,
+        llm_service: Union[LLMService, AsyncLLMService],
+        answer_cache: Optional[SemanticAnswerCache] = None
+    ):
         self.llm_service = llm_service
+        self.answer_cache = answer_cache
+
+    def _cached_answer(self, question: str, system_context: Dict, chat_history: List[Dict]) -> Optional[str]:
+        # 追加の質問は会話の文脈に依存するためキャッシュを使わない
+        if self.answer_cache is None or chat_history:
+            return None
+        answer = self.answer_cache.get(system_context, question)
+        metrics.record_cache("answer", answer is not None)
+        return answer
+
+    def _store_answer(self, question: str, system_context: Dict, chat_history: List[Dict], answer: str):
+        if self.answer_cache is not None and not chat_history and answer and not is_error_answer(answer):
+            self.answer_cache.put(system_context, question, answer)
 
     def process_question(
         self,
@@ -18,21 +38,113 @@ class QuestionService:
         質問を処理して回答を生成
         Returns: (is_valid: bool, message: str, chat_message: Optional[ChatMessage])
         """
-        # 質問の妥当性を検証
-        is_valid, error_message = self.llm_service.validate_architecture_question(
-            question,
-            system_context
-        )
+        with metrics.span("question", "process"):
+            # 近い質問への回答がキャッシュにあればそのまま返す
+            cached = self._cached_answer(question, system_context, chat_history)
+            if cached is not None:
+                return True, cached, ChatMessage(role="assistant", content=cached)
+
+            if isinstance(self.llm_service, AsyncLLMService):
+                return self.llm_service.run(
+                    self.process_question_async(question, system_context, chat_history)
+                )
+
+            # 質問の妥当性を検証
+            is_valid, error_message = self.llm_service.validate_architecture_question(
+                question,
+                system_context,
+                chat_history
+            )
+
+            if not is_valid:
+                return False, error_message, None
+
+            # 会話履歴を踏まえて回答を生成
+            answer = self.llm_service.get_architecture_answer(question, system_context, chat_history)
+            self._store_answer(question, system_context, chat_history, answer)
+
+            chat_message = ChatMessage(
+                role="assistant",
+                content=answer
+            )
+
+            return True, answer, chat_message
+
+    async def process_question_async(
+        self,
+        question: str,
+        system_context: Dict,
+        chat_history: List[Dict]
+    ) -> Tuple[bool, str, Optional[ChatMessage]]:
+        """
+        質問の検証と回答生成を並行実行して回答を生成（AsyncLLMService 使用時）
+        Returns: (is_valid: bool, message: str, chat_message: Optional[ChatMessage])
+        """
+        is_valid, message = await self.llm_service.validate_and_answer(question, system_context, chat_history)
 
         if not is_valid:
-            return False, error_message, None
+            return False, message, None
 
-        # 回答を生成
-        answer = self.llm_service.get_architecture_answer(question, system_context)
+        self._store_answer(question, system_context, chat_history, message)
+        return True, message, ChatMessage(role="assistant", content=message)
 
-        chat_message = ChatMessage(
-            role="assistant",
-            content=answer
-        )
+    def stream_question(
+        self,
+        question: str,
+        system_context: Dict,
+        chat_history: List[Dict]
+    ) -> Tuple[bool, str, Optional[Iterator[str]]]:
+        """
+        質問を検証し、回答をストリーミングで生成
+        AsyncLLMService の場合は検証と回答の先頭チャンクの取得を並行実行する
+        Returns: (is_valid: bool, error_message: str, answer_stream: Optional[Iterator[str]])
+        """
+        # ストリームは呼び出し側が読み進めた時点で生成される（それまでに呼び出し側が履歴へ質問を追加しても影響しないよう複製する）
+        chat_history = list(chat_history or [])
+        # 回答の本文は呼び出し側がストリームを読み進めた時点で生成されるため、ストリームを返すまでを計測する
+        with metrics.span("question", "stream_start"):
+            cached = self._cached_answer(question, system_context, chat_history)
+            if cached is not None:
+                return True, "", iter([cached])
+
+            if isinstance(self.llm_service, AsyncLLMService):
+                is_valid, error_message, stream = self.llm_service.run(
+                    self.llm_service.validate_and_stream(question, system_context, chat_history)
+                )
+                if not is_valid:
+                    return False, error_message, None
+                return True, "", self._caching_stream(
+                    question,
+                    system_context,
+                    chat_history,
+                    self.llm_service.iterate(stream)
+                )
+
+            is_valid, error_message = self.llm_service.validate_architecture_question(
+                question,
+                system_context,
+                chat_history
+            )
+            if not is_valid:
+                return False, error_message, None
+
+            return True, "", self._caching_stream(
+                question,
+                system_context,
+                chat_history,
+                self.llm_service.stream_architecture_answer(question, system_context, chat_history)
+            )
 
-        return True, answer, chat_message
+    def _caching_stream(
+        self,
+        question: str,
+        system_context: Dict,
+        chat_history: List[Dict],
+        stream: Iterator[str]
+    ) -> Iterator[str]:
+        """ストリームをそのまま流し、最後まで受信できた回答をキャッシュに保存"""
+        deltas = []
+        for delta in stream:
+            deltas.append(delta)
+            yield delta
+        self._store_answer(question, system_context, chat_history, "".join(deltas))
@@ -1,10 +1,22 @@
+import logging
 import requests
-from typing import Tuple, Dict
+from typing import Tuple, Dict, Optional
+
+from ...infrastructure.repositories.catalog_cache import CatalogCache
+from ...infrastructure.tools.http_client import HttpClient
+from ...utils.metrics import metrics
 
 
 class RegisterService:
-    def __init__(self, base_url: str):
+    def __init__(
+        self,
+        base_url: str,
+        catalog_cache: Optional[CatalogCache] = None,
+        http_client: Optional[HttpClient] = None
+    ):
         self.base_url = base_url
+        self.catalog_cache = catalog_cache
+        self.http_client = http_client or HttpClient.shared()
 
     def validate_system_data(self, data: Dict) -> Tuple[bool, str]:
         """システムデータのバリデーション"""
@@ -40,8 +52,27 @@ class RegisterService:
 
         return True, ""
 
-    def register_system(self, system_data: Dict) -> Dict:
-        """システム情報を登録"""
+    def _fold_into_catalog(self, system_data: Dict, result: Dict):
+        """
+        登録したシステムをカタログのレプリカに即時反映し、カタログキャッシュを無効化
+        （失敗しても登録は成功扱い）
+        レスポンスに保存されたドキュメント（id と作成日時）が含まれない場合は、次の同期での反映を待つ
+        """
+        if self.catalog_cache is None:
+            return
+        try:
+            stored = result.get('document', result) if isinstance(result, dict) else {}
+            if isinstance(stored, dict) and stored.get('id') and stored.get('created_at'):
+                self.catalog_cache.upsert({'updated_at': None, **system_data, **stored})
+            self.catalog_cache.invalidate()
+        except Exception as e:
+            logging.warning(f"Failed to update catalog replica: {str(e)}")
+
+    def register_system(self, system_data: Dict, idempotency_key: Optional[str] = None) -> Dict:
+        """
+        システム情報を登録
+        idempotency_key: 再送しても同じ登録として扱うためのキー（Idempotency-Key ヘッダーで送る）
+        """
         try:
             # バリデーション
             is_valid, error_message = self.validate_system_data(system_data)
@@ -49,13 +80,14 @@ class RegisterService:
                 raise ValueError(error_message)
 
             # APIリクエスト
-            response = requests.post(
-                f"{self.base_url}/register-system",
-                json=system_data,
-                headers={"Content-Type": "application/json"}
-            )
-            response.raise_for_status()
-            return response.json()
+            with metrics.span("repository", "register_system"):
+                result = self.http_client.post_json(
+                    f"{self.base_url}/register-system",
+                    system_data,
+                    headers={"Idempotency-Key": idempotency_key} if idempotency_key else None
+                )
+            self._fold_into_catalog(system_data, result)
+            return result
 
         except requests.exceptions.RequestException as e:
             raise Exception(f"API request failed: {str(e)}")
@@ -63,4 +95,3 @@ class RegisterService:
             raise ValueError(str(e))
         except Exception as e:
             raise Exception(f"Unexpected error: {str(e)}")
-            raise Exception(f"Failed to search systems: {str(e)}")
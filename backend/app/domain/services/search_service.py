@@ -1,34 +1,128 @@
-from typing import List
+from typing import Dict, List, Optional
 
 from ..schemas import SystemArchitecture
 from ...infrastructure.repositories.system_repository import SystemRepository
+from ...infrastructure.repositories.catalog_cache import CatalogCache
 from .embedding_service import EmbeddingService
+from .keyword_index import KeywordIndex, reciprocal_rank_fusion
+from ...utils.metrics import metrics
 
 
 class SearchService:
-    def __init__(self, repository: SystemRepository, embedding_service: EmbeddingService):
+    """
+    キーワード・ベクトル・ハイブリッド検索
+    catalog_cache にはプロセス全体で共有するカタログキャッシュ（ServiceContainer.catalog_cache）を渡す
+    （サービスごとにレプリカを持つとカタログの取得と同期が重複するため）
+    """
+
+    def __init__(
+        self,
+        repository: SystemRepository,
+        embedding_service: EmbeddingService,
+        catalog_cache: CatalogCache,
+        keyword_index: Optional[KeywordIndex] = None
+    ):
+        if catalog_cache is None:
+            raise ValueError("SearchService requires the shared catalog_cache")
         self.repository = repository
         self.embedding_service = embedding_service
+        self.catalog_cache = catalog_cache
+        self.keyword_index = keyword_index
+
+    def _catalog(self) -> List[Dict]:
+        with metrics.span("search", "catalog"):
+            return self.catalog_cache.get()
 
-    def search_similar_systems(self, query: str) -> List[SystemArchitecture]:
+    def search_similar_systems(self, query: str, top_k: Optional[int] = None) -> List[SystemArchitecture]:
         """
         類似システムを検索
         """
         try:
-            # 全システムを取得
-            all_systems = self.repository.get_all_systems()
+            with metrics.span("search", "vector_search"):
+                # 共有カタログキャッシュから取得（TTL切れの場合のみ差分同期し、変更分がインデックスに反映される）
+                if not self._catalog():
+                    return []
+
+                # 類似度計算（同期済みのインデックスを利用）
+                systems_with_similarity = self.embedding_service.calculate_similarity(
+                    query=query,
+                    top_k=top_k
+                )
+
+                # SystemArchitectureオブジェクトに変換
+                return [SystemArchitecture(**system) for system in systems_with_similarity]
+
+        except Exception as e:
+            raise Exception(f"Failed to search systems: {str(e)}")
+
+    def keyword_search(self, query: str, top_k: Optional[int] = None, match_all: bool = False) -> List[Dict]:
+        """
+        キーワード（BM25）でシステムを検索
+        結果には keyword_score を付与する
+        """
+        try:
+            with metrics.span("search", "keyword_search"):
+                if not self._catalog() or self.keyword_index is None:
+                    return []
+
+                catalog_sync = self.catalog_cache.catalog_sync
+                return [
+                    {**catalog_sync.get(doc_id), 'keyword_score': score}
+                    for doc_id, score in self.keyword_index.search(query, top_k, match_all=match_all)
+                    if catalog_sync.get(doc_id) is not None
+                ]
+
+        except Exception as e:
+            raise Exception(f"Failed to search systems by keyword: {str(e)}")
+
+    def hybrid_search(
+        self,
+        query: str,
+        top_k: Optional[int] = None,
+        vector_candidates: int = 50,
+        keyword_candidates: int = 50
+    ) -> List[Dict]:
+        """
+        キーワード検索とベクトル検索の順位を Reciprocal Rank Fusion で統合して検索
+        サービス名など完全一致が重要な語と、言い回しの違う類似システムの両方を拾う
+        結果には similarity（ベクトル類似度）、keyword_score、hybrid_score を付与する
+        """
+        try:
+            with metrics.span("search", "hybrid_search"):
+                if not self._catalog():
+                    return []
+
+                with metrics.span("search", "keyword"):
+                    keyword_hits = self.keyword_index.search(query, keyword_candidates) if self.keyword_index else []
+                vector_hits = self.embedding_service.calculate_similarity(query=query, top_k=vector_candidates)
 
-            if not all_systems:
-                return []
+                similarities = {doc['id']: doc['similarity'] for doc in vector_hits}
+                keyword_scores = dict(keyword_hits)
+                # キーワードのみで見つかったシステムにもベクトル類似度を付ける
+                similarities.update(self.embedding_service.similarity_scores(
+                    query,
+                    [doc_id for doc_id in keyword_scores if doc_id not in similarities]
+                ))
 
-            # 類似度計算
-            systems_with_similarity = self.embedding_service.calculate_similarity(
-                query=query,
-                systems=[system.dict() for system in all_systems]
-            )
+                with metrics.span("search", "fusion"):
+                    fused = reciprocal_rank_fusion([
+                        [doc_id for doc_id, _ in keyword_hits],
+                        [doc['id'] for doc in vector_hits]
+                    ])
+                    if top_k is not None:
+                        fused = fused[:top_k]
 
-            # SystemArchitectureオブジェクトに変換
-            return [SystemArchitecture(**system) for system in systems_with_similarity]
+                    catalog_sync = self.catalog_cache.catalog_sync
+                    return [
+                        {
+                            **catalog_sync.get(doc_id),
+                            'similarity': similarities.get(doc_id, 0.0),
+                            'keyword_score': keyword_scores.get(doc_id, 0.0),
+                            'hybrid_score': score
+                        }
+                        for doc_id, score in fused
+                        if catalog_sync.get(doc_id) is not None
+                    ]
 
         except Exception as e:
             raise Exception(f"Failed to search systems: {str(e)}")
@@ -0,0 +1,112 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+
+
+class VectorIndex:
+    """正規化済みベクトルを1つのfloat32行列に保持するインメモリ類似度インデックス"""
+
+    def __init__(self, dimensions: int):
+        self.dimensions = dimensions
+        # 追加に備えて行数より大きい容量を確保する（先頭 _size 行が有効）
+        self._matrix = np.empty((0, dimensions), dtype=np.float32)
+        self._size = 0
+        self._ids: List[str] = []
+        self._id_to_row: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._id_to_row
+
+    @property
+    def ids(self) -> List[str]:
+        return list(self._ids)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """有効な行の正規化済みベクトル（コピーなし）"""
+        return self._matrix[:self._size]
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        """行ごとにL2正規化（ノルム0の行はそのまま）"""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def build(self, ids: Sequence[str], vectors: Sequence[np.ndarray]):
+        """インデックスを作り直す"""
+        matrix = np.empty((len(ids), self.dimensions), dtype=np.float32)
+        for row, vector in enumerate(vectors):
+            matrix[row] = vector
+        self._matrix = self._normalize(matrix)
+        self._size = len(ids)
+        self._ids = list(ids)
+        self._id_to_row = {doc_id: row for row, doc_id in enumerate(self._ids)}
+
+    def upsert(self, ids: Sequence[str], vectors: Sequence[np.ndarray]):
+        """ベクトルを追加（既存のidは上書き）"""
+        new_rows = len({doc_id for doc_id in ids if doc_id not in self._id_to_row})
+        required = self._size + new_rows
+        if required > len(self._matrix):
+            capacity = max(required, 2 * len(self._matrix))
+            matrix = np.empty((capacity, self.dimensions), dtype=np.float32)
+            matrix[:self._size] = self._matrix[:self._size]
+            self._matrix = matrix
+
+        for doc_id, vector in zip(ids, vectors):
+            row = self._id_to_row.get(doc_id)
+            if row is None:
+                row = self._size
+                self._size += 1
+                self._ids.append(doc_id)
+                self._id_to_row[doc_id] = row
+            self._matrix[row] = self._normalize(vector)
+
+    def remove(self, ids: Iterable[str]) -> List[str]:
+        """
+        ベクトルを削除（末尾の行を空いた行に移動）
+        Returns: 行が移動したid（vectors のビューを参照している側が行の入れ替わりを知るため）
+        """
+        moved = []
+        for doc_id in ids:
+            row = self._id_to_row.pop(doc_id, None)
+            if row is None:
+                continue
+            last = self._size - 1
+            if row != last:
+                self._matrix[row] = self._matrix[last]
+                self._ids[row] = self._ids[last]
+                self._id_to_row[self._ids[row]] = row
+                moved.append(self._ids[row])
+            self._ids.pop()
+            self._size -= 1
+        return moved
+
+    def score_ids(self, query: np.ndarray, ids: Iterable[str]) -> List[Tuple[str, float]]:
+        """指定したidのみのコサイン類似度を計算"""
+        rows = [self._id_to_row[doc_id] for doc_id in ids if doc_id in self._id_to_row]
+        if not rows:
+            return []
+        scores = self._matrix[rows] @ self._normalize(query)
+        return [(self._ids[row], float(score)) for row, score in zip(rows, scores)]
+
+    def search(self, query: np.ndarray, k: Optional[int] = None) -> List[Tuple[str, float]]:
+        """
+        コサイン類似度の高い順に (id, score) を返す
+        k を指定した場合は argpartition で上位k件のみを並べ替える
+        """
+        n = self._size
+        if n == 0 or (k is not None and k <= 0):
+            return []
+
+        scores = self._matrix[:n] @ self._normalize(query)
+        if k is None or k >= n:
+            order = np.argsort(-scores)
+        else:
+            top = np.argpartition(-scores, k - 1)[:k]
+            order = top[np.argsort(-scores[top])]
+
+        return [(self._ids[row], float(scores[row])) for row in order]
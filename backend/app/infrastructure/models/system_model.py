@@ -14,3 +14,5 @@ class SystemModel(BaseModel):
     created_at: datetime
     updated_at: Optional[datetime] = None
     type: str = "system_architecture"
+    description_vector: Optional[List[float]] = None
+    embedding_model: Optional[str] = None
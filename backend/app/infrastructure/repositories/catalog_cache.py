@@ -0,0 +1,89 @@
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .catalog_sync import CatalogSync
+
+
+class CatalogCache:
+    """
+    プロセス内の全セッションで共有するカタログのTTLキャッシュ
+    - TTL内はネットワークにアクセスせずレプリカを返す
+    - TTL切れ後も猶予期間内は古いレプリカを返し、バックグラウンドで差分同期する
+    - 同時に発生した更新は1回の同期にまとめる（single-flight）
+    """
+
+    def __init__(self, catalog_sync: CatalogSync, ttl_seconds: float = 60, stale_seconds: float = 600):
+        self.catalog_sync = catalog_sync
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self._loaded_at: Optional[float] = None
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        """カタログが変更されるたびに増える番号（派生インデックスのキャッシュキー用）"""
+        return self.catalog_sync.version
+
+    def age(self) -> float:
+        """最後に同期してからの経過秒数"""
+        if self._loaded_at is None:
+            return float('inf')
+        return time.monotonic() - self._loaded_at
+
+    def get(self) -> List[Dict]:
+        """カタログの全システムを取得"""
+        self._ensure_fresh()
+        return self.catalog_sync.documents()
+
+    def snapshot(self) -> Tuple[int, List[Dict]]:
+        """カタログのバージョンと全システムを取得"""
+        self._ensure_fresh()
+        return self.catalog_sync.snapshot()
+
+    def _ensure_fresh(self):
+        """TTLに応じて同期（猶予期間内はバックグラウンドで同期）"""
+        age = self.age()
+        if age >= self.ttl_seconds + self.stale_seconds:
+            try:
+                self.refresh()
+            except Exception:
+                if not len(self.catalog_sync):
+                    raise
+                logging.warning("Catalog refresh failed; serving stale catalog", exc_info=True)
+        elif age >= self.ttl_seconds:
+            self._refresh_in_background()
+
+    def refresh(self):
+        """同期を実行（他スレッドが同期中なら完了を待ち、その結果を使う）"""
+        requested_at = time.monotonic()
+        with self._refresh_lock:
+            if self._loaded_at is not None and self._loaded_at >= requested_at:
+                return
+            self.catalog_sync.sync()
+            self._loaded_at = time.monotonic()
+
+    def _refresh_in_background(self):
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+
+        def run():
+            try:
+                self.catalog_sync.sync()
+                self._loaded_at = time.monotonic()
+            except Exception:
+                logging.warning("Background catalog refresh failed", exc_info=True)
+            finally:
+                self._refresh_lock.release()
+
+        threading.Thread(target=run, name="catalog-refresh", daemon=True).start()
+
+    def upsert(self, doc: Dict):
+        """登録直後のシステムをレプリカに反映"""
+        self.catalog_sync.upsert(doc)
+
+    def invalidate(self):
+        """キャッシュを期限切れにする（次回の取得でバックグラウンド同期が走る）"""
+        if self._loaded_at is not None:
+            self._loaded_at = min(self._loaded_at, time.monotonic() - self.ttl_seconds)
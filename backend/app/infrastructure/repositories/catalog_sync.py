@@ -0,0 +1,107 @@
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .system_repository import SystemRepository
+
+CatalogListener = Callable[[List[Dict], List[str]], None]
+
+
+class CatalogSync:
+    """
+    カタログのローカルレプリカを updated_at のウォーターマークで差分同期
+    変更はリスナー（検索インデックスなど）に (upserts, deleted_ids) として通知する
+    """
+
+    def __init__(self, repository: SystemRepository):
+        self.repository = repository
+        self.watermark: Optional[str] = None
+        self.version = 0
+        self._documents: Dict[str, Dict] = {}
+        self._listeners: List[CatalogListener] = []
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    @staticmethod
+    def _document_version(doc: Dict) -> Optional[str]:
+        return doc.get('updated_at') or doc.get('created_at')
+
+    @staticmethod
+    def _is_tombstone(doc: Dict) -> bool:
+        return bool(doc.get('deleted')) or doc.get('type') == 'tombstone'
+
+    def subscribe(self, listener: CatalogListener):
+        """変更通知を購読（レプリカが空でなければ現在の全件を通知）"""
+        with self._lock:
+            self._listeners.append(listener)
+            if self._documents:
+                listener(self.documents(), [])
+
+    def documents(self) -> List[Dict]:
+        """レプリカの全システムを取得"""
+        with self._lock:
+            return list(self._documents.values())
+
+    def snapshot(self) -> Tuple[int, List[Dict]]:
+        """バージョンと全システムを同時に取得（派生インデックスをバージョンと対応付けて構築するため）"""
+        with self._lock:
+            return self.version, list(self._documents.values())
+
+    def get(self, system_id: str) -> Optional[Dict]:
+        return self._documents.get(system_id)
+
+    def sync(self) -> bool:
+        """
+        前回のウォーターマーク以降の変更を取得してレプリカに反映
+        Returns: レプリカが変更されたかどうか
+        """
+        changes = self.repository.get_system_changes(self.watermark)
+
+        with self._lock:
+            upserts = []
+            deleted_ids = list(changes["deleted_ids"])
+            for doc in changes["documents"]:
+                if self._is_tombstone(doc):
+                    deleted_ids.append(doc['id'])
+                    continue
+                current = self._documents.get(doc['id'])
+                if current is not None and self._document_version(current) == self._document_version(doc):
+                    continue
+                upserts.append(doc)
+
+            if not changes["delta"]:
+                # 全件が返った場合は含まれていないシステムを削除扱いにする
+                snapshot_ids = {doc['id'] for doc in changes["documents"]}
+                deleted_ids.extend(doc_id for doc_id in self._documents if doc_id not in snapshot_ids)
+
+            # ウォーターマークはサーバーから取得した変更でだけ進める
+            for doc in changes["documents"]:
+                version = self._document_version(doc)
+                if version and (self.watermark is None or version > self.watermark):
+                    self.watermark = version
+
+            return self._apply(upserts, deleted_ids)
+
+    def upsert(self, doc: Dict):
+        """
+        登録直後のシステムをレプリカに反映
+        ウォーターマークは進めない（未同期の全件や、他の登録者による変更を次の sync で取りこぼさないように）
+        """
+        with self._lock:
+            self._apply([doc], [])
+
+    def _apply(self, upserts: List[Dict], deleted_ids: List[str]) -> bool:
+        deleted_ids = [doc_id for doc_id in dict.fromkeys(deleted_ids) if doc_id in self._documents]
+        if not upserts and not deleted_ids:
+            return False
+
+        for doc in upserts:
+            self._documents[doc['id']] = doc
+        for doc_id in deleted_ids:
+            del self._documents[doc_id]
+        self.version += 1
+
+        for listener in self._listeners:
+            listener(upserts, deleted_ids)
+        return True
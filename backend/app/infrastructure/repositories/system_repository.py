@@ -1,21 +1,41 @@
 import os
-import requests
-from typing import List
+from typing import Dict, List, Optional
 
 from ..models.system_model import SystemModel
+from ..tools.http_client import HttpClient
+from ...utils.metrics import metrics
 
 
 class SystemRepository:
-    def __init__(self):
-        self.base_url = os.getenv('AZURE_FUNCTION_URL')
+    def __init__(self, base_url: Optional[str] = None, http_client: Optional[HttpClient] = None):
+        self.base_url = base_url or os.getenv('AZURE_FUNCTION_URL')
+        self.http_client = http_client or HttpClient.shared()
 
     def get_all_systems(self) -> List[SystemModel]:
         """全システムを取得"""
         try:
-            response = requests.get(f"{self.base_url}/select-all-system")
-            if response.status_code == 200:
-                data = response.json()
+            with metrics.span("repository", "select_all_system"):
+                data, _ = self.http_client.get_json(f"{self.base_url}/select-all-system")
                 return [SystemModel(**item) for item in data["documents"]]
-            return []
         except Exception as e:
             raise Exception(f"Failed to fetch systems: {str(e)}")
+
+    def get_system_changes(self, since: Optional[str] = None) -> Dict:
+        """
+        updated_at が since より新しいシステムを取得
+        サーバーが差分取得に対応していない場合は全件が返る（delta: False）
+        304が返った場合は HttpClient が保持している前回のレスポンスをそのまま使う
+        （共有クライアントでは別の呼び出し元が取得した全件のこともあるため、空の差分にはしない）
+        Returns: {"documents": [...], "deleted_ids": [...], "delta": bool}
+        """
+        try:
+            params = {"updated_since": since} if since else None
+            with metrics.span("repository", "system_changes"):
+                data, _ = self.http_client.get_json(f"{self.base_url}/select-all-system", params=params)
+            return {
+                "documents": data.get("documents", []),
+                "deleted_ids": data.get("deleted_ids", []),
+                "delta": bool(since) and bool(data.get("delta", False))
+            }
+        except Exception as e:
+            raise Exception(f"Failed to fetch system changes: {str(e)}")
@@ -0,0 +1,458 @@
+import hashlib
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows ではプロセス間ロックなし
+    fcntl = None
+
+
+# 索引レコード: キー(16byte) + アリーナ内オフセット(float数) + 次元数 + 書き込み時刻
+INDEX_DTYPE = np.dtype([
+    ('key', 'V16'),
+    ('offset', '<u8'),
+    ('dims', '<u4'),
+    ('written_at', '<u4'),
+])
+# 索引ヘッダ: マジック + フォーマットバージョン + 世代番号（コンパクションごとに増加）
+INDEX_HEADER = struct.Struct('<4sIQ')
+INDEX_MAGIC = b'EMBC'
+INDEX_VERSION = 1
+
+
+class EmbeddingCacheStore:
+    """
+    1ファイルの追記型float32アリーナと、ハッシュ→オフセットの索引によるembeddingキャッシュ
+    読み込みはメモリマップ経由のゼロコピーで、追記はファイルロックによりプロセス間で安全
+    他プロセスの追記の取り込み（索引ファイルの open + fstat）は、ミスのたびではなく
+    refresh_interval 秒に1回まで、get_many ではバッチごとに1回までとする
+    """
+    INDEX_FILE = "embeddings.idx"
+    LOCK_FILE = "embeddings.lock"
+
+    def __init__(self, cache_dir: str, refresh_interval: float = 1.0):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._index_path = self.cache_dir / self.INDEX_FILE
+        self._lock_path = self.cache_dir / self.LOCK_FILE
+        self.refresh_interval = refresh_interval
+        self._refreshed_at = 0.0
+        self._lock = threading.RLock()
+        self._entries: Dict[bytes, Tuple[int, int, int]] = {}
+        self._generation = 0
+        self._index_inode: Optional[int] = None
+        self._index_pos = INDEX_HEADER.size
+        self._mmap: Optional[np.ndarray] = None
+
+        with self._lock:
+            self._refresh()
+
+    @staticmethod
+    def make_key(text: str, model: str, dimensions: int) -> bytes:
+        """モデル名・次元数・テキストからキャッシュキーを生成"""
+        return hashlib.blake2b(
+            f"{model}\0{dimensions}\0{text}".encode(),
+            digest_size=16
+        ).digest()
+
+    def _arena_path(self, generation: int) -> Path:
+        return self.cache_dir / f"embeddings.{generation}.f32"
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: bytes) -> bool:
+        return self.get(key) is not None
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """スレッド間・プロセス間の排他ロック"""
+        with self._lock:
+            with open(self._lock_path, 'a') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _reset(self, inode: Optional[int], generation: int):
+        self._entries = {}
+        self._generation = generation
+        self._index_inode = inode
+        self._index_pos = INDEX_HEADER.size
+        self._mmap = None
+
+    def _refresh(self):
+        """
+        他プロセスが追記した索引レコードを取り込む
+        コンパクションで索引ファイルが置き換わっていた場合は全件読み直す
+        """
+        self._refreshed_at = time.monotonic()
+        try:
+            f = open(self._index_path, 'rb')
+        except FileNotFoundError:
+            self._reset(None, 0)
+            return
+
+        with f:
+            stat = os.fstat(f.fileno())
+            if stat.st_ino != self._index_inode or stat.st_size < self._index_pos:
+                magic, version, generation = INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))
+                if magic != INDEX_MAGIC or version != INDEX_VERSION:
+                    raise ValueError(f"Unsupported embedding cache index: {self._index_path}")
+                self._reset(stat.st_ino, generation)
+
+            # 書き込み途中の末尾レコードは次回に回す
+            record_bytes = stat.st_size - self._index_pos
+            record_bytes -= record_bytes % INDEX_DTYPE.itemsize
+            if record_bytes <= 0:
+                return
+            f.seek(self._index_pos)
+            records = np.frombuffer(f.read(record_bytes), dtype=INDEX_DTYPE)
+
+        for key, offset, dims, written_at in records.tolist():
+            self._entries[key] = (offset, dims, written_at)
+        self._index_pos += record_bytes
+
+    def _arena_view(self, offset: int, dims: int) -> Optional[np.ndarray]:
+        """アリーナのメモリマップからベクトルのビューを取得（必要に応じて再マップ）"""
+        if self._mmap is None or offset + dims > len(self._mmap):
+            try:
+                self._mmap = np.memmap(
+                    self._arena_path(self._generation), dtype='<f4', mode='r'
+                ).view(np.ndarray)
+            except (FileNotFoundError, ValueError):
+                return None
+            if offset + dims > len(self._mmap):
+                return None
+        return self._mmap[offset:offset + dims]
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        """キャッシュ済みのベクトルを読み取り専用ビューとして取得（未キャッシュならNone）"""
+        return self.get_many([key])[0]
+
+    def get_many(self, keys: List[bytes]) -> List[Optional[np.ndarray]]:
+        """
+        複数のキーをまとめて検索（未キャッシュのキーはNone）
+        未知のキーがあっても索引の取り込みは1回まで（前回から refresh_interval 秒以内なら行わない）
+        """
+        with self._lock:
+            if (
+                any(key not in self._entries for key in keys)
+                and time.monotonic() - self._refreshed_at >= self.refresh_interval
+            ):
+                self._refresh()
+
+            vectors = []
+            for key in keys:
+                entry = self._entries.get(key)
+                vector = self._arena_view(entry[0], entry[1]) if entry else None
+                if entry is not None and vector is None:
+                    # 他プロセスのコンパクションで世代が変わった
+                    self._reset(None, self._generation)
+                    self._refresh()
+                    entry = self._entries.get(key)
+                    vector = self._arena_view(entry[0], entry[1]) if entry else None
+                vectors.append(vector)
+            return vectors
+
+    def put(self, key: bytes, vector: np.ndarray):
+        """ベクトルを追記"""
+        self.put_many([(key, vector)])
+
+    def put_many(self, items: Iterable[Tuple[bytes, np.ndarray]]):
+        """
+        複数のベクトルをまとめて追記
+        アリーナへの書き込み後に索引レコードを1回のwriteで追記するため、
+        読み手が書きかけのベクトルを参照することはない
+        """
+        items = list(items)
+        if not items:
+            return
+
+        with self._file_lock():
+            self._refresh()
+            if not self._index_path.exists():
+                self._write_index_header(self._index_path, self._generation)
+                self._reset(os.stat(self._index_path).st_ino, self._generation)
+
+            written_at = int(time.time())
+            records = []
+            seen = set(self._entries)
+            with open(self._arena_path(self._generation), 'ab') as arena:
+                arena.seek(0, os.SEEK_END)
+                offset = arena.tell() // 4
+                for key, vector in items:
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    data = np.ascontiguousarray(vector, dtype='<f4')
+                    arena.write(data.tobytes())
+                    records.append((key, offset, data.size, written_at))
+                    offset += data.size
+
+            if not records:
+                return
+            with open(self._index_path, 'ab') as index:
+                index.write(np.array(records, dtype=INDEX_DTYPE).tobytes())
+            self._refresh()
+
+    @staticmethod
+    def _write_index_header(path: Path, generation: int):
+        with open(path, 'wb') as f:
+            f.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, generation))
+
+    def compact(self, keep: Optional[Callable[[bytes, int], bool]] = None) -> int:
+        """
+        有効なエントリのみを新しい世代のアリーナに書き出して不要領域を回収
+        keep(key, written_at) が False を返したエントリは削除する
+        Returns: 削除したエントリ数
+        """
+        with self._file_lock():
+            self._refresh()
+            generation = self._generation + 1
+            arena_path = self._arena_path(generation)
+            tmp_index_path = self._index_path.with_suffix('.idx.tmp')
+
+            records = []
+            offset = 0
+            with open(arena_path, 'wb') as arena:
+                for key, (old_offset, dims, written_at) in self._entries.items():
+                    if keep is not None and not keep(key, written_at):
+                        continue
+                    vector = self._arena_view(old_offset, dims)
+                    if vector is None:
+                        continue
+                    arena.write(np.ascontiguousarray(vector).tobytes())
+                    records.append((key, offset, dims, written_at))
+                    offset += dims
+
+            self._write_index_header(tmp_index_path, generation)
+            with open(tmp_index_path, 'ab') as index:
+                index.write(np.array(records, dtype=INDEX_DTYPE).tobytes())
+
+            removed = len(self._entries) - len(records)
+            old_arena_path = self._arena_path(self._generation)
+            os.replace(tmp_index_path, self._index_path)
+            old_arena_path.unlink(missing_ok=True)
+
+            self._reset(None, generation)
+            self._refresh()
+            return removed
+
+    def entries(self) -> List[Tuple[bytes, int, int]]:
+        """索引のスナップショット (key, dims, written_at) を取得"""
+        with self._lock:
+            self._refresh()
+            return [(key, dims, written_at) for key, (_, dims, written_at) in self._entries.items()]
+
+    def size_bytes(self) -> int:
+        """アリーナと索引の合計サイズ"""
+        total = 0
+        for path in (self._arena_path(self._generation), self._index_path):
+            try:
+                total += path.stat().st_size
+            except FileNotFoundError:
+                pass
+        return total
+
+
+@dataclass
+class CacheStats:
+    """キャッシュのヒット・ミス・追い出し件数"""
+    memory_hits: int = 0
+    memory_misses: int = 0
+    disk_hits: int = 0
+    disk_misses: int = 0
+    memory_evictions: int = 0
+    disk_evictions: int = 0
+
+    def to_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+
+class LRUCache:
+    """バイト数の上限を持つスレッドセーフなLRUキャッシュ"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.evictions = 0
+        self._items: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key: bytes, value: np.ndarray):
+        size = value.nbytes
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old.nbytes
+            self._items[key] = value
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.current_bytes = 0
+
+
+class TieredEmbeddingCache:
+    """
+    メモリ上のLRUとディスク上のEmbeddingCacheStoreによる2層キャッシュ
+    ディスク層はTTL（書き込みからの経過時間）と、サイズ超過時は最後に参照された時刻の古い順に追い出す
+    参照時刻はこのプロセス内でのみ記録する（他プロセスだけが参照したエントリは書き込み時刻で判断する）
+    """
+    # サイズ超過時はこの割合まで削減する（追記のたびにコンパクションしないため）
+    DISK_LOW_WATERMARK = 0.8
+    # TTLによる追い出しの確認間隔（秒）
+    TTL_SWEEP_INTERVAL = 600
+
+    def __init__(
+        self,
+        cache_dir: str,
+        memory_bytes: int = 64 * 1024 * 1024,
+        max_disk_bytes: int = 1024 * 1024 * 1024,
+        ttl_seconds: Optional[int] = None,
+        refresh_interval: float = 1.0
+    ):
+        self.memory = LRUCache(memory_bytes)
+        self.disk = EmbeddingCacheStore(cache_dir, refresh_interval=refresh_interval)
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+        self._last_sweep = 0.0
+        # key → 最後に参照した時刻（ディスク層の追い出し順に使う）
+        self._accessed_at: Dict[bytes, float] = {}
+        # get_embeddings のワーカースレッドから同時に更新されるため、統計と参照時刻はロックを取って更新する
+        # （コンパクション中も取得を待たせないよう _evict_lock とは分ける）
+        self._stats_lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+
+    def _count(self, field: str, value: int = 1):
+        with self._stats_lock:
+            setattr(self.stats, field, getattr(self.stats, field) + value)
+
+    def _touch(self, key: bytes, field: str):
+        with self._stats_lock:
+            setattr(self.stats, field, getattr(self.stats, field) + 1)
+            self._accessed_at[key] = time.time()
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        """メモリ層→ディスク層の順に検索し、ディスク層のヒットはメモリ層に昇格"""
+        return self.get_many([key])[0]
+
+    def get_many(self, keys: List[bytes]) -> List[Optional[np.ndarray]]:
+        """複数のキーをまとめて検索（メモリ層にないキーだけをディスク層から1回で引く）"""
+        values: List[Optional[np.ndarray]] = [self.memory.get(key) for key in keys]
+        missing = [index for index, value in enumerate(values) if value is None]
+        for index, value in enumerate(values):
+            if value is not None:
+                self._touch(keys[index], "memory_hits")
+        if not missing:
+            return values
+        self._count("memory_misses", len(missing))
+
+        for index, value in zip(missing, self.disk.get_many([keys[index] for index in missing])):
+            if value is None:
+                self._count("disk_misses")
+                continue
+            self._touch(keys[index], "disk_hits")
+            self._put_memory(keys[index], value)
+            values[index] = value
+        return values
+
+    def put_many(self, items: Iterable[Tuple[bytes, np.ndarray]]):
+        """両方の層に保存し、必要に応じてディスク層の追い出しを行う"""
+        items = list(items)
+        for key, value in items:
+            self._put_memory(key, value)
+        self.disk.put_many(items)
+        self.maybe_evict()
+
+    def _put_memory(self, key: bytes, value: np.ndarray):
+        before = self.memory.evictions
+        self.memory.put(key, value)
+        evicted = self.memory.evictions - before
+        if evicted:
+            self._count("memory_evictions", evicted)
+
+    def maybe_evict(self) -> int:
+        """サイズ上限を超えたか、TTLの確認間隔が経過した場合のみ追い出しを実行"""
+        now = time.time()
+        over_size = self.disk.size_bytes() > self.max_disk_bytes
+        sweep_due = bool(self.ttl_seconds) and now - self._last_sweep >= self.TTL_SWEEP_INTERVAL
+        if not (over_size or sweep_due):
+            return 0
+        return self.evict(now)
+
+    def evict(self, now: Optional[float] = None) -> int:
+        """
+        TTLを過ぎたエントリと、サイズ上限を超えた分の最後に参照された時刻が古いエントリをディスク層から削除
+        Returns: 削除したエントリ数
+        """
+        if not self._evict_lock.acquire(blocking=False):
+            return 0
+        try:
+            now = now or time.time()
+            self._last_sweep = now
+            with self._stats_lock:
+                accessed_at = dict(self._accessed_at)
+            # 最近参照・追記された順（同時刻は追記順の逆）に並べる
+            entries = sorted(
+                reversed(self.disk.entries()),
+                key=lambda e: max(e[2], accessed_at.get(e[0], 0.0)),
+                reverse=True
+            )
+
+            drop = set()
+            if self.ttl_seconds:
+                expires_before = now - self.ttl_seconds
+                drop.update(key for key, _, written_at in entries if written_at < expires_before)
+
+            if self.disk.size_bytes() > self.max_disk_bytes:
+                budget = self.max_disk_bytes * self.DISK_LOW_WATERMARK
+                used = 0
+                for key, dims, _ in entries:
+                    if key in drop:
+                        continue
+                    used += dims * 4 + INDEX_DTYPE.itemsize
+                    if used > budget:
+                        drop.add(key)
+
+            # 直近のスナップショット以降に追記されたエントリは残す
+            removed = self.disk.compact(lambda key, _: key not in drop) if drop else 0
+            with self._stats_lock:
+                self.stats.disk_evictions += removed
+                for key in drop:
+                    self._accessed_at.pop(key, None)
+            return removed
+        finally:
+            self._evict_lock.release()
@@ -0,0 +1,133 @@
+import threading
+from typing import Any, Dict, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from ...config.settings import Settings
+
+try:
+    import brotli  # noqa: F401  urllib3 が br の展開に利用
+    ACCEPT_ENCODING = "br, gzip, deflate"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+Timeout = Union[float, Tuple[float, float]]
+
+
+class HttpClient:
+    """
+    Azure Functions 呼び出し用の共有HTTPクライアント
+    keep-aliveのコネクションプール、圧縮、タイムアウト、ETagによる条件付きGETに対応
+    """
+    _shared: Optional['HttpClient'] = None
+    _shared_lock = threading.Lock()
+
+    def __init__(
+        self,
+        pool_size: int = 10,
+        connect_timeout: float = 3.05,
+        read_timeout: float = 30,
+        max_retries: int = 2
+    ):
+        self.timeout: Timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=Retry(
+                total=max_retries,
+                backoff_factor=0.3,
+                status_forcelist=(502, 503, 504),
+                allowed_methods=frozenset({"GET"})
+            )
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Accept": "application/json",
+            "Accept-Encoding": ACCEPT_ENCODING
+        })
+        # URL → (クエリパラメータを含むキー, ETag, パース済みのレスポンス)
+        # updated_since のように毎回変わるパラメータで増え続けないよう、URL ごとに最新の1件だけを保持する
+        self._etag_cache: Dict[str, Tuple[str, str, Any]] = {}
+        self._etag_lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> 'HttpClient':
+        """Settingsの値からインスタンスを生成"""
+        return cls(
+            pool_size=settings.HTTP_POOL_SIZE,
+            connect_timeout=settings.HTTP_CONNECT_TIMEOUT,
+            read_timeout=settings.HTTP_READ_TIMEOUT
+        )
+
+    @classmethod
+    def shared(cls) -> 'HttpClient':
+        """プロセス全体で共有するインスタンスを取得"""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    @classmethod
+    def set_shared(cls, client: 'HttpClient'):
+        """共有インスタンスを差し替え（設定値から生成したクライアントを使う場合）"""
+        with cls._shared_lock:
+            cls._shared = client
+
+    @staticmethod
+    def _cache_key(url: str, params: Optional[Dict]) -> str:
+        if not params:
+            return url
+        return url + "?" + "&".join(f"{k}={v}" for k, v in sorted(params.items()))
+
+    def get_json(
+        self,
+        url: str,
+        params: Optional[Dict] = None,
+        timeout: Optional[Timeout] = None,
+        conditional: bool = True
+    ) -> Tuple[Any, bool]:
+        """
+        JSONをGETで取得
+        前回のETagを If-None-Match で送り、304の場合は前回のレスポンスを返す
+        Returns: (data, not_modified)
+        """
+        key = self._cache_key(url, params)
+        headers = {}
+        cached = self._etag_cache.get(url) if conditional else None
+        if cached is not None and cached[0] != key:
+            cached = None
+        if cached is not None:
+            headers["If-None-Match"] = cached[1]
+
+        response = self.session.get(url, params=params, headers=headers, timeout=timeout or self.timeout)
+        if response.status_code == 304 and cached is not None:
+            return cached[2], True
+        response.raise_for_status()
+
+        data = response.json()
+        etag = response.headers.get("ETag")
+        if conditional and etag:
+            with self._etag_lock:
+                self._etag_cache[url] = (key, etag, data)
+        return data, False
+
+    def post_json(
+        self,
+        url: str,
+        payload: Any,
+        timeout: Optional[Timeout] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> Any:
+        """JSONをPOSTしてレスポンスのJSONを取得"""
+        response = self.session.post(
+            url,
+            json=payload,
+            headers={"Content-Type": "application/json", **(headers or {})},
+            timeout=timeout or self.timeout
+        )
+        response.raise_for_status()
+        return response.json()
@@ -1,22 +1,39 @@
-from openai import OpenAI
+import threading
+from openai import AsyncOpenAI, OpenAI
 from typing import Optional
 
 
 class LLMClient:
+    """
+    プロセス全体で共有する OpenAI クライアント（コネクションプールを使い回す）
+    再試行は RequestScheduler がレート制限と合わせて行うため、SDK の自動再試行は無効にする
+    """
     _instance: Optional['LLMClient'] = None
     _client: Optional[OpenAI] = None
+    _async_client: Optional[AsyncOpenAI] = None
+    _lock = threading.Lock()
 
     def __new__(cls, api_key: Optional[str] = None):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-        return cls._instance
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+            return cls._instance
 
     def __init__(self, api_key: Optional[str] = None):
-        if self._client is None and api_key is not None:
-            self._client = OpenAI(api_key=api_key)
+        with self._lock:
+            if self._client is None and api_key is not None:
+                self._client = OpenAI(api_key=api_key, max_retries=0)
+            if self._async_client is None and api_key is not None:
+                self._async_client = AsyncOpenAI(api_key=api_key, max_retries=0)
 
     @property
     def client(self) -> OpenAI:
         if self._client is None:
             raise ValueError("LLMClient has not been initialized with an API key")
         return self._client
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        if self._async_client is None:
+            raise ValueError("LLMClient has not been initialized with an API key")
+        return self._async_client
@@ -0,0 +1,327 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from ...config.settings import Settings
+from ...utils.metrics import metrics
+
+try:
+    from openai import APIConnectionError, APIStatusError, APITimeoutError
+except ImportError:  # openai が無い環境でもスケジューラ自体は使える
+    APIConnectionError = APIStatusError = APITimeoutError = None
+
+T = TypeVar("T")
+
+# 同時実行枠のうち対話的なリクエストのために空けておく割合
+INTERACTIVE_RESERVE_RATIO = 0.25
+# 順番待ち・同時実行数の上限で待つ場合の確認間隔
+POLL_INTERVAL = 0.05
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+class TokenBucket:
+    """1分あたりの上限を秒単位で補充するトークンバケット"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """amount を消費できるまでの秒数（上限を超える量は上限として扱う）"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+    def refund(self, amount: float):
+        """見積もりと実際の使用量の差を戻す（負の値は追加で消費）"""
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def drain(self, seconds: float):
+        """429を受けた場合に、以降のリクエストが seconds 秒待つように空にする"""
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class RequestScheduler:
+    """
+    OpenAI へのリクエストを調整する共有スケジューラ
+    - モデルごとのRPM・TPMのトークンバケット
+    - 対話（チャット・検索クエリ）を優先し、バックグラウンド（カタログのembedding）は空き枠で実行
+    - 429・5xx・接続エラーは Retry-After を尊重したジッター付き指数バックオフで再試行
+    - 待ち行列の長さなどのメトリクス
+    """
+    _shared: Optional["RequestScheduler"] = None
+    _shared_lock = threading.Lock()
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, Tuple[int, int]]] = None,
+        default_rpm: int = 500,
+        default_tpm: int = 150000,
+        max_concurrency: int = 16,
+        max_retries: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0
+    ):
+        self.limits = dict(limits or {})
+        self.default_rpm = default_rpm
+        self.default_tpm = default_tpm
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._buckets: Dict[str, Tuple[TokenBucket, TokenBucket]] = {}
+        self._waiting: List[Tuple[int, int, str]] = []
+        self._in_flight = 0
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._stats = {
+            "admitted": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "failed": 0,
+            "wait_seconds": 0.0,
+            "max_queue_depth": 0,
+        }
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "RequestScheduler":
+        """Settingsの値からインスタンスを生成"""
+        return cls(
+            limits={model: (rpm, tpm) for model, (rpm, tpm) in settings.OPENAI_RATE_LIMITS.items()},
+            default_rpm=settings.OPENAI_DEFAULT_RPM,
+            default_tpm=settings.OPENAI_DEFAULT_TPM,
+            max_concurrency=settings.OPENAI_MAX_CONCURRENCY,
+            max_retries=settings.OPENAI_MAX_RETRIES
+        )
+
+    @classmethod
+    def shared(cls) -> "RequestScheduler":
+        """プロセス全体で共有するインスタンスを取得"""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    @classmethod
+    def set_shared(cls, scheduler: "RequestScheduler"):
+        """共有インスタンスを差し替え（設定値から生成したスケジューラを使う場合）"""
+        with cls._shared_lock:
+            cls._shared = scheduler
+
+    def _model_buckets(self, model: str) -> Tuple[TokenBucket, TokenBucket]:
+        if model not in self._buckets:
+            rpm, tpm = self.limits.get(model, (self.default_rpm, self.default_tpm))
+            self._buckets[model] = (TokenBucket(rpm), TokenBucket(tpm))
+        return self._buckets[model]
+
+    def _try_admit(self, ticket: Tuple[int, int, str], tokens: int) -> Optional[float]:
+        """
+        実行できれば枠とトークンを確保して None を返し、できなければ待つ秒数を返す（ロック内で呼ぶ）
+        同じモデルの待ち行列で先頭のリクエストのみ実行でき、優先度の低いリクエストは予約枠を使えない
+        """
+        priority, _, model = ticket
+        if any(other < ticket and other[2] == model for other in self._waiting):
+            return POLL_INTERVAL
+        limit = self.max_concurrency
+        if priority != Priority.INTERACTIVE:
+            limit -= int(self.max_concurrency * INTERACTIVE_RESERVE_RATIO)
+        if self._in_flight >= max(1, limit):
+            return POLL_INTERVAL
+
+        requests_bucket, tokens_bucket = self._model_buckets(model)
+        now = time.monotonic()
+        wait = max(requests_bucket.wait_time(1, now), tokens_bucket.wait_time(tokens, now))
+        if wait > 0:
+            return wait
+
+        requests_bucket.consume(1)
+        tokens_bucket.consume(tokens)
+        self._waiting.remove(ticket)
+        heapq.heapify(self._waiting)
+        self._in_flight += 1
+        self._stats["admitted"] += 1
+        return None
+
+    def _enqueue(self, model: str, priority: Priority) -> Tuple[int, int, str]:
+        ticket = (int(priority), next(self._sequence), model)
+        heapq.heappush(self._waiting, ticket)
+        self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], len(self._waiting))
+        return ticket
+
+    def _abandon(self, ticket: Tuple[int, int, str]):
+        """キャンセルされたリクエストを待ち行列から外す（ロック内で呼ぶ）"""
+        if ticket in self._waiting:
+            self._waiting.remove(ticket)
+            heapq.heapify(self._waiting)
+        self._condition.notify_all()
+
+    def _acquire(self, model: str, tokens: int, priority: Priority):
+        started_at = time.monotonic()
+        with self._condition:
+            ticket = self._enqueue(model, priority)
+            try:
+                while True:
+                    wait = self._try_admit(ticket, tokens)
+                    if wait is None:
+                        break
+                    self._condition.wait(timeout=wait)
+            except BaseException:
+                self._abandon(ticket)
+                raise
+            self._stats["wait_seconds"] += time.monotonic() - started_at
+
+    async def _acquire_async(self, model: str, tokens: int, priority: Priority):
+        started_at = time.monotonic()
+        with self._condition:
+            ticket = self._enqueue(model, priority)
+        try:
+            while True:
+                with self._condition:
+                    wait = self._try_admit(ticket, tokens)
+                if wait is None:
+                    break
+                await asyncio.sleep(min(wait, POLL_INTERVAL))
+        except BaseException:
+            with self._condition:
+                self._abandon(ticket)
+            raise
+        with self._condition:
+            self._stats["wait_seconds"] += time.monotonic() - started_at
+
+    def _release(self, model: str, estimated_tokens: int, result: Any):
+        """実行枠を返し、レスポンスの使用量が分かれば見積もりとの差をバケットに反映してメトリクスに記録"""
+        with self._condition:
+            self._in_flight -= 1
+            usage = getattr(result, "usage", None)
+            total_tokens = getattr(usage, "total_tokens", None)
+            if isinstance(total_tokens, int):
+                tokens_bucket = self._model_buckets(model)[1]
+                tokens_bucket.refund(min(estimated_tokens, tokens_bucket.capacity) - total_tokens)
+            self._condition.notify_all()
+        metrics.record_llm_usage(model, usage)
+
+    @staticmethod
+    def _retry_after(error: Exception) -> Optional[float]:
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None) or {}
+        try:
+            if "retry-after-ms" in headers:
+                return float(headers["retry-after-ms"]) / 1000
+            if "retry-after" in headers:
+                return float(headers["retry-after"])
+        except (TypeError, ValueError):
+            return None
+        return None
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> Tuple[bool, bool]:
+        """(再試行するか, レート制限か)"""
+        status = getattr(error, "status_code", None)
+        if isinstance(status, int):
+            return status in (408, 429) or status >= 500, status == 429
+        if APIConnectionError is not None and isinstance(error, (APIConnectionError, APITimeoutError)):
+            return True, False
+        return False, False
+
+    def _backoff(self, model: str, attempt: int, error: Exception) -> Optional[float]:
+        """再試行までの秒数（再試行しない場合は None）"""
+        retryable, rate_limited = self._is_retryable(error)
+        if not retryable or attempt >= self.max_retries:
+            with self._condition:
+                self._stats["failed"] += 1
+            return None
+
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = self._retry_after(error)
+        if retry_after is not None:
+            delay = retry_after + random.uniform(0, self.base_delay)
+        with self._condition:
+            self._stats["retries"] += 1
+            if rate_limited:
+                self._stats["rate_limited"] += 1
+                # 同じモデルへの他のリクエストも待たせ、429の連鎖を防ぐ
+                for bucket in self._model_buckets(model):
+                    bucket.drain(delay)
+        logging.warning(f"OpenAI request to {model} failed ({error.__class__.__name__}); retrying in {delay:.1f}s")
+        return delay
+
+    def call(
+        self,
+        model: str,
+        estimated_tokens: int,
+        fn: Callable[..., T],
+        /,
+        *args,
+        priority: Priority = Priority.INTERACTIVE,
+        **kwargs
+    ) -> T:
+        """上限内で fn(*args, **kwargs) を実行（失敗時はバックオフして再試行）"""
+        for attempt in itertools.count():
+            self._acquire(model, estimated_tokens, priority)
+            result = None
+            try:
+                result = fn(*args, **kwargs)
+                return result
+            except Exception as e:
+                delay = self._backoff(model, attempt, e)
+                if delay is None:
+                    raise
+            finally:
+                self._release(model, estimated_tokens, result)
+            time.sleep(delay)
+
+    async def acall(
+        self,
+        model: str,
+        estimated_tokens: int,
+        fn: Callable[..., Awaitable[T]],
+        /,
+        *args,
+        priority: Priority = Priority.INTERACTIVE,
+        **kwargs
+    ) -> T:
+        """call の非同期版（イベントループをブロックせずに待つ）"""
+        for attempt in itertools.count():
+            await self._acquire_async(model, estimated_tokens, priority)
+            result = None
+            try:
+                result = await fn(*args, **kwargs)
+                return result
+            except Exception as e:
+                delay = self._backoff(model, attempt, e)
+                if delay is None:
+                    raise
+            finally:
+                self._release(model, estimated_tokens, result)
+            await asyncio.sleep(delay)
+
+    def metrics(self) -> Dict[str, Any]:
+        """待ち行列の長さ・実行中の数・再試行回数などのメトリクス"""
+        with self._condition:
+            queue_depth = {priority.name.lower(): 0 for priority in Priority}
+            for priority, _, _ in self._waiting:
+                queue_depth[Priority(priority).name.lower()] += 1
+            return {
+                "queue_depth": queue_depth,
+                "in_flight": self._in_flight,
+                **self._stats,
+            }
@@ -0,0 +1,70 @@
+"""
+システム一覧（JSONL / CSV）の一括登録
+
+使い方:
+    python -m backend.app.presentation.cli.bulk_import inventory.jsonl \
+        --checkpoint inventory.checkpoint.json --rejects inventory.rejects.jsonl
+
+中断した場合は同じ --checkpoint を指定して再実行すると続きから取り込む
+リジェクトファイルはそのまま入力として再取り込みできる
+"""
+import argparse
+import json
+import sys
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+from ...container import ServiceContainer
+from ...domain.services.bulk_import_service import BulkImportReport
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Bulk-register system architectures from JSONL or CSV")
+    parser.add_argument("path", help="input file (.jsonl or .csv)")
+    parser.add_argument("--checkpoint", help="checkpoint file used to resume an interrupted import")
+    parser.add_argument("--rejects", help="file that receives invalid or failed records (JSONL)")
+    parser.add_argument("--batch-size", type=int, help="records embedded per batch")
+    parser.add_argument("--concurrency", type=int, help="maximum concurrent registration requests")
+    return parser.parse_args(argv)
+
+
+def print_progress(report: BulkImportReport):
+    print(
+        f"\r{report.total} read, {report.imported} imported, {report.rejected} rejected, "
+        f"{report.skipped} skipped, {report.records_per_second:.1f} records/s",
+        end="",
+        file=sys.stderr,
+        flush=True
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    load_dotenv()
+    args = parse_args(argv)
+
+    container = ServiceContainer.instance()
+    container.configure_logging()
+    container.metrics
+    bulk_import_service = container.bulk_import_service
+    if args.batch_size:
+        bulk_import_service.batch_size = args.batch_size
+    if args.concurrency:
+        bulk_import_service.max_concurrency = args.concurrency
+
+    report = bulk_import_service.run(
+        args.path,
+        checkpoint_path=args.checkpoint,
+        reject_path=args.rejects,
+        progress=print_progress
+    )
+    print(file=sys.stderr)
+    print(json.dumps(report.to_dict(), ensure_ascii=False))
+    # 定期書き出しを待たずに終了するため、最後の値を書き出しておく
+    if container.settings.METRICS_ENABLED and container.settings.METRICS_FILE:
+        container.metrics.write_file(container.settings.METRICS_FILE)
+    return 1 if report.rejected else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
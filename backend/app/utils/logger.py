@@ -1,41 +1,206 @@
+import atexit
+import itertools
+import json
 import logging
-from logging.handlers import RotatingFileHandler
 import os
-from datetime import datetime
+import queue
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# LogRecord が標準で持つ属性（これ以外は extra で渡された値として JSON に含める）
+STANDARD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class JsonFormatter(logging.Formatter):
+    """1レコードを1行の JSON に変換（extra で渡した値もフィールドとして出力）"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in STANDARD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DebugSampler(logging.Filter):
+    """
+    DEBUG のレコードを間引く（出力している箇所ごとに最初の1件と、以降は every 件に1件を残す）
+    メッセージは f-string で組み立てられることが多いため、テンプレートではなくファイルと行番号で数える
+    INFO 以上はすべて通す
+    """
+
+    def __init__(self, sample_rate: float):
+        super().__init__()
+        self.every = max(1, round(1 / sample_rate)) if sample_rate > 0 else 0
+        self._counters: Dict[Tuple[str, int], Iterator[int]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        if not self.every:
+            return False
+        key = (record.pathname, record.lineno)
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = self._counters.setdefault(key, itertools.count())
+        if next(counter) % self.every:
+            return False
+        if self.every > 1:
+            record.sample_rate = 1 / self.every
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    レコードをキューに積むだけのハンドラ（書き込みは QueueListener のスレッドで行う）
+    キューが一杯の場合は待たずに破棄し、破棄した件数を数える
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 引数と例外をここで文字列にしておく（別スレッドで書き出すときに値が変わっていないように）
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _QueueListener(QueueListener):
+    def enqueue_sentinel(self):
+        # キューが一杯でも停止の合図は書き出しが進むまで待って積む（put_nowait だと queue.Full になる）
+        self.queue.put(self._sentinel)
 
 
 class Logger:
-    @staticmethod
-    def setup_logger(name: str, log_dir: str = "logs") -> logging.Logger:
+    """
+    ルートロガーの設定（同じ設定で何度呼んでもハンドラは1つだけ、設定が変わった場合は差し替える）
+    ログを出すスレッドはキューに積むだけで、ファイルと標準エラーへの書き込みはバックグラウンドのスレッドが行う
+    """
+    _lock = threading.Lock()
+    _handler: Optional[NonBlockingQueueHandler] = None
+    _listener: Optional[QueueListener] = None
+    _config: Optional[tuple] = None
+
+    @classmethod
+    def setup(
+        cls,
+        level: str = "INFO",
+        log_dir: Optional[str] = "logs",
+        json_format: bool = True,
+        debug_sample_rate: float = 1.0,
+        queue_size: int = 10000,
+        max_bytes: int = 10485760,  # 10MB
+        backup_count: int = 5
+    ) -> logging.Logger:
         """
-        ロガーのセットアップ
+        ルートロガーにキュー経由のハンドラを設定
+        既存のハンドラ（basicConfig などで追加されたもの）は書き込みがリクエストのスレッドで行われるため外す
         """
-        # ログディレクトリの作成
-        os.makedirs(log_dir, exist_ok=True)
+        config = (level.upper(), log_dir, json_format, debug_sample_rate, queue_size, max_bytes, backup_count)
+        root = logging.getLogger()
+        with cls._lock:
+            if cls._listener is not None and cls._config == config and cls._handler in root.handlers:
+                return root
+            cls._stop()
 
-        # ロガーの設定
-        logger = logging.getLogger(name)
-        logger.setLevel(logging.INFO)
+            formatter = JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT)
+            handlers: List[logging.Handler] = [logging.StreamHandler()]
+            if log_dir:
+                os.makedirs(log_dir, exist_ok=True)
+                handlers.append(RotatingFileHandler(
+                    os.path.join(log_dir, "app.log"),
+                    maxBytes=max_bytes,
+                    backupCount=backup_count,
+                    encoding="utf-8"
+                ))
+            for handler in handlers:
+                handler.setFormatter(formatter)
 
-        # ファイルハンドラの設定
-        log_file = os.path.join(
-            log_dir,
-            f"{name}_{datetime.now().strftime('%Y%m%d')}.log"
-        )
-        file_handler = RotatingFileHandler(
-            log_file,
-            maxBytes=10485760,  # 10MB
-            backupCount=5
-        )
-        file_handler.setLevel(logging.INFO)
+            for handler in list(root.handlers):
+                root.removeHandler(handler)
+            queue_handler = NonBlockingQueueHandler(queue.Queue(queue_size))
+            queue_handler.addFilter(DebugSampler(debug_sample_rate))
+            root.addHandler(queue_handler)
+            root.setLevel(level.upper())
+            listener = _QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+            listener.start()
+            cls._handler, cls._listener, cls._config = queue_handler, listener, config
+        return root
 
-        # フォーマッタの設定
-        formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    @classmethod
+    def from_settings(cls, settings) -> logging.Logger:
+        return cls.setup(
+            level=settings.LOG_LEVEL,
+            log_dir=settings.LOG_DIR,
+            json_format=settings.LOG_JSON,
+            debug_sample_rate=settings.LOG_DEBUG_SAMPLE_RATE,
+            queue_size=settings.LOG_QUEUE_SIZE
         )
-        file_handler.setFormatter(formatter)
 
-        # ハンドラの追加
-        logger.addHandler(file_handler)
+    @classmethod
+    def setup_logger(cls, name: str, log_dir: str = "logs") -> logging.Logger:
+        """
+        名前付きロガーを取得（ルートロガーが未設定なら既定の値で設定する）
+        ハンドラはルートロガーにだけ付けるため、何度呼んでも同じ行が重複して出力されることはない
+        """
+        if cls._listener is None:
+            cls.setup(log_dir=log_dir)
+        return logging.getLogger(name)
+
+    @classmethod
+    def dropped(cls) -> int:
+        """キューが一杯で破棄したレコードの数"""
+        return cls._handler.dropped if cls._handler is not None else 0
+
+    @classmethod
+    def shutdown(cls):
+        """キューに残っているレコードを書き出してバックグラウンドのスレッドを止める"""
+        with cls._lock:
+            cls._stop()
+
+    @classmethod
+    def _stop(cls):
+        if cls._listener is None:
+            return
+        logging.getLogger().removeHandler(cls._handler)
+        cls._listener.stop()
+        for handler in cls._listener.handlers:
+            handler.close()
+        if cls._handler.dropped:
+            # リスナーを止めた後なので標準エラーに直接書き出す
+            record = logging.makeLogRecord({
+                "name": "logger",
+                "levelno": logging.WARNING,
+                "levelname": "WARNING",
+                "msg": f"Dropped {cls._handler.dropped} log records because the queue was full",
+            })
+            logging.lastResort.handle(record)
+        cls._handler, cls._listener, cls._config = None, None, None
+
 
-        return logger
+atexit.register(Logger.shutdown)
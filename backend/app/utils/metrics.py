@@ -0,0 +1,309 @@
+import bisect
+import contextvars
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+# 秒単位のレイテンシのバケット（LLM の応答を含むため 60 秒まで）
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# 1000トークンあたりの料金（USD）: モデル → (入力, 出力)
+DEFAULT_PRICING = {
+    "gpt-4-turbo-preview": (0.01, 0.03),
+    "text-embedding-3-small": (0.00002, 0.0),
+}
+HELP = {
+    "app_stage_latency_seconds": ("histogram", "Latency of each instrumented stage"),
+    "app_stage_errors_total": ("counter", "Stages that ended with an exception"),
+    "app_cache_requests_total": ("counter", "Cache lookups by result"),
+    "app_cache_hit_ratio": ("gauge", "Share of cache lookups that hit"),
+    "app_llm_requests_total": ("counter", "OpenAI responses that reported token usage"),
+    "app_llm_tokens_total": ("counter", "OpenAI tokens by type"),
+    "app_llm_cost_usd_total": ("counter", "Estimated OpenAI cost in USD"),
+}
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+def _labels(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: LabelKey, extra: Iterable[Tuple[str, str]] = ()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Span:
+    """
+    処理の段階の所要時間を計測するスパン
+    終了時にヒストグラムへ記録し、入れ子のスパンは親の内訳に加える
+    親のないスパンが slow_span_seconds を超えた場合は内訳をログに出力する
+    """
+    __slots__ = ("registry", "component", "stage", "started_at", "children", "_token")
+
+    def __init__(self, registry: "MetricsRegistry", component: str, stage: str):
+        self.registry = registry
+        self.component = component
+        self.stage = stage
+        self.children: List[Tuple[str, float]] = []
+
+    @property
+    def name(self) -> str:
+        return f"{self.component}.{self.stage}"
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        elapsed = time.perf_counter() - self.started_at
+        _current_span.reset(self._token)
+        self.registry.observe_stage(self.component, self.stage, elapsed, error=exc_type is not None)
+        parent = _current_span.get()
+        if parent is not None:
+            parent.children.append((self.name, elapsed))
+        elif self.registry.slow_span_seconds is not None and elapsed >= self.registry.slow_span_seconds:
+            breakdown = ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.children)
+            logging.info(f"Slow {self.name}: {elapsed * 1000:.0f}ms" + (f" ({breakdown})" if breakdown else ""))
+        return False
+
+
+class _NoopSpan:
+    """計測が無効な場合のスパン（何もしない）"""
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class MetricsRegistry:
+    """
+    プロセス全体のメトリクス（段階ごとのレイテンシ、キャッシュのヒット率、OpenAI のトークン数と料金）
+    Prometheus のテキスト形式で出力し、ファイルへの定期書き出しと /metrics エンドポイントに対応
+    無効な場合はスパンもカウンタも何もしない
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.slow_span_seconds: Optional[float] = None
+        self.pricing: Dict[str, Tuple[float, float]] = dict(DEFAULT_PRICING)
+        self._counters: Dict[Tuple[str, LabelKey], float] = {}
+        self._histograms: Dict[Tuple[str, LabelKey], Histogram] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, Dict[str, Any], float]]]] = []
+        self._lock = threading.Lock()
+        self._exporter: Optional[threading.Thread] = None
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def configure(
+        self,
+        enabled: bool,
+        slow_span_seconds: Optional[float] = None,
+        pricing: Optional[Dict[str, Tuple[float, float]]] = None
+    ):
+        self.enabled = enabled
+        self.slow_span_seconds = slow_span_seconds
+        if pricing:
+            self.pricing.update(pricing)
+
+    def span(self, component: str, stage: str):
+        """with ブロックの所要時間を component / stage のレイテンシとして記録"""
+        if not self.enabled:
+            return _NOOP_SPAN
+        return Span(self, component, stage)
+
+    def increment(self, name: str, value: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def observe_stage(self, component: str, stage: str, seconds: float, error: bool = False):
+        self.observe("app_stage_latency_seconds", seconds, component=component, stage=stage)
+        if error:
+            self.increment("app_stage_errors_total", component=component, stage=stage)
+
+    def record_cache(self, cache: str, hit: bool, count: int = 1):
+        """キャッシュの参照結果を記録（count 件まとめて記録できる）"""
+        if count:
+            self.increment("app_cache_requests_total", count, cache=cache, result="hit" if hit else "miss")
+
+    def record_llm_usage(self, model: str, usage: Any):
+        """OpenAI のレスポンスの usage からトークン数と料金を記録"""
+        if not self.enabled or usage is None:
+            return
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        input_price, output_price = self.pricing.get(model, (0.0, 0.0))
+        self.increment("app_llm_requests_total", model=model)
+        self.increment("app_llm_tokens_total", prompt_tokens, model=model, type="prompt")
+        if completion_tokens:
+            self.increment("app_llm_tokens_total", completion_tokens, model=model, type="completion")
+        self.increment(
+            "app_llm_cost_usd_total",
+            (prompt_tokens * input_price + completion_tokens * output_price) / 1000,
+            model=model
+        )
+
+    def describe(self, name: str, metric_type: str, description: str):
+        """collector が返すメトリクスの種類と説明を登録"""
+        HELP[name] = (metric_type, description)
+
+    def register_collector(self, collector: Callable[[], Iterable[Tuple[str, Dict[str, Any], float]]]):
+        """出力時に呼ばれ、(名前, ラベル, 値) のゲージを返す関数を登録"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def _cache_ratios(self, counters: Dict[Tuple[str, LabelKey], float]) -> Dict[str, float]:
+        totals: Dict[str, List[float]] = {}
+        for (name, labels), value in counters.items():
+            if name != "app_cache_requests_total":
+                continue
+            label_map = dict(labels)
+            hits_and_total = totals.setdefault(label_map.get("cache", ""), [0.0, 0.0])
+            hits_and_total[1] += value
+            if label_map.get("result") == "hit":
+                hits_and_total[0] += value
+        return {cache: hits / total for cache, (hits, total) in totals.items() if total}
+
+    def render(self) -> str:
+        """Prometheus のテキスト形式で出力"""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {
+                key: (histogram.buckets, list(histogram.counts), histogram.sum, histogram.count)
+                for key, histogram in self._histograms.items()
+            }
+            collectors = list(self._collectors)
+
+        samples: Dict[str, List[str]] = {}
+        for (name, labels), value in sorted(counters.items()):
+            samples.setdefault(name, []).append(f"{name}{_format_labels(labels)} {value:g}")
+        for cache, ratio in sorted(self._cache_ratios(counters).items()):
+            samples.setdefault("app_cache_hit_ratio", []).append(
+                f"app_cache_hit_ratio{_format_labels((('cache', cache),))} {ratio:.4f}"
+            )
+        for (name, labels), (buckets, counts, total, count) in sorted(histograms.items()):
+            lines = samples.setdefault(name, [])
+            cumulative = 0
+            for bound, bucket_count in zip(list(buckets) + [float("inf")], counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', le)])} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total:.6f}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        for collector in collectors:
+            try:
+                for name, labels, value in collector():
+                    samples.setdefault(name, []).append(f"{name}{_format_labels(_labels(labels))} {value:g}")
+            except Exception as e:
+                logging.warning(f"Metrics collector failed: {str(e)}")
+
+        output = []
+        for name, lines in samples.items():
+            metric_type, description = HELP.get(name, ("gauge", name))
+            output.append(f"# HELP {name} {description}")
+            output.append(f"# TYPE {name} {metric_type}")
+            output.extend(lines)
+        return "\n".join(output) + "\n"
+
+    def write_file(self, path: str):
+        """テキスト形式のメトリクスをファイルに書き出し（node_exporter の textfile collector 用に置き換えで書く）"""
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(self.render(), encoding="utf-8")
+        tmp_path.replace(target)
+
+    def start_file_exporter(self, path: str, interval_seconds: float = 15):
+        """interval_seconds ごとにファイルへ書き出すスレッドを開始（1回のみ）"""
+        with self._lock:
+            if self._exporter is not None:
+                return
+            def export():
+                while True:
+                    time.sleep(interval_seconds)
+                    try:
+                        self.write_file(path)
+                    except OSError as e:
+                        logging.warning(f"Failed to write metrics to {path}: {str(e)}")
+            self._exporter = threading.Thread(target=export, name="metrics-exporter", daemon=True)
+            self._exporter.start()
+
+    def start_http_server(self, port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+        """GET /metrics でメトリクスを返すサーバーを別スレッドで開始（1回のみ）"""
+        with self._lock:
+            if self._server is not None:
+                return self._server
+            registry = self
+
+            class MetricsHandler(BaseHTTPRequestHandler):
+                def log_message(self, format, *args):
+                    pass
+
+                def do_GET(self):
+                    if self.path.split("?")[0] != "/metrics":
+                        self.send_error(404)
+                        return
+                    body = registry.render().encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+            self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True).start()
+            return self._server
+
+
+# プロセス全体で1つ（ServiceContainer が Settings の値で有効化する）
+metrics = MetricsRegistry()
@@ -0,0 +1,4 @@
+"""
+ネットワークを使わないマイクロベンチマーク（python -m backend.benchmarks.run）
+結果の比較は python -m backend.benchmarks.compare
+"""
@@ -0,0 +1,81 @@
+"""
+2つのベンチマーク結果の比較
+
+使い方:
+    python -m backend.benchmarks.compare base.json head.json --threshold 10
+
+p50 のレイテンシ、スループット、メモリのピークの変化率を段階ごとに表示する
+p50 またはメモリのピークが threshold (%) を超えて悪化した段階があれば終了コード 1 を返す
+"""
+import argparse
+import json
+import sys
+from typing import Dict, List, Optional, Tuple
+
+Key = Tuple[int, str]
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("base", help="baseline results (JSON)")
+    parser.add_argument("head", help="new results (JSON)")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent")
+    return parser.parse_args(argv)
+
+
+def load_results(path: str) -> Dict[Key, Dict]:
+    with open(path, encoding="utf-8") as f:
+        report = json.load(f)
+    return {(result["catalog_size"], result["stage"]): result for result in report["results"]}
+
+
+def change(base: Optional[float], head: Optional[float]) -> Optional[float]:
+    """base から head への変化率（%）"""
+    if base is None or head is None or base == 0:
+        return None
+    return (head - base) / base * 100
+
+
+def format_change(value: Optional[float]) -> str:
+    return "n/a" if value is None else f"{value:+.1f}%"
+
+
+def compare(base: Dict[Key, Dict], head: Dict[Key, Dict], threshold: float) -> Tuple[List[str], List[Key]]:
+    """比較結果の表と、悪化した (件数, 段階) の一覧を返す"""
+    lines = [
+        f"{'size':>7}  {'stage':<22} {'p50 base':>11} {'p50 head':>11} {'p50':>8} "
+        f"{'throughput':>11} {'peak mem':>9}"
+    ]
+    regressions = []
+    for key in sorted(base.keys() & head.keys()):
+        old, new = base[key], head[key]
+        latency = change(old["latency_ms"]["p50"], new["latency_ms"]["p50"])
+        throughput = change(old["throughput_per_second"], new["throughput_per_second"])
+        memory = change(old.get("peak_memory_bytes"), new.get("peak_memory_bytes"))
+        regressed = any(value is not None and value > threshold for value in (latency, memory))
+        if regressed:
+            regressions.append(key)
+        lines.append(
+            f"{key[0]:>7}  {key[1]:<22} {old['latency_ms']['p50']:>9.3f}ms {new['latency_ms']['p50']:>9.3f}ms "
+            f"{format_change(latency):>8} {format_change(throughput):>11} {format_change(memory):>9}"
+            + ("  REGRESSION" if regressed else "")
+        )
+    for key in sorted(base.keys() - head.keys()):
+        lines.append(f"{key[0]:>7}  {key[1]:<22} only in base")
+    for key in sorted(head.keys() - base.keys()):
+        lines.append(f"{key[0]:>7}  {key[1]:<22} only in head")
+    return lines, regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    lines, regressions = compare(load_results(args.base), load_results(args.head), args.threshold)
+    print("\n".join(lines))
+    if regressions:
+        print(f"\n{len(regressions)} stage(s) regressed by more than {args.threshold:.0f}%")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
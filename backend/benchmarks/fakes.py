@@ -0,0 +1,111 @@
+import hashlib
+import json
+import random
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+CLOUD_SERVICES = {
+    "AWS": ["EC2", "ECS", "Lambda", "S3", "RDS", "DynamoDB", "API Gateway", "CloudFront", "SQS", "SNS"],
+    "Azure": ["App Service", "Functions", "Cosmos DB", "Blob Storage", "AKS", "SQL Database", "Service Bus"],
+    "GCP": ["Cloud Run", "GKE", "BigQuery", "Cloud Storage", "Pub/Sub", "Cloud SQL", "Firestore"],
+}
+TEAMS = ["決済基盤チーム", "会員基盤チーム", "データ分析チーム", "物流システムチーム", "社内ITチーム", "SREチーム"]
+TOPICS = [
+    "マイクロサービス", "イベント駆動", "バッチ処理", "リアルタイム分析", "サーバーレス", "コンテナ",
+    "キャッシュ", "全文検索", "機械学習", "認証認可", "ストリーミング", "データレイク",
+]
+
+
+class FakeEmbeddingClient:
+    """
+    ネットワークを使わない OpenAI クライアントの代わり（embeddings.create のみ）
+    テキストのハッシュを種にした乱数ベクトルを返すため、同じテキストには常に同じベクトルを返す
+    """
+
+    def __init__(self):
+        self.embeddings = self
+        self.requests = 0
+        self.inputs = 0
+
+    @staticmethod
+    def vector(text: str, dimensions: int) -> np.ndarray:
+        seed = int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+        return np.random.default_rng(seed).standard_normal(dimensions, dtype=np.float32)
+
+    def create(self, model: str, input: Any, dimensions: int = 1536, **kwargs) -> SimpleNamespace:
+        texts = [input] if isinstance(input, str) else list(input)
+        self.requests += 1
+        self.inputs += len(texts)
+        data = [
+            SimpleNamespace(index=i, embedding=self.vector(text, dimensions).tolist())
+            for i, text in enumerate(texts)
+        ]
+        tokens = sum(len(text) for text in texts)
+        return SimpleNamespace(data=data, usage=SimpleNamespace(prompt_tokens=tokens, total_tokens=tokens))
+
+
+class FakeHttpClient:
+    """
+    select-all-system のレスポンスを返す HttpClient の代わり
+    レスポンスはバイト列で保持し、呼び出しごとに JSON をデコードする（実際の取得と同じ処理量にする）
+    """
+
+    def __init__(self, documents: List[Dict]):
+        self.payload = json.dumps({"documents": documents}, ensure_ascii=False).encode()
+
+    def get_json(self, url: str, params: Optional[Dict] = None, **kwargs) -> Tuple[Any, bool]:
+        return json.loads(self.payload), False
+
+
+def make_catalog(
+    size: int,
+    seed: int = 0,
+    dimensions: Optional[int] = None,
+    model: str = "text-embedding-3-small"
+) -> List[Dict]:
+    """
+    架空のシステムを size 件生成（seed が同じなら同じ内容）
+    dimensions を指定した場合は保存済みの description_vector も付与する
+    """
+    rng = random.Random(seed)
+    created_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    documents = []
+    for i in range(size):
+        provider = rng.choice(list(CLOUD_SERVICES))
+        services = rng.sample(CLOUD_SERVICES[provider], rng.randint(2, 5))
+        topics = rng.sample(TOPICS, 3)
+        team = rng.choice(TEAMS)
+        description = (
+            f"{topics[0]}と{topics[1]}を組み合わせたシステム{i}。"
+            f"{provider}の{'、'.join(services)}で構成し、{topics[2]}の要件に対応する。"
+            f"{team}が運用し、ピーク時のトラフィックは通常時の{rng.randint(2, 20)}倍。"
+        )
+        document = {
+            "id": f"system-{i:06d}",
+            "system_name": f"{topics[0]}システム{i}",
+            "description": description,
+            "cloud_provider": provider,
+            "cloud_services": services,
+            "team": {"primary": team},
+            "repository": {"application": f"https://example.com/repos/system-{i:06d}"},
+            "created_at": (created_at + timedelta(minutes=i)).isoformat(),
+            "updated_at": (created_at + timedelta(minutes=i, days=30)).isoformat(),
+            "type": "system_architecture",
+        }
+        if dimensions is not None:
+            document["description_vector"] = FakeEmbeddingClient.vector(description, dimensions).tolist()
+            document["embedding_model"] = model
+        documents.append(document)
+    return documents
+
+
+def make_queries(count: int, seed: int = 1) -> List[str]:
+    """検索クエリを count 件生成"""
+    rng = random.Random(seed)
+    return [
+        f"{rng.choice(TOPICS)}を{rng.choice(list(CLOUD_SERVICES))}で構築したい ({i})"
+        for i in range(count)
+    ]
@@ -0,0 +1,91 @@
+import gc
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+
+@dataclass
+class Stage:
+    """
+    計測する処理
+    setup は各反復の前に呼ばれ（計測対象外）、その戻り値が run に渡される
+    """
+    name: str
+    run: Callable[[Any], Any]
+    setup: Optional[Callable[[], Any]] = None
+    iterations: int = 10
+    items_per_iteration: int = 1
+
+
+@dataclass
+class StageResult:
+    catalog_size: int
+    stage: str
+    iterations: int
+    items_per_iteration: int
+    latency_ms: Dict[str, float] = field(default_factory=dict)
+    throughput_per_second: float = 0.0
+    peak_memory_bytes: Optional[int] = None
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+def latency_summary(seconds: List[float]) -> Dict[str, float]:
+    """反復ごとの所要秒数をミリ秒の統計値に変換"""
+    values = np.asarray(seconds, dtype=np.float64) * 1000
+    return {
+        "mean": round(float(values.mean()), 4),
+        "p50": round(float(np.percentile(values, 50)), 4),
+        "p95": round(float(np.percentile(values, 95)), 4),
+        "p99": round(float(np.percentile(values, 99)), 4),
+        "min": round(float(values.min()), 4),
+        "max": round(float(values.max()), 4),
+    }
+
+
+def peak_memory(stage: Stage) -> int:
+    """1回分の実行で増えたメモリのピーク（tracemalloc による計測、setup の確保分は含まない）"""
+    argument = stage.setup() if stage.setup is not None else None
+    gc.collect()
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        stage.run(argument)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        del argument
+    return max(0, peak - baseline)
+
+
+def measure(stage: Stage, catalog_size: int, max_seconds: float = 10.0, memory: bool = True) -> StageResult:
+    """
+    stage を iterations 回（合計 max_seconds を超えたらその時点まで、最低1回）実行して計測
+    所要時間は tracemalloc を止めた状態で計り、メモリのピークは別の1回で計る
+    """
+    timings: List[float] = []
+    started_at = time.perf_counter()
+    for _ in range(max(1, stage.iterations)):
+        argument = stage.setup() if stage.setup is not None else None
+        start = time.perf_counter()
+        stage.run(argument)
+        timings.append(time.perf_counter() - start)
+        # 次の setup の前に前回の準備結果を解放する（インデックスなどが2つ同時に残らないように）
+        del argument
+        if time.perf_counter() - started_at > max_seconds:
+            break
+
+    total = sum(timings)
+    return StageResult(
+        catalog_size=catalog_size,
+        stage=stage.name,
+        iterations=len(timings),
+        items_per_iteration=stage.items_per_iteration,
+        latency_ms=latency_summary(timings),
+        throughput_per_second=round(len(timings) * stage.items_per_iteration / total, 2) if total > 0 else 0.0,
+        peak_memory_bytes=peak_memory(stage) if memory else None
+    )
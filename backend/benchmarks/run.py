@@ -0,0 +1,172 @@
+"""
+検索まわりの処理のマイクロベンチマーク
+
+使い方:
+    python -m backend.benchmarks.run --sizes 1000 10000 100000 --output bench.json
+    python -m backend.benchmarks.compare base.json bench.json
+
+ネットワークは使わず、架空のカタログと決定的な FakeEmbeddingClient で実行する
+段階ごとのレイテンシ（ミリ秒）、スループット（件/秒）、メモリのピークを JSON で出力する
+10万件 × 1536次元ではインデックスが複数同時に存在するため 6GB 程度のメモリが必要（--dimensions で調整できる）
+"""
+import argparse
+import itertools
+import json
+import logging
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .fakes import FakeEmbeddingClient, FakeHttpClient, make_catalog, make_queries
+from .harness import Stage, StageResult, measure
+from ..app.domain.services.embedding_service import EmbeddingService
+from ..app.infrastructure.repositories.system_repository import SystemRepository
+from ..app.infrastructure.tools.openai_scheduler import RequestScheduler
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run micro-benchmarks on synthetic catalogs")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="catalog sizes")
+    parser.add_argument("--dimensions", type=int, default=1536, help="embedding dimensions")
+    parser.add_argument("--queries", type=int, default=200, help="queries per search stage")
+    parser.add_argument("--repeat", type=int, default=5, help="iterations of the whole-catalog stages")
+    parser.add_argument("--max-seconds", type=float, default=10.0, help="time budget per stage")
+    parser.add_argument("--stages", nargs="+", help="run only these stages")
+    parser.add_argument("--no-memory", action="store_true", help="skip the peak-memory pass")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON to this file (default: stdout)")
+    return parser.parse_args(argv)
+
+
+def create_embedding_service(cache_dir: str, dimensions: int, client: FakeEmbeddingClient) -> EmbeddingService:
+    """FakeEmbeddingClient を使い、レート制限をかけない EmbeddingService を生成"""
+    return EmbeddingService(
+        "benchmark",
+        cache_dir=cache_dir,
+        dimensions=dimensions,
+        client=client,
+        scheduler=RequestScheduler(default_rpm=10 ** 9, default_tpm=10 ** 12, max_concurrency=64)
+    )
+
+
+def catalog_stages(size: int, args: argparse.Namespace, work_dir: Path) -> List[Stage]:
+    """カタログの件数が size の場合の計測対象"""
+    documents = make_catalog(size, seed=args.seed)
+    queries = make_queries(args.queries, seed=args.seed + 1)
+    client = FakeEmbeddingClient()
+    cache_dir = str(work_dir / f"cache-{size}")
+
+    repository = SystemRepository("http://benchmark.invalid", http_client=FakeHttpClient(documents))
+
+    # カタログと検索クエリの embedding をディスクキャッシュに用意（再起動後と同じ状態）
+    service = create_embedding_service(cache_dir, args.dimensions, client)
+    service.build_index(documents)
+    service.get_embeddings(queries)
+    misses = (f"キャッシュされていないクエリ {i}" for i in itertools.count())
+
+    return [
+        Stage(
+            "catalog_parse",
+            lambda _: repository.get_all_systems(),
+            iterations=args.repeat,
+            items_per_iteration=size
+        ),
+        Stage(
+            "index_build",
+            lambda fresh: fresh.build_index(documents),
+            setup=lambda: create_embedding_service(cache_dir, args.dimensions, client),
+            iterations=args.repeat,
+            items_per_iteration=size
+        ),
+        Stage(
+            "embedding_cache_hit",
+            lambda _: [service.get_embedding(query) for query in queries],
+            iterations=args.repeat,
+            items_per_iteration=len(queries)
+        ),
+        Stage(
+            "embedding_cache_miss",
+            lambda _: service.get_embedding(next(misses)),
+            iterations=args.queries
+        ),
+        Stage(
+            "similarity_top10",
+            lambda _: [service.calculate_similarity(query, top_k=10) for query in queries],
+            iterations=args.repeat,
+            items_per_iteration=len(queries)
+        ),
+        Stage(
+            "similarity_full",
+            lambda _: service.calculate_similarity(queries[0]),
+            iterations=args.repeat
+        ),
+    ]
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args: argparse.Namespace) -> Dict:
+    results: List[StageResult] = []
+    with tempfile.TemporaryDirectory(prefix="benchmark-") as work_dir:
+        for size in args.sizes:
+            start = time.perf_counter()
+            stages = catalog_stages(size, args, Path(work_dir))
+            logging.info(f"Prepared catalog of {size} systems in {time.perf_counter() - start:.1f}s")
+            for stage in stages:
+                if args.stages and stage.name not in args.stages:
+                    continue
+                result = measure(stage, size, max_seconds=args.max_seconds, memory=not args.no_memory)
+                logging.info(
+                    f"{size:>7} {stage.name:<22} p50 {result.latency_ms['p50']:>10.3f} ms  "
+                    f"{result.throughput_per_second:>12.1f} items/s  "
+                    f"peak {(result.peak_memory_bytes or 0) / 2 ** 20:>8.1f} MiB"
+                )
+                results.append(result)
+
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "dimensions": args.dimensions,
+            "queries": args.queries,
+            "seed": args.seed,
+        },
+        "results": [result.to_dict() for result in results],
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    args = parse_args(argv)
+    output = json.dumps(run(args), ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
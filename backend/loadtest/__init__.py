@@ -0,0 +1,5 @@
+"""
+ローカルのスタブサーバーを使った負荷試験
+- python -m backend.loadtest.stub_servers: Azure Functions と OpenAI API のスタブ
+- python -m backend.loadtest.driver: 同時利用者を模擬して段階ごとのレイテンシを計測
+"""
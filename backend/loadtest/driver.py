@@ -0,0 +1,285 @@
+"""
+検索 → システム選択 → 質問 → 登録 の流れを同時に実行する負荷試験
+
+使い方:
+    python -m backend.loadtest.driver --users 20 --duration 60 --catalog-size 5000 \
+        --openai-latency lognormal:400:0.4 --openai-error-rate 0.02 --output loadtest.json
+
+--functions-url / --openai-url を指定しない場合はスタブサーバーを同じプロセスで起動する
+段階ごとのレイテンシ（p50 / p95 / p99）、スループット、エラー率を出力する
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .stub_servers import StubServers, add_stub_arguments, start_stub_servers
+from ..app.config.settings import Settings
+from ..app.container import ServiceContainer
+from ..app.domain.services.llm_service import is_error_answer
+from ..benchmarks.fakes import CLOUD_SERVICES, TEAMS, TOPICS
+
+QUESTIONS = [
+    "このシステムのスケーラビリティについて教えてください",
+    "障害時の可用性はどのように確保されていますか",
+    "データベースの選定理由は何ですか",
+    "コストを下げるにはどの構成を見直すべきですか",
+    "セキュリティ上の懸念点はありますか",
+    "デプロイの方法と頻度について教えてください",
+]
+FOLLOW_UPS = ["それはなぜですか", "具体的な構成例を教えてください", "代わりの選択肢はありますか"]
+
+
+class StageRecorder:
+    """段階ごとのレイテンシとエラー数をスレッドセーフに記録"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float, ok: bool = True):
+        with self._lock:
+            if ok:
+                self.latencies.setdefault(stage, []).append(seconds)
+            else:
+                self.errors[stage] = self.errors.get(stage, 0) + 1
+
+    def timed(self, stage: str):
+        return _TimedStage(self, stage)
+
+    def summary(self, elapsed_seconds: float) -> Dict[str, Dict]:
+        with self._lock:
+            stages = sorted(self.latencies.keys() | self.errors.keys())
+            latencies = {stage: list(self.latencies.get(stage, [])) for stage in stages}
+            errors = dict(self.errors)
+        result = {}
+        for stage in stages:
+            values = np.asarray(latencies[stage], dtype=np.float64) * 1000
+            count = len(values) + errors.get(stage, 0)
+            result[stage] = {
+                "requests": count,
+                "errors": errors.get(stage, 0),
+                "error_rate": round(errors.get(stage, 0) / count, 4) if count else 0.0,
+                "throughput_per_second": round(len(values) / elapsed_seconds, 2) if elapsed_seconds > 0 else 0.0,
+                "latency_ms": {
+                    name: round(float(np.percentile(values, q)), 2) if len(values) else None
+                    for name, q in (("p50", 50), ("p95", 95), ("p99", 99), ("max", 100))
+                },
+            }
+        return result
+
+
+class _TimedStage:
+    """with ブロックの所要時間を記録（例外が出た場合はエラーとして記録し、例外は握りつぶす）"""
+
+    def __init__(self, recorder: StageRecorder, stage: str):
+        self.recorder = recorder
+        self.stage = stage
+        self.ok = True
+
+    def __enter__(self) -> "_TimedStage":
+        self.start = time.perf_counter()
+        return self
+
+    def fail(self):
+        self.ok = False
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if exc is not None:
+            logging.debug(f"{self.stage} failed: {exc}")
+        self.recorder.record(self.stage, time.perf_counter() - self.start, ok=self.ok and exc is None)
+        return exc_type is not None and issubclass(exc_type, Exception)
+
+
+class SimulatedUser:
+    """1人分の利用者（検索して結果から1件選び、何回か質問し、一定の割合でシステムを登録する）"""
+
+    def __init__(self, user_id: int, container: ServiceContainer, recorder: StageRecorder, args: argparse.Namespace):
+        self.user_id = user_id
+        self.container = container
+        self.recorder = recorder
+        self.args = args
+        self.random = random.Random(args.seed + user_id)
+
+    def think(self):
+        if self.args.think_time > 0:
+            time.sleep(self.random.expovariate(1 / self.args.think_time))
+
+    def search(self) -> List[Dict]:
+        topic, provider = self.random.choice(TOPICS), self.random.choice(list(CLOUD_SERVICES))
+        with self.recorder.timed("search") as stage:
+            results = self.container.search_service.hybrid_search(f"{provider}で{topic}を構築したい", top_k=10)
+            if not results:
+                stage.fail()
+            return results
+        return []
+
+    def ask(self, system: Dict, question: str, chat_history: List[Dict]) -> Optional[str]:
+        """回答をストリーミングで受け取り、最初のチャンクまでと全体の時間を記録"""
+        with self.recorder.timed("question") as stage:
+            start = time.perf_counter()
+            is_valid, _, stream = self.container.question_service.stream_question(question, system, chat_history)
+            if not is_valid:
+                stage.fail()
+                return None
+            deltas = []
+            for delta in stream:
+                if not deltas:
+                    self.recorder.record("question_first_chunk", time.perf_counter() - start)
+                deltas.append(delta)
+            answer = "".join(deltas)
+            if is_error_answer(answer):
+                stage.fail()
+                return None
+            return answer
+        return None
+
+    def register(self):
+        provider = self.random.choice(list(CLOUD_SERVICES))
+        topic = self.random.choice(TOPICS)
+        system = {
+            "system_name": f"負荷試験システム{self.user_id}-{self.random.randrange(10 ** 6)}",
+            "description": f"{provider}で構築した{topic}のシステム。負荷試験で登録した。",
+            "cloud_provider": provider,
+            "cloud_services": self.random.sample(CLOUD_SERVICES[provider], 3),
+            "team": {"primary": self.random.choice(TEAMS)},
+            "repository": {"application": "https://example.com/repos/loadtest"},
+        }
+        with self.recorder.timed("register"):
+            self.container.register_service.register_system(system)
+
+    def session(self):
+        results = self.search()
+        if not results:
+            return
+        self.think()
+        system = self.random.choice(results[:3])
+        chat_history: List[Dict] = []
+        question = self.random.choice(QUESTIONS)
+        for turn in range(self.args.turns):
+            answer = self.ask(system, question, chat_history)
+            if answer is None:
+                break
+            chat_history += [{"role": "user", "content": question}, {"role": "assistant", "content": answer}]
+            question = self.random.choice(FOLLOW_UPS)
+            self.think()
+        if self.random.random() < self.args.register_ratio:
+            self.register()
+
+    def run(self, deadline: float):
+        while time.monotonic() < deadline:
+            self.session()
+            self.think()
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Drive concurrent simulated users through the services")
+    parser.add_argument("--users", type=int, default=10, help="concurrent simulated users")
+    parser.add_argument("--duration", type=float, default=60, help="test duration in seconds")
+    parser.add_argument("--ramp-up", type=float, default=5, help="seconds over which users start")
+    parser.add_argument("--turns", type=int, default=2, help="questions per selected system")
+    parser.add_argument("--think-time", type=float, default=1.0, help="mean pause between steps (seconds)")
+    parser.add_argument("--register-ratio", type=float, default=0.1, help="share of sessions that register a system")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--functions-url", help="use this Azure Functions base URL instead of the stub")
+    parser.add_argument("--openai-url", help="use this OpenAI base URL instead of the stub")
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    add_stub_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def create_container(functions_url: str, openai_url: str, cache_dir: str) -> ServiceContainer:
+    """負荷試験の接続先を使うコンテナ（embedding キャッシュは空の一時ディレクトリ）"""
+    # LLMClient は OPENAI_BASE_URL を読んで接続先を決める
+    os.environ["OPENAI_BASE_URL"] = openai_url
+    settings = Settings(
+        AZURE_FUNCTION_URL=functions_url,
+        OPENAI_API_KEY=os.getenv("OPENAI_API_KEY", "loadtest"),
+        EMBEDDING_CACHE_DIR=cache_dir,
+        ANN_INDEX_PATH=None,
+        # 集計結果を読みやすくするため、ログは標準エラーにテキストで出す
+        LOG_DIR=None,
+        LOG_JSON=False
+    )
+    return ServiceContainer(settings)
+
+
+def run(args: argparse.Namespace) -> Dict:
+    servers: Optional[StubServers] = None
+    if not (args.functions_url and args.openai_url):
+        servers = start_stub_servers(args)
+    functions_url = args.functions_url or servers.functions_url
+    openai_url = args.openai_url or servers.openai_url
+
+    try:
+        with tempfile.TemporaryDirectory(prefix="loadtest-") as cache_dir:
+            container = create_container(functions_url, openai_url, cache_dir)
+            warm_up = container.warm_up()
+            logging.info(f"Warm-up: {warm_up}")
+
+            recorder = StageRecorder()
+            started_at = time.monotonic()
+            deadline = started_at + args.ramp_up + args.duration
+            users = []
+            for user_id in range(args.users):
+                user = SimulatedUser(user_id, container, recorder, args)
+                thread = threading.Thread(target=user.run, args=(deadline,), name=f"user-{user_id}", daemon=True)
+                thread.start()
+                users.append(thread)
+                time.sleep(args.ramp_up / max(1, args.users))
+            for thread in users:
+                thread.join()
+            elapsed = time.monotonic() - started_at
+
+            return {
+                "config": {
+                    key: str(value) if not isinstance(value, (int, float, str, bool, type(None))) else value
+                    for key, value in vars(args).items()
+                },
+                "elapsed_seconds": round(elapsed, 2),
+                "warm_up_seconds": {name: round(seconds, 3) for name, seconds in (warm_up or {}).items()},
+                "stages": recorder.summary(elapsed),
+                "openai_scheduler": container.openai_scheduler.metrics(),
+            }
+    finally:
+        if servers is not None:
+            servers.stop()
+
+
+def format_report(report: Dict) -> str:
+    lines = [
+        f"{'stage':<22} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    ]
+    for stage, result in report["stages"].items():
+        latency = result["latency_ms"]
+        lines.append(
+            f"{stage:<22} {result['requests']:>9} {result['errors']:>7} {result['throughput_per_second']:>8.2f} "
+            + " ".join(f"{latency[name]:>9.1f}" if latency[name] is not None else f"{'-':>9}" for name in ("p50", "p95", "p99"))
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    # リクエストごとのログで集計結果が埋もれないようにする
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    args = parse_args(argv)
+    report = run(args)
+    print(format_report(report))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
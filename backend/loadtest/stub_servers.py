@@ -0,0 +1,386 @@
+"""
+Azure Functions と OpenAI API の代わりに動かすローカルのスタブサーバー
+
+使い方:
+    python -m backend.loadtest.stub_servers --catalog-size 5000 \
+        --functions-latency lognormal:80:0.5 --openai-latency lognormal:400:0.4 --openai-error-rate 0.02
+
+- Azure Functions: GET /api/select-all-system（ETag / updated_since 対応）、POST /api/register-system
+- OpenAI: POST /v1/embeddings、POST /v1/chat/completions（stream 対応）、GET /v1/models/{model}
+レイテンシの分布、エラー率、カタログの件数、回答の長さを指定できる
+"""
+import argparse
+import base64
+import hashlib
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from ..benchmarks.fakes import FakeEmbeddingClient, make_catalog
+
+REQUIRED_FIELDS = ("system_name", "description", "cloud_provider", "cloud_services", "team", "repository")
+ANSWER_WORDS = [
+    "スケーラビリティ", "可用性", "キャッシュ", "非同期処理", "オートスケール", "冗長構成", "監視",
+    "コスト", "レイテンシ", "データ整合性", "リトライ", "サーキットブレーカー", "マネージドサービス",
+]
+
+
+@dataclass
+class LatencyDistribution:
+    """
+    応答までの待ち時間の分布（ミリ秒で指定）
+    fixed:<ms> / uniform:<min>:<max> / lognormal:<median>:<sigma>
+    """
+    kind: str = "fixed"
+    a: float = 0.0
+    b: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyDistribution":
+        kind, *values = spec.split(":")
+        if kind not in ("fixed", "uniform", "lognormal") or len(values) != (1 if kind == "fixed" else 2):
+            raise argparse.ArgumentTypeError(f"invalid latency distribution: {spec}")
+        numbers = [float(value) for value in values]
+        return cls(kind, numbers[0], numbers[1] if len(numbers) > 1 else 0.0)
+
+    def sample(self) -> float:
+        """待ち時間（秒）"""
+        if self.kind == "uniform":
+            return random.uniform(self.a, self.b) / 1000
+        if self.kind == "lognormal":
+            return random.lognormvariate(math.log(max(self.a, 1e-3)), self.b) / 1000
+        return self.a / 1000
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """JSON の送受信とチャンク転送の共通処理（server に latency / error_rate を持たせる）"""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def read_json(self) -> Any:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"null")
+
+    def send_json(self, status: int, body: Any, headers: Optional[Dict[str, str]] = None):
+        payload = json.dumps(body, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def send_empty(self, status: int, headers: Optional[Dict[str, str]] = None):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+
+    def start_chunked(self, content_type: str):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def end_chunked(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def simulate(self) -> bool:
+        """レイテンシを待ち、エラーを返す場合は False"""
+        time.sleep(self.server.latency.sample())
+        if random.random() < self.server.error_rate:
+            self.send_error_response()
+            return False
+        return True
+
+    def send_error_response(self):
+        self.send_json(503, {"error": "stub: injected failure"})
+
+
+class FunctionsHandler(StubHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.rstrip("/") != f"{self.server.prefix}/select-all-system":
+            return self.send_json(404, {"error": "not found"})
+        if not self.simulate():
+            return
+
+        since = parse_qs(url.query).get("updated_since", [None])[0]
+        version, documents = self.server.catalog.snapshot(since)
+        etag = f'"{version}-{hashlib.md5((since or "").encode()).hexdigest()[:8]}"'
+        if self.headers.get("If-None-Match") == etag:
+            return self.send_empty(304, {"ETag": etag})
+        body = {"documents": documents}
+        if since:
+            body.update({"deleted_ids": [], "delta": True})
+        self.send_json(200, body, {"ETag": etag})
+
+    def do_POST(self):
+        if urlparse(self.path).path.rstrip("/") != f"{self.server.prefix}/register-system":
+            return self.send_json(404, {"error": "not found"})
+        data = self.read_json()
+        if not self.simulate():
+            return
+        missing = [field for field in REQUIRED_FIELDS if field not in (data or {})]
+        if missing:
+            return self.send_json(400, {"error": f"missing fields: {', '.join(missing)}"})
+        document = self.server.catalog.register(data, self.headers.get("Idempotency-Key"))
+        self.send_json(200, {"message": "registered", "document": document})
+
+
+class OpenAIHandler(StubHandler):
+    def send_error_response(self):
+        # OpenAI と同様に、レート制限の場合は再試行までの待ち時間を返す
+        self.send_json(
+            429,
+            {"error": {"message": "stub: rate limit", "type": "rate_limit_exceeded", "code": "rate_limit_exceeded"}},
+            {"retry-after-ms": str(int(self.server.retry_after_ms))}
+        )
+
+    def do_GET(self):
+        match = re.fullmatch(r"/v1/models/(.+)", urlparse(self.path).path)
+        if not match:
+            return self.send_json(404, {"error": {"message": "not found"}})
+        self.send_json(200, {"id": match.group(1), "object": "model", "created": 0, "owned_by": "stub"})
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        body = self.read_json() or {}
+        if path == "/v1/embeddings":
+            if self.simulate():
+                self.embeddings(body)
+        elif path == "/v1/chat/completions":
+            if self.simulate():
+                self.chat_completions(body)
+        else:
+            self.send_json(404, {"error": {"message": "not found"}})
+
+    def embeddings(self, body: Dict):
+        texts = body.get("input")
+        texts = [texts] if isinstance(texts, str) else list(texts or [])
+        dimensions = int(body.get("dimensions") or 1536)
+        data = []
+        for i, text in enumerate(texts):
+            vector = FakeEmbeddingClient.vector(text, dimensions)
+            if body.get("encoding_format") == "base64":
+                embedding: Any = base64.b64encode(vector.astype("<f4").tobytes()).decode()
+            else:
+                embedding = vector.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+        tokens = sum(len(text) for text in texts)
+        self.send_json(200, {
+            "object": "list",
+            "data": data,
+            "model": body.get("model"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        })
+
+    def answer_text(self, messages: List[Dict], max_tokens: Optional[int]) -> str:
+        if any("valid: true/false" in str(message.get("content")) for message in messages):
+            return "valid: true\nreason: システムアーキテクチャに関する質問です"
+        words = max_tokens or self.server.answer_tokens
+        return "".join(random.choice(ANSWER_WORDS) + "。" for _ in range(max(1, min(words, self.server.answer_tokens))))
+
+    def chat_completions(self, body: Dict):
+        messages = body.get("messages") or []
+        text = self.answer_text(messages, body.get("max_tokens"))
+        prompt_tokens = sum(len(str(message.get("content", ""))) for message in messages) // 2
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        if not body.get("stream"):
+            return self.send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": body.get("model"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": "stop",
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": len(text),
+                    "total_tokens": prompt_tokens + len(text),
+                },
+            })
+
+        def event(delta: Dict, finish_reason: Optional[str] = None) -> bytes:
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": body.get("model"),
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode()
+
+        self.start_chunked("text/event-stream")
+        self.write_chunk(event({"role": "assistant", "content": ""}))
+        for sentence in text.split("。"):
+            if sentence:
+                time.sleep(self.server.token_delay)
+                self.write_chunk(event({"content": sentence + "。"}))
+        self.write_chunk(event({}, "stop"))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            usage_chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": body.get("model"),
+                "choices": [],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": len(text),
+                    "total_tokens": prompt_tokens + len(text),
+                },
+            }
+            self.write_chunk(f"data: {json.dumps(usage_chunk, ensure_ascii=False)}\n\n".encode())
+        self.write_chunk(b"data: [DONE]\n\n")
+        self.end_chunked()
+
+
+class StubCatalog:
+    """スタブの Azure Functions が返すカタログ（登録されたシステムも追加される）"""
+
+    def __init__(self, documents: List[Dict]):
+        self.documents = {document["id"]: document for document in documents}
+        self.version = 0
+        self.registered_keys: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def snapshot(self, since: Optional[str] = None) -> Tuple[int, List[Dict]]:
+        with self._lock:
+            documents = list(self.documents.values())
+            version = self.version
+        if since:
+            documents = [document for document in documents if (document.get("updated_at") or "") > since]
+        return version, documents
+
+    def register(self, data: Dict, idempotency_key: Optional[str] = None) -> Dict:
+        """登録（同じ Idempotency-Key の再送は最初の登録結果を返す）"""
+        now = datetime.now(timezone.utc).isoformat()
+        document = {
+            **data,
+            "id": data.get("id") or f"system-{uuid.uuid4().hex[:12]}",
+            "created_at": now,
+            "updated_at": now,
+            "type": "system_architecture",
+        }
+        with self._lock:
+            if idempotency_key in self.registered_keys:
+                return self.registered_keys[idempotency_key]
+            self.documents[document["id"]] = document
+            if idempotency_key:
+                self.registered_keys[idempotency_key] = document
+            self.version += 1
+        return document
+
+
+class StubServers:
+    """スタブサーバーを別スレッドで起動・停止"""
+
+    def __init__(self, functions: ThreadingHTTPServer, openai: ThreadingHTTPServer):
+        self.functions = functions
+        self.openai = openai
+        self._threads = [
+            threading.Thread(target=server.serve_forever, name=f"stub-{name}", daemon=True)
+            for name, server in (("functions", functions), ("openai", openai))
+        ]
+
+    @property
+    def functions_url(self) -> str:
+        host, port = self.functions.server_address[:2]
+        return f"http://{host}:{port}{self.functions.prefix}"
+
+    @property
+    def openai_url(self) -> str:
+        host, port = self.openai.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "StubServers":
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        for server in (self.functions, self.openai):
+            server.shutdown()
+            server.server_close()
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser):
+    """スタブサーバーの設定（driver からも使う）"""
+    group = parser.add_argument_group("stub servers")
+    group.add_argument("--host", default="127.0.0.1")
+    group.add_argument("--functions-port", type=int, default=0, help="0 picks a free port")
+    group.add_argument("--openai-port", type=int, default=0, help="0 picks a free port")
+    group.add_argument("--catalog-size", type=int, default=1000)
+    group.add_argument("--stored-vectors", action="store_true", help="include description_vector in the catalog")
+    group.add_argument("--dimensions", type=int, default=1536, help="dimensions of the stored vectors")
+    group.add_argument("--functions-latency", type=LatencyDistribution.parse, default=LatencyDistribution.parse("lognormal:50:0.5"))
+    group.add_argument("--functions-error-rate", type=float, default=0.0)
+    group.add_argument("--openai-latency", type=LatencyDistribution.parse, default=LatencyDistribution.parse("lognormal:300:0.5"))
+    group.add_argument("--openai-error-rate", type=float, default=0.0, help="share of requests answered with 429")
+    group.add_argument("--retry-after-ms", type=float, default=500)
+    group.add_argument("--answer-tokens", type=int, default=60, help="sentences per chat answer")
+    group.add_argument("--token-delay-ms", type=float, default=20, help="delay between streamed sentences")
+
+
+def start_stub_servers(args: argparse.Namespace) -> StubServers:
+    """引数の設定でスタブサーバーを起動"""
+    functions = ThreadingHTTPServer((args.host, args.functions_port), FunctionsHandler)
+    functions.daemon_threads = True
+    functions.prefix = "/api"
+    functions.latency = args.functions_latency
+    functions.error_rate = args.functions_error_rate
+    functions.catalog = StubCatalog(make_catalog(
+        args.catalog_size,
+        dimensions=args.dimensions if args.stored_vectors else None
+    ))
+
+    openai = ThreadingHTTPServer((args.host, args.openai_port), OpenAIHandler)
+    openai.daemon_threads = True
+    openai.latency = args.openai_latency
+    openai.error_rate = args.openai_error_rate
+    openai.retry_after_ms = args.retry_after_ms
+    openai.answer_tokens = args.answer_tokens
+    openai.token_delay = args.token_delay_ms / 1000
+    return StubServers(functions, openai).start()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run local stand-ins for Azure Functions and the OpenAI API")
+    add_stub_arguments(parser)
+    args = parser.parse_args(argv)
+    servers = start_stub_servers(args)
+    print(f"AZURE_FUNCTION_URL={servers.functions_url}")
+    print(f"OPENAI_BASE_URL={servers.openai_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        servers.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from backend.app.domain.services.answer_cache import SemanticAnswerCache
+from backend.app.infrastructure.repositories.catalog_sync import CatalogSync
+
+
+class FakeEmbeddingService:
+    """質問の文字列から決まるベクトルを返す（同じ質問は類似度1）"""
+
+    def get_embedding(self, text: str) -> np.ndarray:
+        rng = np.random.default_rng(sum(text.encode("utf-8")))
+        return rng.standard_normal(8).astype(np.float32)
+
+
+class FakeRepository:
+    def __init__(self, responses: List[Dict]):
+        self.responses = list(responses)
+
+    def get_system_changes(self, since: Optional[str] = None) -> Dict:
+        return self.responses.pop(0)
+
+
+def system(system_id: str, updated_at: str) -> Dict:
+    return {"id": system_id, "updated_at": updated_at}
+
+
+def test_catalog_changes_invalidate_answers_even_for_stale_sessions():
+    repository = FakeRepository([
+        {"documents": [system("a", "v1"), system("b", "v1")], "deleted_ids": [], "delta": False},
+        {"documents": [system("a", "v2")], "deleted_ids": ["b"], "delta": True},
+    ])
+    catalog_sync = CatalogSync(repository)
+    cache = SemanticAnswerCache(FakeEmbeddingService())
+    catalog_sync.subscribe(cache.apply_catalog_changes)
+    catalog_sync.sync()
+
+    stale_a, stale_b = system("a", "v1"), system("b", "v1")
+    cache.put(stale_a, "可用性は？", "回答A")
+    cache.put(stale_b, "可用性は？", "回答B")
+    assert cache.get(stale_a, "可用性は？") == "回答A"
+
+    catalog_sync.sync()
+
+    # 古いコンテキストを持ち続けるセッションにも更新前の回答を返さない
+    assert cache.get(stale_a, "可用性は？") is None
+    assert cache.get(stale_b, "可用性は？") is None
+    assert len(cache) == 0
+
+
+def test_hit_and_miss_counters_are_consistent_under_concurrency():
+    cache = SemanticAnswerCache(FakeEmbeddingService())
+    context = system("a", "v1")
+    cache.put(context, "可用性は？", "回答")
+
+    def read():
+        for _ in range(500):
+            cache.get(context, "可用性は？")
+            cache.get(system("other", "v1"), "可用性は？")
+
+    threads = [threading.Thread(target=read) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert cache.hits == 8 * 500 and cache.misses == 8 * 500
@@ -0,0 +1,235 @@
+import json
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import pytest
+
+from backend.app.domain.services.bulk_import_service import BulkImportService, ImportCheckpoint
+from backend.app.domain.services.register_service import RegisterService
+
+TOTAL = 1000
+INVALID_EVERY = 50
+
+
+class FakeEmbeddingService:
+    model = "text-embedding-3-small"
+
+    def __init__(self):
+        self.calls = 0
+
+    def get_stored_vector(self, doc: Dict):
+        return None
+
+    def get_embeddings(self, texts: List[str]) -> List[np.ndarray]:
+        self.calls += 1
+        return [np.zeros(4, dtype=np.float32) for _ in texts]
+
+
+class FakeRegisterService(RegisterService):
+    """登録APIの代わりに呼び出しを記録し、同時に実行中の登録数の最大値を計る"""
+
+    def __init__(self, delay: float = 0.0, fail_names=()):
+        super().__init__("https://functions.example.com/api", http_client=object())
+        self.delay = delay
+        self.fail_names = set(fail_names)
+        self.registered: List[str] = []
+        self.keys: Dict[str, str] = {}
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def register_system(self, system_data: Dict, idempotency_key: Optional[str] = None) -> Dict:
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            if self.delay:
+                time.sleep(self.delay)
+            if system_data["system_name"] in self.fail_names:
+                raise Exception("API request failed: 500")
+            with self._lock:
+                self.registered.append(system_data["system_name"])
+                self.keys[system_data["system_name"]] = idempotency_key
+            return {"id": system_data["system_name"]}
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+class FakeCatalogCache:
+    def __init__(self):
+        self.invalidated = 0
+
+    def invalidate(self):
+        self.invalidated += 1
+
+
+def record(index: int) -> Dict:
+    data = {
+        "system_name": f"system-{index}",
+        "description": f"説明 {index}",
+        "cloud_provider": "AWS",
+        "cloud_services": ["Lambda"],
+        "team": {"primary": "基盤チーム"},
+        "repository": {"application": "https://example.com/repo"},
+    }
+    if index % INVALID_EVERY == 0:
+        data["cloud_provider"] = "OnPrem"
+    return data
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "systems.jsonl"
+    path.write_text("".join(json.dumps(record(i), ensure_ascii=False) + "\n" for i in range(TOTAL)), encoding="utf-8")
+    return path
+
+
+class Interrupted(Exception):
+    pass
+
+
+def test_interrupted_import_resumes_from_checkpoint(source, tmp_path):
+    checkpoint, rejects = tmp_path / "systems.checkpoint.json", tmp_path / "systems.rejects.jsonl"
+    register_service = FakeRegisterService()
+    service = BulkImportService(
+        register_service,
+        FakeEmbeddingService(),
+        batch_size=100,
+        max_concurrency=4,
+        checkpoint_interval=0
+    )
+
+    def interrupt(report):
+        if report.total >= 300:
+            raise Interrupted()
+
+    with pytest.raises(Interrupted):
+        service.run(str(source), checkpoint_path=str(checkpoint), reject_path=str(rejects), progress=interrupt)
+    first_run = len(register_service.registered)
+    assert 0 < first_run < TOTAL
+    assert json.loads(checkpoint.read_text())["completed"] == 300
+
+    report = service.run(str(source), checkpoint_path=str(checkpoint), reject_path=str(rejects))
+
+    invalid = TOTAL // INVALID_EVERY
+    assert report.skipped == 300
+    assert report.imported + first_run == TOTAL - invalid
+    # 中断前に登録したレコードは再登録しない
+    assert len(register_service.registered) == len(set(register_service.registered)) == TOTAL - invalid
+    assert json.loads(checkpoint.read_text())["completed"] == TOTAL
+
+
+def test_registrations_carry_a_key_stable_across_runs(source):
+    register_service = FakeRegisterService()
+    service = BulkImportService(register_service, FakeEmbeddingService(), batch_size=100)
+
+    service.run(str(source))
+    first_keys = dict(register_service.keys)
+    service.run(str(source))
+
+    # 再開時に再送しても同じキーになり、登録APIが重複を判別できる
+    assert register_service.keys == first_keys
+    assert first_keys["system-1"] == BulkImportService.idempotency_key(str(source), 1)
+    assert len(set(first_keys.values())) == len(first_keys)
+
+
+def test_rejects_are_written_with_reason_and_can_be_reimported(source, tmp_path):
+    rejects = tmp_path / "systems.rejects.jsonl"
+    register_service = FakeRegisterService(fail_names={"system-7"})
+    service = BulkImportService(register_service, FakeEmbeddingService(), batch_size=64, max_concurrency=4, max_retries=0)
+
+    report = service.run(str(source), reject_path=str(rejects))
+
+    lines = [json.loads(line) for line in rejects.read_text(encoding="utf-8").splitlines()]
+    assert report.rejected == len(lines) == TOTAL // INVALID_EVERY + 1
+    assert {line["_line"] for line in lines} == {i for i in range(0, TOTAL, INVALID_EVERY)} | {7}
+    failed = next(line for line in lines if line["_line"] == 7)
+    assert "500" in failed["_error"]
+    assert "description_vector" not in failed
+
+    # リジェクトファイルはそのまま入力にできる（注記の項目は読み込み時に除かれる）
+    register_service.fail_names.clear()
+    retried = service.run(str(rejects))
+    assert retried.imported == 1
+    assert retried.rejected == TOTAL // INVALID_EVERY
+
+
+def test_malformed_lines_are_rejected_without_stopping_the_import(tmp_path):
+    source, rejects = tmp_path / "systems.jsonl", tmp_path / "systems.rejects.jsonl"
+    lines = [json.dumps(record(1)), "{broken", "[1, 2]", json.dumps(record(3))]
+    source.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    register_service = FakeRegisterService()
+    service = BulkImportService(register_service, FakeEmbeddingService(), batch_size=10)
+
+    report = service.run(str(source), reject_path=str(rejects))
+
+    assert report.imported == 2 and report.rejected == 2
+    assert sorted(register_service.registered) == ["system-1", "system-3"]
+    rejected = [json.loads(line) for line in rejects.read_text(encoding="utf-8").splitlines()]
+    assert [(line["_line"], line["_raw"]) for line in rejected] == [(1, "{broken"), (2, "[1, 2]")]
+
+
+def test_csv_rows_with_invalid_json_cells_are_rejected(tmp_path):
+    source, rejects = tmp_path / "systems.csv", tmp_path / "systems.rejects.jsonl"
+    source.write_text(
+        "system_name,description,cloud_provider,cloud_services,team,repository\n"
+        "a,説明,AWS,Lambda,基盤,https://example.com/a\n"
+        "b,説明,AWS,Lambda,{broken,https://example.com/b\n"
+        "c,説明,Azure,\"Functions,Cosmos DB\",決済,https://example.com/c\n",
+        encoding="utf-8"
+    )
+    register_service = FakeRegisterService()
+    service = BulkImportService(register_service, FakeEmbeddingService(), batch_size=10)
+
+    report = service.run(str(source), reject_path=str(rejects))
+
+    assert sorted(register_service.registered) == ["a", "c"]
+    assert report.rejected == 1
+    rejected = json.loads(rejects.read_text(encoding="utf-8"))
+    assert rejected["_line"] == 1 and rejected["_raw"]["system_name"] == "b"
+    assert rejected["_error"].startswith("parse error")
+
+
+def test_concurrent_registrations_are_capped(source):
+    register_service = FakeRegisterService(delay=0.002)
+    catalog_cache = FakeCatalogCache()
+    service = BulkImportService(
+        register_service,
+        FakeEmbeddingService(),
+        batch_size=100,
+        max_concurrency=3,
+        catalog_cache=catalog_cache
+    )
+
+    report = service.run(str(source))
+
+    assert report.imported == TOTAL - TOTAL // INVALID_EVERY
+    assert 1 < register_service.max_active <= 3
+    # カタログのキャッシュは1件ずつではなく最後に1回だけ無効化する
+    assert catalog_cache.invalidated == 1
+
+
+def test_checkpoint_merges_out_of_order_completions(tmp_path):
+    path = tmp_path / "checkpoint.json"
+    checkpoint = ImportCheckpoint(str(path), "systems.jsonl")
+    for line in (0, 2, 3, 5):
+        checkpoint.mark(line)
+    assert checkpoint.completed == 1 and checkpoint.done == {2, 3, 5}
+
+    checkpoint.mark(1)
+    checkpoint.save()
+    loaded = ImportCheckpoint(str(path), "systems.jsonl").load()
+
+    assert loaded.completed == 4 and loaded.done == {5}
+    assert loaded.is_done(3) and loaded.is_done(5) and not loaded.is_done(4)
+
+
+def test_checkpoint_for_another_source_is_rejected(tmp_path):
+    path = tmp_path / "checkpoint.json"
+    ImportCheckpoint(str(path), "a.jsonl").save()
+
+    with pytest.raises(ValueError):
+        ImportCheckpoint(str(path), "b.jsonl").load()
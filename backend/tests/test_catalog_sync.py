@@ -0,0 +1,101 @@
+from typing import Dict, List, Optional
+
+from backend.app.infrastructure.repositories.catalog_sync import CatalogSync
+
+
+class FakeRepository:
+    """get_system_changes の応答を順に返し、受け取った since を記録する"""
+
+    def __init__(self, responses: List[Dict]):
+        self.responses = list(responses)
+        self.since_values: List[Optional[str]] = []
+
+    def get_system_changes(self, since: Optional[str] = None) -> Dict:
+        self.since_values.append(since)
+        return self.responses.pop(0)
+
+
+def doc(doc_id: str, updated_at: str, **fields) -> Dict:
+    return {"id": doc_id, "updated_at": updated_at, **fields}
+
+
+def full(*docs: Dict) -> Dict:
+    return {"documents": list(docs), "deleted_ids": [], "delta": False}
+
+
+def delta(*docs: Dict, deleted_ids: Optional[List[str]] = None) -> Dict:
+    return {"documents": list(docs), "deleted_ids": deleted_ids or [], "delta": True}
+
+
+def test_first_sync_loads_full_catalog_and_sets_watermark():
+    repository = FakeRepository([full(doc("a", "2026-01-01"), doc("b", "2026-01-03"))])
+    sync = CatalogSync(repository)
+
+    assert sync.sync() is True
+    assert repository.since_values == [None]
+    assert sorted(d["id"] for d in sync.documents()) == ["a", "b"]
+    assert sync.watermark == "2026-01-03"
+
+
+def test_upsert_before_first_sync_does_not_skip_full_load():
+    repository = FakeRepository([full(doc("a", "2026-01-01"), doc("b", "2026-01-02"))])
+    sync = CatalogSync(repository)
+
+    sync.upsert(doc("new", "2026-10-18"))
+    assert sync.watermark is None
+
+    sync.sync()
+    assert repository.since_values == [None]
+    # 全件の応答に登録直後のシステムが含まれていなければ削除扱いになる（サーバーが正）
+    assert sorted(d["id"] for d in sync.documents()) == ["a", "b"]
+
+
+def test_upsert_does_not_skip_changes_from_other_writers():
+    repository = FakeRepository([
+        full(doc("a", "2026-01-01")),
+        delta(doc("other", "2026-01-05"), doc("mine", "2026-01-09")),
+    ])
+    sync = CatalogSync(repository)
+    sync.sync()
+
+    sync.upsert(doc("mine", "2026-01-09"))
+    assert sync.watermark == "2026-01-01"
+
+    sync.sync()
+    assert repository.since_values == [None, "2026-01-01"]
+    assert sorted(d["id"] for d in sync.documents()) == ["a", "mine", "other"]
+    assert sync.watermark == "2026-01-09"
+
+
+def test_delta_applies_upserts_tombstones_and_deletions():
+    repository = FakeRepository([
+        full(doc("a", "1"), doc("b", "1"), doc("c", "1")),
+        delta(doc("a", "2", name="changed"), doc("b", "3", deleted=True), deleted_ids=["c"]),
+    ])
+    sync = CatalogSync(repository)
+    sync.sync()
+    sync.sync()
+
+    assert [d["id"] for d in sync.documents()] == ["a"]
+    assert sync.get("a")["name"] == "changed"
+    assert sync.watermark == "3"
+
+
+def test_listeners_receive_changes_and_unchanged_sync_is_noop():
+    repository = FakeRepository([
+        full(doc("a", "1")),
+        delta(doc("a", "1")),
+        delta(doc("b", "2"), deleted_ids=["a"]),
+    ])
+    sync = CatalogSync(repository)
+    sync.sync()
+    calls = []
+    sync.subscribe(lambda upserts, deleted: calls.append(([d["id"] for d in upserts], deleted)))
+
+    assert sync.sync() is False
+    assert sync.sync() is True
+    version, documents = sync.snapshot()
+
+    assert calls == [(["a"], []), (["b"], ["a"])]
+    assert version == 2
+    assert [d["id"] for d in documents] == ["b"]
@@ -0,0 +1,148 @@
+import threading
+
+import numpy as np
+
+from backend.app.infrastructure.tools.embedding_cache import (
+    INDEX_DTYPE,
+    EmbeddingCacheStore,
+    TieredEmbeddingCache,
+)
+
+DIMENSIONS = 16
+
+
+def key(index: int) -> bytes:
+    return EmbeddingCacheStore.make_key(f"text {index}", "text-embedding-3-small", DIMENSIONS)
+
+
+def vector(index: int) -> np.ndarray:
+    return np.full(DIMENSIONS, index, dtype=np.float32)
+
+
+def test_store_round_trips_and_is_shared_between_instances(tmp_path):
+    # 他のインスタンスの追記をすぐに読めるよう、索引の取り込みを間引かない
+    store = EmbeddingCacheStore(str(tmp_path), refresh_interval=0)
+    store.put_many([(key(i), vector(i)) for i in range(3)])
+
+    assert len(store) == 3
+    np.testing.assert_array_equal(store.get(key(1)), vector(1))
+    assert store.get(key(99)) is None
+
+    # 別のインスタンス（別プロセス相当）が追記した分も読める
+    other = EmbeddingCacheStore(str(tmp_path))
+    other.put(key(3), vector(3))
+    np.testing.assert_array_equal(store.get(key(3)), vector(3))
+
+
+def test_store_ignores_duplicate_keys(tmp_path):
+    store = EmbeddingCacheStore(str(tmp_path))
+    store.put(key(1), vector(1))
+    store.put_many([(key(1), vector(2)), (key(1), vector(3))])
+
+    assert len(store) == 1
+    np.testing.assert_array_equal(store.get(key(1)), vector(1))
+
+
+def test_compaction_drops_entries_and_readers_follow_new_generation(tmp_path):
+    store = EmbeddingCacheStore(str(tmp_path))
+    reader = EmbeddingCacheStore(str(tmp_path), refresh_interval=0)
+    store.put_many([(key(i), vector(i)) for i in range(4)])
+    np.testing.assert_array_equal(reader.get(key(0)), vector(0))
+
+    removed = store.compact(lambda k, _: k != key(0))
+    store.put(key(10), vector(10))
+
+    assert removed == 1
+    assert len(store) == 4 and key(0) not in store
+    # 未知のキーを引いた時点で新しい世代の索引に切り替わる
+    np.testing.assert_array_equal(reader.get(key(10)), vector(10))
+    np.testing.assert_array_equal(reader.get(key(2)), vector(2))
+    assert reader.get(key(0)) is None
+
+
+def test_misses_refresh_the_index_at_most_once_per_batch(tmp_path, monkeypatch):
+    store = EmbeddingCacheStore(str(tmp_path), refresh_interval=0)
+    store.put_many([(key(i), vector(i)) for i in range(2)])
+    refreshes = []
+    original_refresh = EmbeddingCacheStore._refresh
+    monkeypatch.setattr(EmbeddingCacheStore, "_refresh", lambda self: (refreshes.append(1), original_refresh(self)))
+
+    vectors = store.get_many([key(i) for i in range(100)])
+
+    assert len(refreshes) == 1
+    np.testing.assert_array_equal(vectors[1], vector(1))
+    assert all(v is None for v in vectors[2:])
+
+
+def test_single_misses_refresh_the_index_at_most_once_per_interval(tmp_path, monkeypatch):
+    store = EmbeddingCacheStore(str(tmp_path), refresh_interval=60)
+    refreshes = []
+    original_refresh = EmbeddingCacheStore._refresh
+    monkeypatch.setattr(EmbeddingCacheStore, "_refresh", lambda self: (refreshes.append(1), original_refresh(self)))
+
+    for i in range(100):
+        assert store.get(key(i)) is None
+    assert refreshes == []
+
+    # 自身の追記はすぐに読める
+    store.put(key(1), vector(1))
+    np.testing.assert_array_equal(store.get(key(1)), vector(1))
+
+
+def test_tiered_get_many_reads_disk_only_for_memory_misses(tmp_path):
+    cache = TieredEmbeddingCache(str(tmp_path), memory_bytes=1024 * 1024)
+    cache.put_many([(key(i), vector(i)) for i in range(2)])
+    cache.memory.clear()
+    cache.get(key(0))
+
+    vectors = cache.get_many([key(0), key(1), key(2)])
+
+    np.testing.assert_array_equal(vectors[1], vector(1))
+    assert vectors[2] is None
+    stats = cache.stats.to_dict()
+    assert stats["memory_hits"] == 1 and stats["disk_hits"] == 2 and stats["disk_misses"] == 1
+
+
+def test_tiered_cache_promotes_disk_hits_to_memory(tmp_path):
+    cache = TieredEmbeddingCache(str(tmp_path), memory_bytes=1024 * 1024, refresh_interval=0)
+    EmbeddingCacheStore(str(tmp_path)).put(key(1), vector(1))
+
+    np.testing.assert_array_equal(cache.get(key(1)), vector(1))
+    np.testing.assert_array_equal(cache.get(key(1)), vector(1))
+    assert cache.get(key(2)) is None
+
+    stats = cache.stats.to_dict()
+    assert stats["disk_hits"] == 1 and stats["memory_hits"] == 1
+    assert stats["memory_misses"] == 2 and stats["disk_misses"] == 1
+
+
+def test_disk_eviction_keeps_recently_accessed_entries(tmp_path):
+    entry_bytes = DIMENSIONS * 4 + INDEX_DTYPE.itemsize
+    cache = TieredEmbeddingCache(str(tmp_path), memory_bytes=0, max_disk_bytes=10 * entry_bytes)
+    cache.put_many([(key(i), vector(i)) for i in range(8)])
+
+    # 最初に書き込んだエントリを参照しておく
+    assert cache.get(key(0)) is not None
+    cache.put_many([(key(i), vector(i)) for i in range(8, 12)])
+
+    assert cache.stats.disk_evictions > 0
+    assert key(0) in cache.disk
+    assert key(1) not in cache.disk
+    assert key(11) in cache.disk
+
+
+def test_hit_counters_are_consistent_under_concurrency(tmp_path):
+    cache = TieredEmbeddingCache(str(tmp_path), memory_bytes=1024 * 1024)
+    cache.put_many([(key(i), vector(i)) for i in range(4)])
+
+    def read():
+        for i in range(2000):
+            cache.get(key(i % 4))
+
+    threads = [threading.Thread(target=read) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert cache.stats.memory_hits == 8 * 2000
@@ -0,0 +1,127 @@
+import threading
+
+import numpy as np
+import pytest
+
+from backend.app.domain.services import embedding_service as embedding_module
+from backend.app.domain.services.embedding_service import EmbeddingService
+from backend.app.infrastructure.tools.openai_scheduler import RequestScheduler
+
+DIMENSIONS = 8
+
+
+def make_doc(index: int, rng: np.random.Generator) -> dict:
+    return {
+        "id": f"doc-{index}",
+        "description": f"system {index}",
+        "updated_at": "2026-01-01",
+        "description_vector": rng.standard_normal(DIMENSIONS).tolist(),
+    }
+
+
+@pytest.fixture
+def service(tmp_path):
+    # 保存済みの description_vector だけを使うため OpenAI には接続しない
+    return EmbeddingService(
+        api_key="test",
+        cache_dir=str(tmp_path / "cache"),
+        dimensions=DIMENSIONS,
+        ann_min_size=50,
+        ann_nlist=4,
+        ann_nprobe=4,
+        client=object(),
+        scheduler=RequestScheduler()
+    )
+
+
+def wait_for_rebuild(service: EmbeddingService):
+    thread = service._ann_rebuild
+    if thread is not None:
+        thread.join(timeout=10)
+    assert service._ann_rebuild is None
+
+
+def test_ann_index_is_built_in_background_once_catalog_is_large(service):
+    rng = np.random.default_rng(0)
+    service.apply_catalog_changes([make_doc(i, rng) for i in range(40)], [])
+    assert service.ann_index is None and service._ann_rebuild is None
+
+    service.apply_catalog_changes([make_doc(i, rng) for i in range(40, 60)], [])
+    wait_for_rebuild(service)
+
+    assert service.ann_index is not None
+    assert len(service.ann_index) == 60
+    assert service._ann_stale == set()
+
+
+def test_searches_are_not_blocked_while_ann_index_rebuilds(service, monkeypatch):
+    rng = np.random.default_rng(1)
+    docs = [make_doc(i, rng) for i in range(100)]
+    service.apply_catalog_changes(docs, [])
+    wait_for_rebuild(service)
+    old_index = service.ann_index
+
+    release = threading.Event()
+    original_build = embedding_module.IVFIndex.build
+
+    def slow_build(self, *args, **kwargs):
+        release.wait(timeout=10)
+        return original_build(self, *args, **kwargs)
+
+    monkeypatch.setattr(embedding_module.IVFIndex, "build", slow_build)
+
+    # 10% を超える変更で再構築が始まる
+    changed = [make_doc(i, rng) for i in range(100, 115)]
+    service.apply_catalog_changes(changed, [])
+    assert service._ann_rebuild is not None
+
+    # 再構築中も検索でき、変更分は厳密インデックスで採点される
+    query = np.asarray(changed[0]["description_vector"], dtype=np.float32)
+    acquired = service._index_lock.acquire(timeout=1)
+    assert acquired
+    try:
+        assert service.ann_index is old_index
+        assert service._search_index(query, 5)[0][0] == "doc-100"
+    finally:
+        service._index_lock.release()
+
+    # 再構築中の変更は新しいインデックスの構築後の変更として残る
+    service.apply_catalog_changes([make_doc(200, rng)], [])
+    release.set()
+    wait_for_rebuild(service)
+
+    assert service.ann_index is not old_index
+    assert len(service.ann_index) == 115
+    assert service._ann_stale == {"doc-200"}
+
+
+def test_rows_rewritten_during_rebuild_are_scored_exactly(service, monkeypatch):
+    rng = np.random.default_rng(2)
+    service.apply_catalog_changes([make_doc(i, rng) for i in range(100)], [])
+    wait_for_rebuild(service)
+
+    release = threading.Event()
+    original_build = embedding_module.IVFIndex.build
+
+    def slow_build(self, *args, **kwargs):
+        release.wait(timeout=10)
+        return original_build(self, *args, **kwargs)
+
+    monkeypatch.setattr(embedding_module.IVFIndex, "build", slow_build)
+    changed = [make_doc(i, rng) for i in range(100, 115)]
+    service.apply_catalog_changes(changed, [])
+    assert service._ann_rebuild is not None
+
+    # 構築中の削除で末尾の doc-114 が移動し、空いた末尾の行に doc-300 が書き込まれる
+    added = make_doc(300, rng)
+    service.apply_catalog_changes([], ["doc-3"])
+    service.apply_catalog_changes([added], [])
+    release.set()
+    wait_for_rebuild(service)
+
+    assert "doc-114" in service._ann_stale
+    moved_query = np.asarray(changed[-1]["description_vector"], dtype=np.float32)
+    assert service._search_index(moved_query, 3)[0] == ("doc-114", pytest.approx(1.0, abs=1e-5))
+    added_query = np.asarray(added["description_vector"], dtype=np.float32)
+    hits = service._search_index(added_query, 3)
+    assert hits[0][0] == "doc-300" and hits[1][1] < 0.99
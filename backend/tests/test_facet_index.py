@@ -0,0 +1,78 @@
+from backend.app.domain.services.facet_index import FacetIndex
+
+DOCUMENTS = [
+    {"id": "a", "cloud_provider": "AWS", "team": {"primary": "決済"}, "cloud_services": ["Lambda", "DynamoDB"]},
+    {"id": "b", "cloud_provider": "AWS", "team": {"primary": "基盤"}, "cloud_services": ["EKS"]},
+    {"id": "c", "cloud_provider": "Azure", "team": {"primary": "決済"}, "cloud_services": ["Functions", "Cosmos DB"]},
+    {"id": "d", "cloud_provider": "GCP", "team": {}, "cloud_services": ["Lambda", "EKS"]},
+]
+
+
+class FakeCatalogCache:
+    def __init__(self, version, documents):
+        self.version = version
+        self.documents = documents
+
+    def snapshot(self):
+        return self.version, list(self.documents)
+
+
+def build_index() -> FacetIndex:
+    index = FacetIndex()
+    index.build(DOCUMENTS, version=1)
+    return index
+
+
+def page_ids(index: FacetIndex, mask: int, offset: int = 0, limit: int = 10):
+    total, documents = index.page(mask, offset, limit)
+    return total, [doc["id"] for doc in documents]
+
+
+def test_facet_values_and_counts():
+    index = build_index()
+
+    assert index.values("cloud_provider") == ["AWS", "Azure", "GCP"]
+    assert index.values("team") == [FacetIndex.UNASSIGNED_TEAM, "基盤", "決済"]
+    assert index.counts("cloud_services", index.mask())["Lambda"] == 2
+
+
+def test_any_of_is_a_union_and_all_of_is_an_intersection():
+    index = build_index()
+
+    assert page_ids(index, index.mask(any_of={"cloud_provider": ["AWS", "GCP"]})) == (3, ["a", "b", "d"])
+    assert page_ids(index, index.mask(all_of={"cloud_services": ["Lambda", "EKS"]})) == (1, ["d"])
+    assert page_ids(index, index.mask(any_of={"cloud_provider": []})) == (0, [])
+    assert page_ids(index, index.mask(all_of={"cloud_services": []})) == (4, ["a", "b", "c", "d"])
+
+
+def test_systems_without_team_match_the_default_team_filter():
+    index = FacetIndex()
+    index.build([DOCUMENTS[0], {**DOCUMENTS[1], "team": {"primary": ""}}])
+
+    # 一覧ページの既定の選択（すべてのチーム）ではチーム未設定のシステムも表示する
+    assert page_ids(index, index.mask(any_of={"team": index.values("team")})) == (2, ["a", "b"])
+    assert page_ids(index, index.mask(any_of={"team": [FacetIndex.UNASSIGNED_TEAM]})) == (1, ["b"])
+
+
+def test_mask_of_ids_combines_with_facets():
+    index = build_index()
+    mask = index.mask(any_of={"team": ["決済"]}) & index.mask_of_ids(["a", "b", "missing"])
+
+    assert page_ids(index, mask) == (1, ["a"])
+    assert index.contains(mask, "a") and not index.contains(mask, "c")
+
+
+def test_page_returns_requested_slice_in_catalog_order():
+    index = build_index()
+
+    assert page_ids(index, index.mask(), offset=1, limit=2) == (4, ["b", "c"])
+    assert page_ids(index, index.mask(), offset=4, limit=2) == (4, [])
+
+
+def test_ensure_rebuilds_only_when_catalog_version_changes():
+    index = build_index()
+    index.ensure(FakeCatalogCache(1, DOCUMENTS[:1]))
+    assert len(index) == 4
+
+    index.ensure(FakeCatalogCache(2, DOCUMENTS[:1]))
+    assert len(index) == 1 and index.version == 2
@@ -0,0 +1,92 @@
+from typing import Dict, List, Optional
+
+from backend.app.infrastructure.repositories.system_repository import SystemRepository
+from backend.app.infrastructure.tools.http_client import HttpClient
+
+URL = "https://functions.example.com/api/select-all-system"
+
+
+def system(system_id: str) -> Dict:
+    return {
+        "id": system_id,
+        "system_name": f"システム{system_id}",
+        "description": "説明",
+        "cloud_provider": "Azure",
+        "cloud_services": ["Functions"],
+        "team": {"primary": "基盤チーム"},
+        "repository": {"application": "https://example.com/repo"},
+        "created_at": "2026-01-01T00:00:00",
+    }
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, data=None, etag: Optional[str] = None):
+        self.status_code = status_code
+        self._data = data
+        self.headers = {"ETag": etag} if etag else {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+    def json(self):
+        return self._data
+
+
+class FakeSession:
+    """ETag が一致すれば304を返すサーバー"""
+
+    def __init__(self):
+        self.bodies: Dict[str, tuple] = {}
+        self.requests: List[dict] = []
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        self.requests.append({"params": params, "headers": dict(headers or {})})
+        key = HttpClient._cache_key(url, params)
+        etag, data = self.bodies[key]
+        if (headers or {}).get("If-None-Match") == etag:
+            return FakeResponse(304)
+        return FakeResponse(200, data, etag)
+
+
+def make_client() -> tuple:
+    client = HttpClient()
+    session = FakeSession()
+    client.session = session
+    return client, session
+
+
+def test_not_modified_returns_previous_body():
+    client, session = make_client()
+    session.bodies[URL] = ("v1", {"documents": [{"id": "a"}]})
+
+    assert client.get_json(URL) == ({"documents": [{"id": "a"}]}, False)
+    assert client.get_json(URL) == ({"documents": [{"id": "a"}]}, True)
+    assert session.requests[1]["headers"]["If-None-Match"] == "v1"
+
+
+def test_etag_cache_keeps_only_latest_entry_per_url():
+    client, session = make_client()
+    for since in ("1", "2", "3"):
+        params = {"updated_since": since}
+        session.bodies[HttpClient._cache_key(URL, params)] = (f"etag-{since}", {"documents": []})
+        client.get_json(URL, params=params)
+
+    assert len(client._etag_cache) == 1
+    # 別のパラメータの ETag は送らない
+    session.bodies[URL] = ("etag-full", {"documents": []})
+    client.get_json(URL)
+    assert "If-None-Match" not in session.requests[-1]["headers"]
+
+
+def test_repository_uses_cached_full_catalog_on_not_modified():
+    client, session = make_client()
+    session.bodies[URL] = ("v1", {"documents": [system("a"), system("b")]})
+    repository = SystemRepository(base_url="https://functions.example.com/api", http_client=client)
+
+    # 一覧ページなど別の呼び出し元が先に全件を取得している
+    assert len(repository.get_all_systems()) == 2
+
+    changes = repository.get_system_changes(None)
+    assert [doc["id"] for doc in changes["documents"]] == ["a", "b"]
+    assert changes["delta"] is False
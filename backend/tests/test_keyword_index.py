@@ -0,0 +1,82 @@
+from backend.app.domain.services.keyword_index import KeywordIndex, reciprocal_rank_fusion, tokenize
+
+DOCUMENTS = [
+    {
+        "id": "orders",
+        "system_name": "受注管理システム",
+        "description": "DynamoDB と Lambda で受注を処理する",
+        "cloud_services": ["DynamoDB", "Lambda"],
+    },
+    {
+        "id": "data",
+        "system_name": "データ基盤",
+        "description": "BigQuery に data を集約する分析基盤",
+        "cloud_services": ["BigQuery"],
+    },
+    {
+        "id": "db",
+        "system_name": "在庫システム",
+        "description": "Cloud SQL の database を使う",
+        "cloud_services": ["Cloud SQL"],
+    },
+]
+
+
+def build_index() -> KeywordIndex:
+    index = KeywordIndex()
+    index.build(DOCUMENTS)
+    return index
+
+
+def ids(results):
+    return [doc_id for doc_id, _ in results]
+
+
+def test_tokenize_normalizes_and_splits_japanese_into_bigrams():
+    assert tokenize("ＡＷＳ Lambda") == ["aws", "lambda"]
+    assert tokenize("受注管理", query=True) == ["受注", "注管", "管理"]
+    assert tokenize("受注", query=False) == ["受", "注", "受注"]
+
+
+def test_search_ranks_matching_documents():
+    index = build_index()
+
+    assert ids(index.search("受注 lambda")) == ["orders"]
+    assert ids(index.search("bigquery", k=1)) == ["data"]
+    assert index.search("存在しない語") == []
+
+
+def test_ascii_prefixes_match_like_the_old_substring_filter():
+    index = build_index()
+
+    assert ids(index.search("dynamo")) == ["orders"]
+    assert ids(index.search("lamb", match_all=True)) == ["orders"]
+    # 完全一致は前方一致より上位になる
+    assert ids(index.search("data")) == ["data", "db"]
+
+
+def test_match_all_requires_every_term():
+    index = build_index()
+
+    assert ids(index.search("lambda bigquery", match_all=True)) == []
+    assert sorted(ids(index.search("lambda bigquery"))) == ["data", "orders"]
+
+
+def test_catalog_changes_update_postings_and_prefix_vocabulary():
+    index = build_index()
+    index.apply_catalog_changes(
+        [{"id": "orders", "system_name": "受注管理システム", "description": "Aurora で受注を処理する", "cloud_services": []}],
+        ["db"]
+    )
+
+    assert len(index) == 2
+    assert index.search("dynamo") == []
+    assert index.search("database") == []
+    assert ids(index.search("auro")) == ["orders"]
+
+
+def test_reciprocal_rank_fusion_rewards_agreement_between_rankings():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "c", "a"], ["b"]], k=60)
+
+    assert ids(fused) == ["b", "a", "c"]
+    assert fused[0][1] == sum(1 / (60 + rank) for rank in (2, 1, 1))
@@ -0,0 +1,46 @@
+from typing import Optional
+
+from backend.app.domain.services.llm_service import OFF_TOPIC_REASON, LLMService
+from backend.app.domain.services.prompt_context import SystemContextBuilder
+
+
+class FakeClassifier:
+    def __init__(self, verdict: Optional[bool]):
+        self.verdict = verdict
+
+    def classify(self, question: str) -> Optional[bool]:
+        return self.verdict
+
+
+HISTORY = [
+    {"role": "user", "content": "このシステムの可用性について教えてください"},
+    {"role": "assistant", "content": "複数のリージョンに配置しています"},
+]
+
+
+def test_classify_locally_rejects_off_topic_first_question():
+    assert LLMService.classify_locally(FakeClassifier(False), "今日の天気は？") == (False, OFF_TOPIC_REASON)
+
+
+def test_classify_locally_defers_follow_up_rejections_to_llm():
+    assert LLMService.classify_locally(FakeClassifier(False), "それはなぜですか", HISTORY) is None
+
+
+def test_classify_locally_accepts_on_topic_questions_with_history():
+    assert LLMService.classify_locally(FakeClassifier(True), "DBの冗長化は？", HISTORY) == (True, "")
+
+
+def test_classify_locally_without_verdict_uses_llm():
+    assert LLMService.classify_locally(FakeClassifier(None), "それはなぜですか") is None
+    assert LLMService.classify_locally(None, "それはなぜですか") is None
+
+
+def test_validation_messages_include_previous_question_and_compacted_context():
+    builder = SystemContextBuilder()
+    system = {"system_name": "受注管理", "description": "注文を処理する", "cloud_services": ["Lambda"]}
+
+    messages = LLMService.validation_messages(builder, "それはなぜですか", system, HISTORY)
+
+    content = messages[-1]["content"]
+    assert "受注管理" in content and "Lambda" in content
+    assert "直前の質問" in content and HISTORY[0]["content"] in content
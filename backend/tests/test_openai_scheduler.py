@@ -0,0 +1,147 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from backend.app.infrastructure.tools import openai_scheduler
+from backend.app.infrastructure.tools.openai_scheduler import POLL_INTERVAL, Priority, RequestScheduler, TokenBucket
+
+
+class FakeAPIError(Exception):
+    def __init__(self, status_code: int, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """再試行の待ち時間を記録し、実際には待たない"""
+    recorded = []
+    monkeypatch.setattr(openai_scheduler.time, "sleep", recorded.append)
+    return recorded
+
+
+def flaky(errors, result="ok"):
+    calls = []
+
+    def fn(**kwargs):
+        calls.append(kwargs)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+
+    fn.calls = calls
+    return fn
+
+
+def test_token_bucket_waits_refunds_and_drains():
+    bucket = TokenBucket(60)
+    now = bucket.updated_at
+
+    assert bucket.wait_time(60, now) == 0
+    bucket.consume(60)
+    assert bucket.wait_time(1, now) == pytest.approx(1.0)
+
+    bucket.refund(30)
+    assert bucket.wait_time(30, now) == 0
+    bucket.drain(5)
+    assert bucket.wait_time(1, now) == pytest.approx(6.0)
+
+
+def test_background_requests_leave_reserved_slots_for_interactive():
+    scheduler = RequestScheduler(max_concurrency=4)
+    with scheduler._condition:
+        scheduler._in_flight = 3
+        background = scheduler._enqueue("m", Priority.BACKGROUND)
+        assert scheduler._try_admit(background, 1) == POLL_INTERVAL
+        scheduler._abandon(background)
+
+        interactive = scheduler._enqueue("m", Priority.INTERACTIVE)
+        assert scheduler._try_admit(interactive, 1) is None
+        assert scheduler._in_flight == 4
+
+
+def test_interactive_requests_are_admitted_before_queued_background():
+    scheduler = RequestScheduler()
+    with scheduler._condition:
+        background = scheduler._enqueue("m", Priority.BACKGROUND)
+        interactive = scheduler._enqueue("m", Priority.INTERACTIVE)
+        other_model = scheduler._enqueue("other", Priority.BACKGROUND)
+
+        assert scheduler._try_admit(background, 1) == POLL_INTERVAL
+        assert scheduler._try_admit(other_model, 1) is None
+        assert scheduler._try_admit(interactive, 1) is None
+        assert scheduler._try_admit(background, 1) is None
+
+
+def test_token_limit_delays_admission():
+    scheduler = RequestScheduler(limits={"m": (60, 100)})
+    with scheduler._condition:
+        assert scheduler._try_admit(scheduler._enqueue("m", Priority.INTERACTIVE), 100) is None
+        wait = scheduler._try_admit(scheduler._enqueue("m", Priority.INTERACTIVE), 50)
+
+    assert wait == pytest.approx(30, rel=0.01)
+
+
+def test_actual_usage_is_refunded_to_token_bucket(sleeps):
+    scheduler = RequestScheduler(limits={"m": (60, 1000)})
+    response = SimpleNamespace(usage=SimpleNamespace(total_tokens=100, prompt_tokens=80, completion_tokens=20))
+
+    scheduler.call("m", 800, lambda: response)
+
+    assert scheduler._model_buckets("m")[1].tokens == pytest.approx(900, abs=1)
+
+
+def test_rate_limited_request_honours_retry_after(sleeps):
+    scheduler = RequestScheduler(base_delay=0.5)
+    fn = flaky([FakeAPIError(429, {"retry-after-ms": "2000"})])
+
+    assert scheduler.call("m", 10, fn, model="m") == "ok"
+
+    assert len(fn.calls) == 2 and fn.calls[0] == {"model": "m"}
+    assert 2.0 <= sleeps[0] <= 2.5
+    stats = scheduler.metrics()
+    assert stats["retries"] == 1 and stats["rate_limited"] == 1 and stats["in_flight"] == 0
+
+
+def test_backoff_is_bounded_and_stops_after_max_retries(sleeps):
+    scheduler = RequestScheduler(max_retries=3, base_delay=0.5, max_delay=1.0)
+    fn = flaky([FakeAPIError(503)] * 10)
+
+    with pytest.raises(FakeAPIError):
+        scheduler.call("m", 10, fn)
+
+    assert len(fn.calls) == 4
+    assert [delay <= bound for delay, bound in zip(sleeps, (0.5, 1.0, 1.0))] == [True, True, True]
+    assert scheduler.metrics()["failed"] == 1
+
+
+def test_client_errors_are_not_retried(sleeps):
+    scheduler = RequestScheduler()
+    fn = flaky([FakeAPIError(400)])
+
+    with pytest.raises(FakeAPIError):
+        scheduler.call("m", 10, fn)
+
+    assert len(fn.calls) == 1 and sleeps == []
+
+
+def test_cancelled_async_request_leaves_the_queue():
+    scheduler = RequestScheduler(limits={"m": (1, 1000)})
+
+    async def scenario():
+        async def ok():
+            return "ok"
+
+        assert await scheduler.acall("m", 1, ok) == "ok"
+        # RPM を使い切っているため次のリクエストは待ち行列に残る
+        task = asyncio.ensure_future(scheduler.acall("m", 1, ok))
+        await asyncio.sleep(0.1)
+        assert scheduler.metrics()["queue_depth"]["interactive"] == 1
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    assert scheduler.metrics()["queue_depth"]["interactive"] == 0
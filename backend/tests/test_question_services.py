@@ -0,0 +1,68 @@
+from typing import Dict, Iterator, List
+
+from backend.app.domain.services.question_services import QuestionService
+
+
+class FakeLLMService:
+    """同期の LLMService と同じように、回答ストリームは読み進めた時点で履歴を参照する"""
+
+    def __init__(self):
+        self.histories: List[List[Dict]] = []
+
+    def validate_architecture_question(self, question: str, system_context: Dict, chat_history: List[Dict]):
+        return True, ""
+
+    def stream_architecture_answer(self, question: str, system_context: Dict, chat_history: List[Dict]) -> Iterator[str]:
+        self.histories.append(list(chat_history))
+        yield "回答"
+        yield "です"
+
+
+class FakeAnswerCache:
+    def __init__(self):
+        self.stored = {}
+
+    def get(self, system_context: Dict, question: str):
+        return self.stored.get(question)
+
+    def put(self, system_context: Dict, question: str, answer: str):
+        self.stored[question] = answer
+
+
+def test_stream_question_is_not_affected_by_history_appended_before_reading():
+    llm_service, answer_cache = FakeLLMService(), FakeAnswerCache()
+    service = QuestionService(llm_service, answer_cache)
+    chat_history: List[Dict] = []
+
+    is_valid, _, stream = service.stream_question("可用性は？", {"id": "s1"}, chat_history)
+    # 画面側は回答を読む前に質問を履歴へ追加する
+    chat_history.append({"role": "user", "content": "可用性は？"})
+
+    assert is_valid
+    assert "".join(stream) == "回答です"
+    assert llm_service.histories == [[]]
+    assert answer_cache.stored == {"可用性は？": "回答です"}
+
+
+def test_stream_question_serves_cached_answer_for_first_question():
+    answer_cache = FakeAnswerCache()
+    answer_cache.put({}, "可用性は？", "キャッシュ済み")
+    service = QuestionService(FakeLLMService(), answer_cache)
+
+    is_valid, _, stream = service.stream_question("可用性は？", {"id": "s1"}, [])
+
+    assert is_valid
+    assert list(stream) == ["キャッシュ済み"]
+
+
+def test_follow_up_questions_bypass_answer_cache():
+    llm_service, answer_cache = FakeLLMService(), FakeAnswerCache()
+    answer_cache.put({}, "それはなぜですか", "別の会話の回答")
+    service = QuestionService(llm_service, answer_cache)
+    history = [{"role": "user", "content": "可用性は？"}, {"role": "assistant", "content": "冗長化しています"}]
+
+    _, _, stream = service.stream_question("それはなぜですか", {"id": "s1"}, history)
+
+    assert "".join(stream) == "回答です"
+    assert llm_service.histories == [history]
+    assert answer_cache.stored["それはなぜですか"] == "別の会話の回答"
@@ -0,0 +1,56 @@
+from typing import Dict, List
+
+from backend.app.domain.services.register_service import RegisterService
+
+SYSTEM = {
+    "system_name": "受注管理",
+    "description": "注文を処理する",
+    "cloud_provider": "AWS",
+    "cloud_services": ["Lambda"],
+    "team": {"primary": "基盤チーム"},
+    "repository": {"application": "https://example.com/repo"},
+}
+
+
+class FakeHttpClient:
+    def __init__(self, response):
+        self.response = response
+
+    def post_json(self, url, payload, timeout=None, headers=None):
+        return self.response
+
+
+class FakeCatalogCache:
+    def __init__(self):
+        self.upserted: List[Dict] = []
+        self.invalidated = 0
+
+    def upsert(self, doc: Dict):
+        self.upserted.append(doc)
+
+    def invalidate(self):
+        self.invalidated += 1
+
+
+def register(response) -> FakeCatalogCache:
+    catalog_cache = FakeCatalogCache()
+    service = RegisterService("https://functions.example.com/api", catalog_cache, FakeHttpClient(response))
+    service.register_system(dict(SYSTEM))
+    return catalog_cache
+
+
+def test_stored_document_is_folded_into_catalog_with_timestamps():
+    catalog_cache = register({"message": "registered", "document": {"id": "s1", "created_at": "2026-10-18T00:00:00"}})
+
+    [document] = catalog_cache.upserted
+    assert document["id"] == "s1" and document["system_name"] == "受注管理"
+    # 一覧ページが参照する日時の項目を必ず持たせる
+    assert document["created_at"] == "2026-10-18T00:00:00" and document["updated_at"] is None
+    assert catalog_cache.invalidated == 1
+
+
+def test_response_without_stored_document_waits_for_next_sync():
+    catalog_cache = register({"id": "s1", "message": "registered"})
+
+    assert catalog_cache.upserted == []
+    assert catalog_cache.invalidated == 1
@@ -1,78 +1,167 @@
-import os
-import requests
 import streamlit as st
-from typing import List, Dict
+from typing import TYPE_CHECKING, List, Dict, Optional
 
+from utils.service_provider import get_catalog_cache, get_facet_index, get_search_service
 
-def fetch_architectures() -> List[Dict]:
-    """Azure Functionsからアーキテクチャ一覧を取得"""
+if TYPE_CHECKING:
+    from backend.app.domain.services.facet_index import FacetIndex
+
+PAGE_SIZE_OPTIONS = [20, 50, 100]
+
+
+def fetch_facet_index() -> Optional["FacetIndex"]:
+    """共有カタログキャッシュからアーキテクチャ一覧を取得し、ファセットインデックスを返す（TTL内はネットワークにアクセスしない）"""
     try:
-        url = os.getenv("AZURE_FUNCTION_URL") + "/select-all-system"
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()["documents"]
+        return get_facet_index().ensure(get_catalog_cache())
     except Exception as e:
         st.error(f"エラーが発生しました: {str(e)}")
+        return None
+
+
+def search_architectures(search_query: str, use_vector: bool) -> List[Dict]:
+    """キーワード検索（ベクトル検索との併用時はハイブリッド検索）で関連度の高い順に取得"""
+    search_service = get_search_service()
+    try:
+        if use_vector:
+            return search_service.hybrid_search(search_query, vector_candidates=10)
+        return search_service.keyword_search(search_query, match_all=True)
+    except Exception as e:
+        st.error(f"検索中にエラーが発生しました: {str(e)}")
         return []
 
 
 def run_page():
     st.header("システムアーキテクチャ一覧 📚")
 
-    # システム一覧の取得
+    # システム一覧の取得（ファセットインデックスはカタログのバージョンが変わった場合のみ再構築）
     with st.spinner("システム一覧を取得中..."):
-        architectures = fetch_architectures()
+        facet_index = fetch_facet_index()
 
-    if not architectures:
+    if facet_index is None or not len(facet_index):
         st.warning("システムが見つかりませんでした。")
         return
 
-    # フィルタリングオプション
+    # キーワード検索
+    search_query = st.text_input(
+        "🔍 「システム名」「概要」または「利用サービス」で検索",
+        placeholder="検索キーワードを入力..."
+    ).strip()
+    use_vector = st.checkbox(
+        "ベクトル検索と組み合わせる",
+        help="キーワードに一致しなくても内容が近いシステムを関連度順に含めます"
+    )
+
+    # キーワード検索（転置インデックス）の結果は関連度順に並べ、ファセットの条件と積を取る
+    search_results = search_architectures(search_query, use_vector) if search_query else None
+    search_mask = (
+        facet_index.mask_of_ids(arch["id"] for arch in search_results)
+        if search_results is not None else facet_index.mask()
+    )
+
+    # フィルタリングオプション（件数は他のフィルターを適用した結果で数える）
     st.subheader("フィルター設定")
-    col1, col2 = st.columns(2)
+    providers = facet_index.values("cloud_provider")
+    teams = facet_index.values("team")
+    services = facet_index.values("cloud_services")
+    # カタログの更新で無くなった値を選択状態から除く
+    for key, options in (
+        ("list_provider_filter", providers),
+        ("list_team_filter", teams),
+        ("list_service_filter", services)
+    ):
+        selected = st.session_state.get(key)
+        if selected is not None and not set(selected) <= set(options):
+            st.session_state[key] = [value for value in selected if value in options]
+    selected_provider = st.session_state.get("list_provider_filter", providers)
+    selected_teams = st.session_state.get("list_team_filter", teams)
+    selected_services = st.session_state.get("list_service_filter", [])
+
+    provider_counts = facet_index.counts("cloud_provider", search_mask & facet_index.mask(
+        any_of={"team": selected_teams},
+        all_of={"cloud_services": selected_services}
+    ))
+    team_counts = facet_index.counts("team", search_mask & facet_index.mask(
+        any_of={"cloud_provider": selected_provider},
+        all_of={"cloud_services": selected_services}
+    ))
+    service_counts = facet_index.counts("cloud_services", search_mask & facet_index.mask(
+        any_of={"cloud_provider": selected_provider, "team": selected_teams},
+        all_of={"cloud_services": selected_services}
+    ))
+
+    col1, col2, col3 = st.columns(3)
 
     with col1:
         # クラウドプロバイダーでフィルター
-        providers = list(set(arch["cloud_provider"] for arch in architectures))
         selected_provider = st.multiselect(
             "クラウドプロバイダー",
             options=providers,
-            default=providers
+            default=providers,
+            format_func=lambda value: f"{value} ({provider_counts.get(value, 0)})",
+            key="list_provider_filter"
         )
 
     with col2:
         # チームでフィルター
-        teams = list(set(arch["team"]["primary"] for arch in architectures))
         selected_teams = st.multiselect(
             "チーム",
             options=teams,
-            default=teams
+            default=teams,
+            format_func=lambda value: f"{value} ({team_counts.get(value, 0)})",
+            key="list_team_filter"
         )
 
-    # キーワード検索
-    search_query = st.text_input(
-        "🔍 「システム名」または「概要」で検索",
-        placeholder="検索キーワードを入力..."
-    ).lower()
-
-    # フィルタリングの適用
-    filtered_architectures = [
-        arch for arch in architectures
-        if arch["cloud_provider"] in selected_provider
-        and arch["team"]["primary"] in selected_teams
-        and (search_query == "" or
-             search_query in arch["system_name"].lower() or
-             search_query in arch["description"].lower())
-    ]
+    with col3:
+        # 利用サービスでフィルター（選択したサービスをすべて利用しているシステム）
+        selected_services = st.multiselect(
+            "利用サービス",
+            options=services,
+            format_func=lambda value: f"{value} ({service_counts.get(value, 0)})",
+            key="list_service_filter"
+        )
+
+    # フィルタリングの適用（ビットマップの積）
+    mask = search_mask & facet_index.mask(
+        any_of={"cloud_provider": selected_provider, "team": selected_teams},
+        all_of={"cloud_services": selected_services}
+    )
+    if search_results is not None:
+        filtered_architectures = [arch for arch in search_results if facet_index.contains(mask, arch["id"])]
+        total = len(filtered_architectures)
+    else:
+        filtered_architectures = None
+        total = mask.bit_count()
 
     # 結果の表示
-    st.subheader(f"システム一覧 ({len(filtered_architectures)}件)")
+    st.subheader(f"システム一覧 ({total}件)")
 
-    if not filtered_architectures:
+    if not total:
         st.info("条件に一致するシステムが見つかりませんでした。")
         return
 
-    for arch in filtered_architectures:
+    # ページネーション（表示するページの分だけエクスパンダーを構築）
+    col1, col2, col3 = st.columns([1, 1, 4])
+    with col1:
+        page_size = st.selectbox("表示件数", PAGE_SIZE_OPTIONS, key="list_page_size")
+    page_count = (total + page_size - 1) // page_size
+    if st.session_state.get("list_page_number", 1) > page_count:
+        st.session_state["list_page_number"] = page_count
+    with col2:
+        page_number = st.number_input(
+            f"ページ (全{page_count}ページ)",
+            min_value=1,
+            max_value=page_count,
+            step=1,
+            key="list_page_number"
+        )
+
+    offset = (page_number - 1) * page_size
+    if filtered_architectures is None:
+        _, page_architectures = facet_index.page(mask, offset, page_size)
+    else:
+        page_architectures = filtered_architectures[offset:offset + page_size]
+
+    for arch in page_architectures:
         with st.expander(f"🏗️システム名：{arch['system_name']}", expanded=False):
             col1, col2, col3 = st.columns([2, 1, 1])
 
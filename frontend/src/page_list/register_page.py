@@ -4,8 +4,7 @@ import streamlit as st
 from dotenv import load_dotenv
 from typing import Dict
 
-from backend.app.domain.services.register_service import RegisterService
-from backend.app.domain.services.embedding_service import EmbeddingService
+from utils.service_provider import get_embedding_service, get_register_service
 
 load_dotenv()
 
@@ -30,10 +29,6 @@ def validate_system_data(data: Dict) -> tuple[bool, str]:
 def run_page():
     st.header("システムアーキテクチャ登録 📃")
 
-    # サービスの初期化
-    architecture_service = RegisterService(AZURE_FUNCTION_URL)
-    embedding_service = EmbeddingService(OPENAI_API_KEY)
-
     with st.form("architecture_form"):
         # 基本情報
         st.subheader("基本情報")
@@ -65,6 +60,9 @@ def run_page():
         submitted = st.form_submit_button("登録")
 
     if submitted:
+        # サービスの初期化（登録時のみ必要なため、ページ表示時には読み込まない）
+        architecture_service = get_register_service()
+        embedding_service = get_embedding_service()
         try:
             # クラウドサービスをリスト化
             cloud_services = [
@@ -75,12 +73,12 @@ def run_page():
             
             # Generate embedding for description
             description_vector = embedding_service.get_embedding(description)
-            print(description_vector)
             # リクエストデータの作成
             architecture_data = {
                 "system_name": system_name,
                 "description": description,
                 "description_vector": description_vector.tolist(),  # Convert numpy array to list
+                "embedding_model": embedding_service.model,
                 "cloud_provider": cloud_provider,
                 "cloud_services": cloud_services,
                 "team": {
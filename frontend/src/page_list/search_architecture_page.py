@@ -1,13 +1,16 @@
 import os
-import requests
 import streamlit as st
 
 from dotenv import load_dotenv
 from typing import Dict, List
 
 from utils.session_state_manager import SessionStateManager
-from backend.app.domain.services.embedding_service import EmbeddingService
-from backend.app.domain.services.llm_service import LLMService
+from utils.service_provider import (
+    get_catalog_cache,
+    get_embedding_service,
+    get_question_service,
+    get_search_service
+)
 
 load_dotenv()
 
@@ -16,12 +19,9 @@ OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
 
 def fetch_all_systems() -> List[Dict]:
-    """Azure Functionsから全システムを取得"""
+    """共有カタログキャッシュから全システムを取得"""
     try:
-        response = requests.get(f"{AZURE_FUNCTION_URL}/select-all-system")
-        if response.status_code == 200:
-            return response.json()["documents"]
-        return []
+        return get_catalog_cache().get()
     except Exception as e:
         st.error(f"システムの取得中にエラーが発生しました: {str(e)}")
         return []
@@ -30,10 +30,6 @@ def fetch_all_systems() -> List[Dict]:
 def run_page():
     SessionStateManager.initialize_states()
 
-    # サービスの初期化
-    embedding_service = EmbeddingService(OPENAI_API_KEY)
-    llm_service = LLMService(OPENAI_API_KEY)
-
     st.title("システムアーキテクチャ検索・相談")
 
     # システム概要入力セクション
@@ -45,7 +41,7 @@ def run_page():
         key="system_description"
     )
 
-    col1, col2, col3 = st.columns([1, 1, 4])
+    col1, col2, col3, col4 = st.columns([1, 1, 1, 3])
     with col1:
         search_clicked = st.button(
             "🔍 全件検索",
@@ -58,24 +54,34 @@ def run_page():
             key="vector_search_button",
             help="入力内容をベクトル化して類似度の高い上位3件を表示します"
         )
+    with col3:
+        hybrid_search_clicked = st.button(
+            "🔍 ハイブリッド検索",
+            key="hybrid_search_button",
+            help="サービス名などのキーワード一致とベクトル類似度を統合した上位10件を表示します"
+        )
 
-    if search_clicked or vector_search_clicked:
+    if search_clicked or vector_search_clicked or hybrid_search_clicked:
         if not new_description.strip():
             st.error("システム概要を入力してください。")
             return
 
         SessionStateManager.set_state('current_system_description', new_description)
         with st.spinner("類似システムを検索中..."):
-            # 全システムを取得して類似度計算
+            # カタログを取得して類似度計算（インデックスは同期時に更新済み）
             all_systems = fetch_all_systems()
             if all_systems:
-                results = embedding_service.calculate_similarity(new_description, all_systems)
-                
-                if vector_search_clicked:
+                embedding_service = get_embedding_service()
+                if hybrid_search_clicked:
+                    # キーワード検索とベクトル検索の順位を統合
+                    results = get_search_service().hybrid_search(new_description, top_k=10)
+                    st.success(f"関連度の高い上位{len(results)}件のシステムを表示します")
+                elif vector_search_clicked:
                     # ベクトル検索の場合は上位3件のみを表示
-                    results = results[:3]
+                    results = embedding_service.calculate_similarity(new_description, top_k=3)
                     st.success(f"類似度の高い上位{len(results)}件のシステムを表示します")
                 else:
+                    results = embedding_service.calculate_similarity(new_description)
                     st.success(f"{len(results)}件のシステムが見つかりました")
                 
                 SessionStateManager.set_state('search_results', results)
@@ -140,27 +146,28 @@ def run_page():
 
             if send_clicked and question:
                 with st.spinner("回答を生成中..."):
-                    # 質問の妥当性を検証
-                    is_valid, error_message = llm_service.validate_architecture_question(
+                    # 質問の妥当性検証と回答ストリームの開始を並行実行
+                    is_valid, error_message, answer_stream = get_question_service().stream_question(
                         question,
-                        selected_system
+                        selected_system,
+                        st.session_state.chat_history
                     )
 
-                    if is_valid:
-                        # 質問を履歴に追加
-                        SessionStateManager.add_chat_message("user", question)
-
-                        # 回答を生成
-                        answer = llm_service.get_architecture_answer(
-                            question,
-                            selected_system
-                        )
-
-                        # 回答を履歴に追加
-                        SessionStateManager.add_chat_message("assistant", answer)
-                        st.rerun()
-                    else:
-                        st.error(error_message)
+                if is_valid:
+                    # 質問を履歴に追加
+                    SessionStateManager.add_chat_message("user", question)
+                    with st.chat_message("user"):
+                        st.markdown(question)
+
+                    # 回答を受信した順に表示
+                    with st.chat_message("assistant"):
+                        answer = st.write_stream(answer_stream)
+
+                    # 完成した回答を履歴に追加
+                    SessionStateManager.add_chat_message("assistant", answer)
+                    st.rerun()
+                else:
+                    st.error(error_message)
 
 
 if __name__ == "__main__":
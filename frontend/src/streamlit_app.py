@@ -1,13 +1,35 @@
-import os
-import streamlit as st
-from dotenv import load_dotenv
-from utils.path_setup import setup_backend_path
-setup_backend_path()
+from utils.startup_profiler import startup_profiler
+startup_profiler.start_import_timing()
 
-from page_list import list_page, register_page, search_architecture_page  # noqa: E402
+import importlib  # noqa: E402
+import os  # noqa: E402
+import sys  # noqa: E402
+import streamlit as st  # noqa: E402
+from dotenv import load_dotenv  # noqa: E402
+from utils.path_setup import setup_backend_path  # noqa: E402
+
+with startup_profiler.stage("path_setup"):
+    setup_backend_path()
+
+from utils.service_provider import warm_up_services  # noqa: E402
 
 load_dotenv()
 
+# ページのモジュールは最初に選択されたときに読み込む
+PAGE_MODULES = {
+    'REGISTER_PAGE': 'page_list.register_page',
+    'LIST_PAGE': 'page_list.list_page',
+    'SEARCH_ARCHITECHURE_PAGE': 'page_list.search_architecture_page',
+}
+
+
+def load_page(module_name: str):
+    """ページのモジュールを読み込む（2回目以降は読み込み済みのモジュールを返す）"""
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    with startup_profiler.stage(f"import {module_name}"):
+        return importlib.import_module(module_name)
+
 
 def main():
     st.set_page_config(
@@ -26,6 +48,10 @@ def main():
     """
     st.markdown(hide_streamlit_style, unsafe_allow_html=True)
 
+    # カタログ・検索インデックス・コネクションをバックグラウンドで準備（プロセスごとに1回）
+    with startup_profiler.stage("warm_up_start"):
+        warm_up_services()
+
     list_page_name = os.getenv('LIST_PAGE')
     register_page_name = os.getenv('REGISTER_PAGE')
     search_architecture_page_name = os.getenv('SEARCH_ARCHITECHURE_PAGE')
@@ -41,12 +67,18 @@ def main():
     )
 
     if task == register_page_name:
-        register_page.run_page()
+        page = load_page(PAGE_MODULES['REGISTER_PAGE'])
     elif task == list_page_name:
-        list_page.run_page()
+        page = load_page(PAGE_MODULES['LIST_PAGE'])
     elif task == search_architecture_page_name:
-        search_architecture_page.run_page()
+        page = load_page(PAGE_MODULES['SEARCH_ARCHITECHURE_PAGE'])
+    else:
+        return
+
+    with startup_profiler.stage("run_page"):
+        page.run_page()
 
 
 if __name__ == '__main__':
     main()
+    startup_profiler.report_once()
@@ -1,3 +1,4 @@
+import logging
 import sys
 from pathlib import Path
 
@@ -5,6 +6,7 @@ from pathlib import Path
 def setup_backend_path():
     """
     バックエンドのパスをPYTHONPATHに追加
+    起動のたびに実行されるため、標準出力への出力やファイルの作成は行わない
     """
     # 現在のファイルの場所から見た相対パスでプロジェクトルートディレクトリを探す
     current_dir = Path(__file__).resolve().parent
@@ -13,28 +15,7 @@ def setup_backend_path():
     # プロジェクトルートをPYTHONPATHに追加
     if str(project_root) not in sys.path:
         sys.path.insert(0, str(project_root))
-        print(f"Added project root path: {project_root}")
+        logging.debug(f"Added project root path: {project_root}")
 
-    backend_path = project_root / 'backend'
-    if not backend_path.exists():
-        print(f"Warning: Backend directory not found at {backend_path}")
-        return
-
-    # 必要な__init__.pyファイルが存在することを確認
-    required_init_files = [
-        backend_path / '__init__.py',
-        backend_path / 'app' / '__init__.py',
-        backend_path / 'app' / 'domain' / '__init__.py',
-        backend_path / 'app' / 'domain' / 'services' / '__init__.py',
-    ]
-
-    for init_file in required_init_files:
-        if not init_file.exists():
-            init_file.parent.mkdir(parents=True, exist_ok=True)
-            init_file.touch()
-            print(f"Created {init_file}")
-
-    # 現在のPYTHONPATHを表示（デバッグ用）
-    print("\nCurrent PYTHONPATH:")
-    for path in sys.path:
-        print(f"  - {path}")
+    if not (project_root / 'backend' / '__init__.py').exists():
+        logging.warning(f"Backend package not found at {project_root / 'backend'}")
@@ -0,0 +1,107 @@
+import threading
+from typing import TYPE_CHECKING, Optional
+
+from utils.startup_profiler import startup_profiler
+
+# バックエンドのサービス（openai、numpy など）は最初に使われたときに読み込み、起動を軽くする
+if TYPE_CHECKING:
+    from backend.app.container import ServiceContainer
+    from backend.app.domain.services.answer_cache import SemanticAnswerCache
+    from backend.app.domain.services.conversation import ConversationMemory
+    from backend.app.domain.services.embedding_service import EmbeddingService
+    from backend.app.domain.services.facet_index import FacetIndex
+    from backend.app.domain.services.keyword_index import KeywordIndex
+    from backend.app.domain.services.question_classifier import QuestionRelevanceClassifier
+    from backend.app.domain.services.question_services import QuestionService
+    from backend.app.domain.services.register_service import RegisterService
+    from backend.app.domain.services.search_service import SearchService
+    from backend.app.infrastructure.repositories.catalog_cache import CatalogCache
+    from backend.app.infrastructure.repositories.catalog_sync import CatalogSync
+
+_warm_up_lock = threading.Lock()
+_warm_up_started = False
+
+# 各ページはここからサービスを取得する（生成と共有はプロセス全体の ServiceContainer が行う）
+
+
+def get_container() -> "ServiceContainer":
+    from backend.app.container import ServiceContainer
+    return ServiceContainer.instance()
+
+
+def warm_up_services():
+    """
+    起動時にバックグラウンドでカタログ・インデックス・コネクションを準備（プロセスごとに1回）
+    バックエンドのモジュールの読み込みも別スレッドで行い、最初の画面描画を待たせない
+    """
+    global _warm_up_started
+    with _warm_up_lock:
+        if _warm_up_started:
+            return
+        _warm_up_started = True
+    threading.Thread(target=_warm_up, name="service-warm-up", daemon=True).start()
+
+
+def _warm_up():
+    container = get_container()
+    # ルートロガーを設定してから、保留していた起動プロファイルを出力する
+    try:
+        container.configure_logging()
+    finally:
+        startup_profiler.logging_configured()
+    container.warm_up()
+
+
+def get_catalog_sync() -> "CatalogSync":
+    """全セッションで共有するカタログのレプリカ"""
+    return get_container().catalog_sync
+
+
+def get_catalog_cache() -> "CatalogCache":
+    """一覧・検索ページで共有するカタログのTTLキャッシュ"""
+    return get_container().catalog_cache
+
+
+def get_embedding_service() -> "EmbeddingService":
+    """カタログの変更を購読して検索インデックスを差分更新するEmbeddingService"""
+    return get_container().embedding_service
+
+
+def get_keyword_index() -> "KeywordIndex":
+    """カタログの変更を購読して差分更新するキーワード検索インデックス"""
+    return get_container().keyword_index
+
+
+def get_facet_index() -> "FacetIndex":
+    """一覧ページのファセットインデックス（カタログのバージョンごとに再構築）"""
+    return get_container().facet_index
+
+
+def get_search_service() -> "SearchService":
+    """キーワード・ベクトル・ハイブリッド検索を提供するSearchService"""
+    return get_container().search_service
+
+
+def get_register_service() -> "RegisterService":
+    """登録結果をカタログに即時反映するRegisterService"""
+    return get_container().register_service
+
+
+def get_question_classifier() -> "Optional[QuestionRelevanceClassifier]":
+    """質問の関連性を判定するローカル分類器（無効化されている場合はNone）"""
+    return get_container().question_classifier
+
+
+def get_answer_cache() -> "SemanticAnswerCache":
+    """全セッションで共有する回答キャッシュ"""
+    return get_container().answer_cache
+
+
+def get_conversation_memory() -> "ConversationMemory":
+    """全セッションで共有する会話要約のキャッシュ（要約は会話内容のハッシュで引くためセッション間で混ざらない）"""
+    return get_container().conversation_memory
+
+
+def get_question_service() -> "QuestionService":
+    """回答キャッシュ・会話履歴・ローカル分類器を備えたQuestionService"""
+    return get_container().question_service
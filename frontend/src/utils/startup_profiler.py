@@ -0,0 +1,152 @@
+import importlib.abc
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+
+class _TimedLoader:
+    """モジュールの実行時間を計測するローダーのラッパー（その他の属性は元のローダーに委譲）"""
+
+    def __init__(self, loader, name: str, timer: "ImportTimer"):
+        self._loader = loader
+        self._name = name
+        self._timer = timer
+
+    def __getattr__(self, item):
+        return getattr(self._loader, item)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        stack = self._timer.stack()
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            self._timer.record(self._name, elapsed - children, elapsed)
+
+
+class ImportTimer(importlib.abc.MetaPathFinder):
+    """
+    python -X importtime と同様に、モジュールごとの import 時間（自身 / 子を含む累計）を計測
+    sys.meta_path の先頭に追加し、見つかったモジュールのローダーをラップする
+    """
+
+    def __init__(self):
+        self.records: Dict[str, Tuple[float, float]] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def stack(self) -> List[float]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def record(self, name: str, self_seconds: float, cumulative_seconds: float):
+        with self._lock:
+            self.records[name] = (self_seconds, cumulative_seconds)
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is None:
+                continue
+            if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                spec.loader = _TimedLoader(spec.loader, fullname, self)
+            return spec
+        return None
+
+    def install(self):
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def slowest(self, limit: int = 15) -> List[Tuple[str, float, float]]:
+        """累計時間の長い順に (モジュール名, 自身の秒数, 累計秒数)"""
+        with self._lock:
+            records = sorted(self.records.items(), key=lambda item: item[1][1], reverse=True)
+        return [(name, self_seconds, cumulative) for name, (self_seconds, cumulative) in records[:limit]]
+
+
+class StartupProfiler:
+    """
+    起動から最初の画面描画までの所要時間をログに出力
+    初期化の段階ごとの時間と、STARTUP_PROFILE_IMPORTS=true の場合は import 時間の上位を記録する
+    Streamlitはスクリプトを再実行するため、記録と出力はプロセスごとに最初の1回のみ行う
+    ルートロガーはバックエンドの読み込み後に設定されるため、それまでは出力を保留する
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.import_timer = ImportTimer() if os.getenv("STARTUP_PROFILE_IMPORTS", "false").lower() == "true" else None
+        self._reported = False
+        self._logging_ready = False
+        self._pending: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def start_import_timing(self):
+        if self.import_timer is not None and not self._reported:
+            self.import_timer.install()
+
+    @contextmanager
+    def stage(self, name: str):
+        """ブロックの所要時間を段階として記録"""
+        if self._reported:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def report_once(self):
+        """最初の画面描画までの時間をログに出力し、import の計測を終了"""
+        with self._lock:
+            if self._reported:
+                return
+            self._reported = True
+
+        lines = [f"Startup profile: time to first render {time.perf_counter() - self.started_at:.3f}s"]
+        lines.extend(f"  stage {name}: {seconds * 1000:.1f} ms" for name, seconds in self.stages.items())
+        if self.import_timer is not None:
+            self.import_timer.uninstall()
+            lines.append("  import time: self [ms] | cumulative [ms] | module")
+            lines.extend(
+                f"  {self_seconds * 1000:10.1f} | {cumulative * 1000:10.1f} | {name}"
+                for name, self_seconds, cumulative in self.import_timer.slowest()
+            )
+        with self._lock:
+            if not self._logging_ready:
+                self._pending = "\n".join(lines)
+                return
+        logging.info("\n".join(lines))
+
+    def logging_configured(self):
+        """ルートロガーの設定後に呼ぶ（保留していたプロファイルを出力）"""
+        with self._lock:
+            self._logging_ready = True
+            message, self._pending = self._pending, None
+        if message is not None:
+            logging.info(message)
+
+
+# プロセス全体で1つ（streamlit_app.py は再実行されるが、このモジュールは最初の1回だけ読み込まれる）
+startup_profiler = StartupProfiler()